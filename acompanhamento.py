@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Modo de acompanhamento ao vivo da conferência
+Acompanha uma exportação de conferência que é reexportada ao longo do turno,
+mantendo os agregados do relatório atualizados de forma incremental: a cada
+nova exportação apenas as rotas (AT/TO) novas ou alteradas são reprocessadas.
+
+Uso:
+    python acompanhamento.py --conferencia conferencia.csv --expedicao exp1.csv exp2.csv
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from esquemas import ESQUEMA_CONFERENCIA
+from ingestao import ler_csv, validar_df_conferencia
+from reducao_expedicao import reduzir_expedicoes
+from analise_relatorios import (indexar_status_rotas, montar_metricas_operador, format_hms,
+                                formatar_intervalo_hora)
+
+STATUS_PISO = ['Processing', 'Processed']
+
+# Bytes lidos por vez ao conferir o trecho já processado do arquivo
+BLOCO_ASSINATURA = 1024 * 1024
+
+COLUNAS_ROTA = [
+    'AT/TO Validation Status',
+    'Total Initial Orders Inside AT/TO',
+    'Total Final Orders Inside AT/TO',
+    'Validation Start Time',
+    'Validation End Time',
+    'Validation Operator',
+]
+
+
+class _ConferenciasOperador:
+    """Conferências de um operador ordenadas por início, com somas mantidas incrementalmente"""
+
+    __slots__ = ('inicios', 'fins', 'soma_duracao', 'soma_ociosidade')
+
+    def __init__(self):
+        self.inicios = []
+        self.fins = []
+        self.soma_duracao = 0
+        self.soma_ociosidade = 0
+
+    def _intervalo(self, i):
+        """Ociosidade entre a conferência i e a seguinte"""
+        return self.inicios[i + 1] - self.fins[i]
+
+    def adicionar(self, inicio, fim):
+        p = bisect_right(self.inicios, inicio)
+        if 0 < p < len(self.inicios):
+            self.soma_ociosidade -= self._intervalo(p - 1)
+        self.inicios.insert(p, inicio)
+        self.fins.insert(p, fim)
+        if p > 0:
+            self.soma_ociosidade += self._intervalo(p - 1)
+        if p < len(self.inicios) - 1:
+            self.soma_ociosidade += self._intervalo(p)
+        self.soma_duracao += fim - inicio
+
+    def remover(self, inicio, fim):
+        # A conferência está entre as de mesmo início
+        p = bisect_left(self.inicios, inicio)
+        ultimo = bisect_right(self.inicios, inicio)
+        while p < ultimo and self.fins[p] != fim:
+            p += 1
+        if p == ultimo:
+            raise ValueError(f"Conferência não registrada para o operador: início {inicio}, fim {fim}")
+        if p > 0:
+            self.soma_ociosidade -= self._intervalo(p - 1)
+        if p < len(self.inicios) - 1:
+            self.soma_ociosidade -= self._intervalo(p)
+        del self.inicios[p]
+        del self.fins[p]
+        if 0 < p < len(self.inicios):
+            self.soma_ociosidade += self._intervalo(p - 1)
+        self.soma_duracao -= fim - inicio
+
+    def medias(self):
+        """(média de conferência, média de ociosidade) como Timedelta"""
+        n = len(self.inicios)
+        conferencia = pd.Timedelta(self.soma_duracao / n, unit='ns') if n else pd.NaT
+        ociosidade = pd.Timedelta(self.soma_ociosidade / (n - 1), unit='ns') if n > 1 else pd.NaT
+        return conferencia, ociosidade
+
+
+class AcompanhamentoConferencia:
+    """
+    Agregados do relatório mantidos de forma incremental
+
+    Cada AT/TO contribui com uma parcela para os contadores (rotas e pedidos
+    programados/expedidos, hora a hora, operadores e rotas no piso). Quando a
+    linha de uma rota muda, a parcela antiga é removida e a nova é somada, de
+    modo que o custo de cada atualização depende só do número de rotas alteradas.
+    Considera-se uma linha por AT/TO na conferência (a última ocorrência prevalece).
+    """
+
+    def __init__(self, df_expedicao=None):
+        """
+        Args:
+            df_expedicao: DataFrame do assignment, usado para identificar rotas
+                validadas que continuam com status de piso
+        """
+        if df_expedicao is not None:
+            self.status_assignment = indexar_status_rotas(df_expedicao)
+        else:
+            self.status_assignment = pd.Series(dtype=object)
+
+        self.hashes = {}
+        self.contribuicoes = {}
+
+        self.pedidos_programados = 0.0
+        self.rotas_expedidas = 0
+        self.pedidos_expedidos = 0.0
+        self.por_hora = defaultdict(lambda: [0, 0.0])
+        self.operadores = defaultdict(_ConferenciasOperador)
+        self.rotas_piso = set()
+        self.inicios_expedicao = []
+        self.fins_expedicao = []
+        self.soma_conferencia = 0
+        self.conferencias = 0
+
+        # Estado da leitura incremental do arquivo: bytes já processados e o
+        # hash de todos eles (mantido de forma contínua)
+        self._posicao = 0
+        self._cabecalho = b''
+        self._assinatura = None
+
+    # ===== Leitura do arquivo =====
+
+    @staticmethod
+    def _hash_ate(f, posicao):
+        """Hash dos primeiros bytes do arquivo, lido em blocos"""
+        h = hashlib.blake2b(digest_size=16)
+        f.seek(0)
+        restante = posicao
+        while restante > 0:
+            bloco = f.read(min(BLOCO_ASSINATURA, restante))
+            if not bloco:
+                break
+            h.update(bloco)
+            restante -= len(bloco)
+        return h
+
+    def _ler_delta(self, arquivo):
+        """
+        Lê a parte nova do arquivo
+
+        Se o arquivo apenas cresceu desde a última leitura (todo o trecho já
+        processado continua idêntico), só os bytes acrescentados são lidos. Se
+        foi reescrito, todo o arquivo é lido e o diff é feito por rota. A
+        posição e o hash só avançam depois que o trecho lido é validado: um
+        arquivo inválido ou gravado pela metade é lido de novo na próxima vez.
+
+        Returns:
+            tuple: (DataFrame tipado, bool indicando leitura completa)
+        """
+        with open(arquivo, 'rb') as f:
+            tamanho = os.fstat(f.fileno()).st_size
+            h = None
+            if self._posicao > 0 and tamanho >= self._posicao:
+                h = self._hash_ate(f, self._posicao)
+                if h.digest() != self._assinatura:
+                    h = None
+
+            if h is not None:
+                cabecalho = self._cabecalho
+                posicao = self._posicao
+                f.seek(posicao)
+                novos = f.read(tamanho - posicao)
+                completo = False
+            else:
+                f.seek(0)
+                conteudo = f.read()
+                posicao = conteudo.find(b'\n') + 1
+                cabecalho = conteudo[:posicao]
+                novos = conteudo[posicao:]
+                h = hashlib.blake2b(cabecalho, digest_size=16)
+                completo = True
+
+        # Considerar apenas linhas completas; o restante entra na próxima leitura
+        novos = novos[:novos.rfind(b'\n') + 1]
+
+        df = None
+        if novos.strip():
+            df, _ = ler_csv(io.BytesIO(cabecalho + novos), ESQUEMA_CONFERENCIA)
+            invalidos = {}
+            ESQUEMA_CONFERENCIA.aplicar_tipos(df, invalidos)
+            valido, mensagem = validar_df_conferencia(df, invalidos)
+            if not valido and 'Não há rotas validadas' not in mensagem:
+                raise ValueError(mensagem)
+
+        h.update(novos)
+        self._cabecalho = cabecalho
+        self._posicao = posicao + len(novos)
+        self._assinatura = h.digest()
+        return df, completo
+
+    # ===== Contribuições por rota =====
+
+    def _contribuicao(self, rota, linha):
+        """Calcula a parcela da rota nos agregados a partir da sua linha na conferência"""
+        validada = linha['AT/TO Validation Status'] == 'Validated'
+        no_piso = not validada or self.status_assignment.get(rota) in STATUS_PISO
+        inicio = linha.get('Validation Start Time')
+        fim = linha.get('Validation End Time')
+        return {
+            'pedidos_iniciais': _numero(linha.get('Total Initial Orders Inside AT/TO')),
+            'pedidos_finais': _numero(linha['Total Final Orders Inside AT/TO']),
+            'expedida': not no_piso,
+            'no_piso': no_piso,
+            'hora': fim.floor('h') if not no_piso and pd.notna(fim) else None,
+            'operador': linha.get('Validation Operator') if not no_piso else None,
+            'inicio': inicio.value if pd.notna(inicio) else None,
+            'fim': fim.value if pd.notna(fim) else None,
+        }
+
+    def _aplicar(self, rota, contrib, sinal):
+        """Soma (sinal=1) ou remove (sinal=-1) a parcela de uma rota"""
+        self.pedidos_programados += sinal * contrib['pedidos_iniciais']
+
+        if contrib['no_piso']:
+            if sinal > 0:
+                self.rotas_piso.add(rota)
+            else:
+                self.rotas_piso.discard(rota)
+            return
+
+        self.rotas_expedidas += sinal
+        self.pedidos_expedidos += sinal * contrib['pedidos_finais']
+
+        if contrib['hora'] is not None:
+            bucket = self.por_hora[contrib['hora']]
+            bucket[0] += sinal
+            bucket[1] += sinal * contrib['pedidos_finais']
+            if bucket[0] == 0:
+                del self.por_hora[contrib['hora']]
+
+        inicio, fim = contrib['inicio'], contrib['fim']
+        if inicio is not None:
+            _atualizar_ordenada(self.inicios_expedicao, inicio, sinal)
+        if fim is not None:
+            _atualizar_ordenada(self.fins_expedicao, fim, sinal)
+
+        if inicio is not None and fim is not None:
+            self.soma_conferencia += sinal * (fim - inicio)
+            self.conferencias += sinal
+
+        operador = contrib['operador']
+        if isinstance(operador, str) and inicio is not None and fim is not None:
+            if sinal > 0:
+                self.operadores[operador].adicionar(inicio, fim)
+            else:
+                self.operadores[operador].remover(inicio, fim)
+                if not self.operadores[operador].inicios:
+                    del self.operadores[operador]
+
+    def atualizar(self, arquivo):
+        """
+        Incorpora a exportação atual da conferência
+
+        Returns:
+            dict com estatísticas da atualização (linhas lidas, rotas alteradas,
+            rotas removidas, leitura completa e tempo gasto)
+        """
+        inicio = time.perf_counter()
+        df, completo = self._ler_delta(arquivo)
+
+        alteradas = 0
+        removidas = 0
+        linhas = 0
+        vistas = set()
+
+        if df is not None and not df.empty:
+            linhas = len(df)
+            df = df.dropna(subset=['AT/TO']).drop_duplicates(subset=['AT/TO'], keep='last')
+            colunas = [col for col in COLUNAS_ROTA if col in df.columns]
+            hashes = pd.util.hash_pandas_object(df[colunas], index=False).to_numpy()
+            rotas = df['AT/TO'].to_numpy()
+            vistas.update(rotas)
+
+            # Apenas rotas novas ou com conteúdo diferente são reprocessadas
+            mudou = np.fromiter(
+                (self.hashes.get(rota) != h for rota, h in zip(rotas, hashes)),
+                dtype=bool, count=len(rotas)
+            )
+            for (_, linha), h in zip(df[mudou].iterrows(), hashes[mudou]):
+                rota = linha['AT/TO']
+                anterior = self.contribuicoes.get(rota)
+                if anterior is not None:
+                    self._aplicar(rota, anterior, -1)
+                contrib = self._contribuicao(rota, linha)
+                self._aplicar(rota, contrib, 1)
+                self.contribuicoes[rota] = contrib
+                self.hashes[rota] = h
+                alteradas += 1
+
+        # Numa reexportação completa, rotas que sumiram do arquivo deixam de contar
+        if completo:
+            for rota in [r for r in self.contribuicoes if r not in vistas]:
+                self._aplicar(rota, self.contribuicoes.pop(rota), -1)
+                self.hashes.pop(rota, None)
+                removidas += 1
+
+        return {
+            'linhas_lidas': linhas,
+            'rotas_alteradas': alteradas,
+            'rotas_removidas': removidas,
+            'leitura_completa': completo,
+            'tempo': time.perf_counter() - inicio,
+        }
+
+    # ===== Resultados =====
+
+    def resumo(self):
+        """DataFrame Métrica/Valor no mesmo formato do resumo do relatório"""
+        inicio = pd.Timestamp(self.inicios_expedicao[0]) if self.inicios_expedicao else pd.NaT
+        fim = pd.Timestamp(self.fins_expedicao[-1]) if self.fins_expedicao else pd.NaT
+        media = pd.Timedelta(self.soma_conferencia / self.conferencias, unit='ns') if self.conferencias else pd.NaT
+        return pd.DataFrame([
+            {'Métrica': 'Quantidade de rotas programadas', 'Valor': len(self.contribuicoes)},
+            {'Métrica': 'Quantidade de rotas expedidas', 'Valor': self.rotas_expedidas},
+            {'Métrica': 'Quantidade de pedidos programados', 'Valor': int(self.pedidos_programados)},
+            {'Métrica': 'Quantidade de pedidos expedidos', 'Valor': int(self.pedidos_expedidos)},
+            {'Métrica': 'Quantidade de rotas que ficaram no piso', 'Valor': len(self.rotas_piso)},
+            {'Métrica': 'Horário de início da expedição', 'Valor': format_hms(inicio)},
+            {'Métrica': 'Horário de fim da expedição', 'Valor': format_hms(fim)},
+            {'Métrica': 'Média de tempo de giro de bancada', 'Valor': format_hms(media)},
+        ])
+
+    def expedidos_por_hora(self):
+        """DataFrame com rotas e pedidos expedidos por hora"""
+        horas = sorted(self.por_hora)
+        return pd.DataFrame({
+            'Hora': formatar_intervalo_hora(pd.Series(horas, dtype='datetime64[ns]')).to_numpy(),
+            'Rotas Expedidas': [self.por_hora[hora][0] for hora in horas],
+            'Pedidos Expedidos': [int(self.por_hora[hora][1]) for hora in horas],
+        }, columns=['Hora', 'Rotas Expedidas', 'Pedidos Expedidos'])
+
+    def metricas_operador(self):
+        """DataFrame com tempo médio de conferência e ociosidade por operador, com a 'Média Geral'"""
+        operadores = sorted(self.operadores)
+        medias = [self.operadores[operador].medias() for operador in operadores]
+        return montar_metricas_operador(
+            pd.Series(operadores, dtype=object),
+            pd.Series([m[0] for m in medias], dtype='timedelta64[ns]'),
+            pd.Series([m[1] for m in medias], dtype='timedelta64[ns]'),
+        )
+
+
+def _numero(valor):
+    """Converte o valor para float, usando 0 para ausentes ou inválidos"""
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if np.isnan(valor) else valor
+
+
+def _atualizar_ordenada(lista, valor, sinal):
+    """Insere ou remove um valor de uma lista mantida ordenada"""
+    if sinal > 0:
+        insort(lista, valor)
+    else:
+        del lista[bisect_left(lista, valor)]
+
+
+def acompanhar(conferencia_file, expedicao_files, intervalo=60):
+    """
+    Acompanha a exportação de conferência, atualizando os agregados a cada mudança
+
+    Args:
+        conferencia_file: caminho do CSV de conferência reexportado durante o turno
+        expedicao_files: arquivos de expedição (assignment) do turno
+        intervalo: segundos entre verificações do arquivo
+    """
+    reducao, expedicoes = reduzir_expedicoes(expedicao_files)
+    for expedicao in expedicoes:
+        if not expedicao.valido:
+            raise ValueError(f"Erro no arquivo {expedicao.nome}: {expedicao.mensagem}")
+    df_expedicao = reducao.resultado() if expedicao_files else None
+
+    acompanhamento = AcompanhamentoConferencia(df_expedicao)
+    assinatura = None
+
+    print(f"📡 Acompanhando {os.path.basename(conferencia_file)} a cada {intervalo}s (Ctrl+C para encerrar)")
+    try:
+        while True:
+            try:
+                stat = os.stat(conferencia_file)
+                atual = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                atual = None
+
+            if atual is not None and atual != assinatura:
+                try:
+                    estatisticas = acompanhamento.atualizar(conferencia_file)
+                except Exception as e:
+                    # Exportação inválida ou ainda sendo gravada: tentar de novo no próximo ciclo
+                    print(f"\n⚠️ {time.strftime('%H:%M:%S')} - erro ao ler a conferência, nova tentativa "
+                          f"em {intervalo}s: {str(e)}")
+                    time.sleep(intervalo)
+                    continue
+                assinatura = atual
+                modo = 'completa' if estatisticas['leitura_completa'] else 'incremental'
+                print(f"\n🔄 {time.strftime('%H:%M:%S')} - leitura {modo}: "
+                      f"{estatisticas['linhas_lidas']} linha(s), "
+                      f"{estatisticas['rotas_alteradas']} rota(s) alterada(s), "
+                      f"{estatisticas['rotas_removidas']} removida(s) em {estatisticas['tempo']:.2f}s")
+                print(acompanhamento.resumo().to_string(index=False))
+                print(acompanhamento.expedidos_por_hora().to_string(index=False))
+
+            time.sleep(intervalo)
+    except KeyboardInterrupt:
+        print("\n⏹️ Acompanhamento encerrado")
+
+    return acompanhamento
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Acompanhamento ao vivo da conferência')
+    parser.add_argument('--conferencia', required=True, help='CSV de conferência reexportado durante o turno')
+    parser.add_argument('--expedicao', nargs='+', default=[], help='CSVs de expedição (assignment)')
+    parser.add_argument('--intervalo', type=int, default=60, help='Segundos entre verificações do arquivo')
+    args = parser.parse_args()
+
+    acompanhar(args.conferencia, args.expedicao, args.intervalo)
@@ -1,21 +1,24 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, KeepTogether, PageBreak, Image
-from reportlab.lib.units import cm
 import re
-import openpyxl
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
 import os
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Usar backend não interativo
 import io
-from reportlab.lib.enums import TA_CENTER
-from config_manager import ConfigManager
+import time
+import sys
+import importlib
+from copy import copy
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from functools import partial
+from config_manager import get_config_manager
+from env_config import get_env_config
+from ingestao import carregar_conferencia, get_arquivos_validados
+from esquemas import detectar_coluna_veiculo, memoria_df
+from cache_exportacoes import get_cache_exportacoes
+from reducao_expedicao import reduzir_expedicoes, validar_e_reduzir_expedicao, COLUNA_PACOTES
+from modelo_relatorio import TabelaRelatorio, RelatorioExpedicao
+from progresso import ProgressoRelatorio, ProcessamentoCancelado
+from instrumentacao import RegistroExecucao, PerfilamentoExecucao
 
 def format_hms(value):
     if pd.isnull(value):
@@ -30,6 +33,99 @@ def format_hms(value):
         return f'{hours:02}:{minutes:02}:{seconds:02}'
     return str(value)
 
+# Textos '00' a '99' usados na formatação vetorizada
+_DOIS_DIGITOS = np.array([f'{i:02}' for i in range(100)], dtype=object)
+
+def _dois_digitos(valores):
+    """Inteiros como texto com pelo menos dois dígitos, como f'{valor:02}'"""
+    texto = np.empty(len(valores), dtype=object)
+    comuns = (valores >= 0) & (valores < 100)
+    texto[comuns] = _DOIS_DIGITOS[valores[comuns]]
+    texto[~comuns] = [f'{valor:02}' for valor in valores[~comuns]]
+    return texto
+
+def formatar_hms(valores):
+    """
+    Versão vetorizada de format_hms para Series de timedelta64 ou datetime64
+    
+    Durações viram 'HH:MM:SS' (com horas acima de 24 e o mesmo tratamento de
+    format_hms para valores negativos); datas viram o horário do dia. Valores
+    ausentes viram ''. Outros tipos são formatados valor a valor.
+    
+    Returns:
+        Series de textos com o mesmo índice da entrada
+    """
+    valores = pd.Series(valores)
+    if pd.api.types.is_timedelta64_dtype(valores):
+        ns = valores.to_numpy(dtype='m8[ns]').view('i8')
+        # int(total_seconds()): truncamento em direção a zero
+        segundos = np.sign(ns) * (np.abs(ns) // 10**9)
+    elif pd.api.types.is_datetime64_any_dtype(valores):
+        segundos = (valores - valores.dt.normalize()).to_numpy(dtype='m8[ns]').view('i8') // 10**9
+    else:
+        return valores.map(format_hms)
+    
+    ausentes = valores.isna().to_numpy()
+    segundos = np.where(ausentes, 0, segundos)
+    texto = (_dois_digitos(segundos // 3600) + ':' +
+             _DOIS_DIGITOS[(segundos % 3600) // 60] + ':' +
+             _DOIS_DIGITOS[segundos % 60])
+    texto[ausentes] = ''
+    return pd.Series(texto, index=valores.index, dtype=object)
+
+def formatar_intervalo_hora(horas):
+    """Horários (datetime64) como 'HH:MM às HH:MM', do horário até uma hora depois"""
+    horas = pd.Series(horas)
+    inicio = formatar_hms(horas).str[:5]
+    fim = formatar_hms(horas + pd.Timedelta(hours=1)).str[:5]
+    return (inicio + ' às ' + fim).where(horas.notna(), '')
+
+def extrair_nome_operador(op):
+    # Remove prefixo [opsXXXXX] se existir e aplica title case
+    return re.sub(r'^\[.*?\]', '', op).strip().title()
+
+def extrair_nomes_operadores(operadores):
+    """Versão vetorizada de extrair_nome_operador para uma Series de nomes"""
+    return operadores.str.replace(r'^\[.*?\]', '', regex=True).str.strip().str.title()
+
+def truncar_segundos(duracoes):
+    """Trunca uma Series de Timedelta para segundos inteiros (a precisão exibida no relatório)"""
+    return pd.to_timedelta(np.trunc(duracoes.dt.total_seconds()), unit='s')
+
+# Bibliotecas dos renderizadores (gráficos, PDF e Excel). São importadas apenas
+# pelo renderizador que as usa, para não pesar na abertura da interface
+MODULOS_RENDERIZACAO = ('matplotlib.pyplot', 'reportlab.platypus', 'openpyxl')
+
+
+def _pyplot():
+    """matplotlib.pyplot com backend não interativo, importado no primeiro uso"""
+    import matplotlib
+    matplotlib.use('Agg')  # Usar backend não interativo
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def preaquecer_renderizadores():
+    """
+    Importa antecipadamente as bibliotecas dos renderizadores
+
+    Pensado para rodar em segundo plano (ex.: logo após a interface abrir),
+    de modo que o primeiro relatório não pague o custo das importações.
+
+    Returns:
+        dict: módulo -> tempo de importação em segundos
+    """
+    tempos = {}
+    for modulo in MODULOS_RENDERIZACAO:
+        inicio = time.perf_counter()
+        if modulo == 'matplotlib.pyplot':
+            _pyplot()
+        else:
+            importlib.import_module(modulo)
+        tempos[modulo] = time.perf_counter() - inicio
+    return tempos
+
+
 def criar_grafico_hora_a_hora(df):
     """
     Cria gráficos de barras para rotas e pedidos expedidos por hora
@@ -71,6 +167,8 @@ def criar_grafico_hora_a_hora(df):
     df['Rotas_Acumulado'] = df['Rotas Expedidas'].cumsum()
     df['Pedidos_Acumulado'] = df['Pedidos Expedidos'].cumsum()
     
+    plt = _pyplot()
+
     # Configurar estilo do gráfico para um visual mais moderno
     plt.style.use('seaborn-v0_8-whitegrid')
     
@@ -275,112 +373,70 @@ def criar_grafico_hora_a_hora(df):
     
     return graficos_buffer
 
-def validar_arquivo_conferencia(arquivo):
+def validar_arquivo_conferencia(arquivo, cancelado=None):
     """
-    Valida o arquivo de conferência antes do processamento.
+    Valida o arquivo de conferência por completo antes do processamento.
+
+    O arquivo é lido em blocos e a leitura para no primeiro valor inválido.
+    O DataFrame tipado fica guardado e é usado por calcular_relatorio sem
+    uma nova leitura. Para uma resposta imediata, use
+    ingestao.validar_amostra_conferencia.
     
     Args:
         arquivo: caminho do arquivo CSV de conferência
+        cancelado: Event que interrompe a leitura entre blocos (ProcessamentoCancelado)
         
     Returns:
         tuple: (bool, str) - (válido, mensagem de erro)
     """
-    try:
-        # Tentar ler o arquivo
-        df = pd.read_csv(arquivo, dtype=str)
-        
-        # Validar colunas necessárias
-        colunas_necessarias = [
-            'AT/TO',
-            'AT/TO Validation Status',
-            'Total Final Orders Inside AT/TO',
-            'Validation Start Time',
-            'Validation End Time'
-        ]
-        
-        colunas_faltantes = [col for col in colunas_necessarias if col not in df.columns]
-        if colunas_faltantes:
-            return False, f"Arquivo não contém as colunas necessárias: {', '.join(colunas_faltantes)}"
-            
-        # Validar se há dados
-        if df.empty:
-            return False, "O arquivo está vazio"
-            
-        # Validar se há rotas validadas
-        rotas_validadas = df[df['AT/TO Validation Status'] == 'Validated']
-        if rotas_validadas.empty:
-            return False, "Não há rotas validadas no arquivo"
-            
-        # Validar formato das datas
-        for col in ['Validation Start Time', 'Validation End Time']:
-            try:
-                pd.to_datetime(df[col], errors='raise')
-            except:
-                return False, f"Formato de data inválido na coluna {col}"
-                
-        # Validar formato dos números
-        try:
-            pd.to_numeric(df['Total Final Orders Inside AT/TO'], errors='raise')
-        except:
-            return False, "Formato inválido na coluna de quantidade de pedidos"
-            
-        return True, "Arquivo válido"
-        
-    except pd.errors.EmptyDataError:
-        return False, "O arquivo está vazio"
-    except pd.errors.ParserError:
-        return False, "Erro ao processar o arquivo. Verifique se o formato está correto (CSV)"
-    except FileNotFoundError:
-        return False, "Arquivo não encontrado"
-    except Exception as e:
-        return False, f"Erro ao validar arquivo: {str(e)}"
+    resultado = carregar_conferencia(arquivo, cancelado)
+    if resultado.valido:
+        get_arquivos_validados().guardar('conferencia', arquivo, resultado)
+    return resultado.valido, resultado.mensagem
 
-def validar_arquivo_expedicao(arquivo):
+def validar_arquivo_expedicao(arquivo, cancelado=None):
     """
-    Valida o arquivo de expedição antes do processamento.
+    Valida um arquivo de expedição por completo antes do processamento.
+
+    A redução do arquivo aos fatos por rota fica guardada e é usada por
+    calcular_relatorio sem uma nova leitura. Para uma resposta imediata, use
+    ingestao.validar_amostra_expedicao.
     
     Args:
         arquivo: caminho do arquivo CSV de expedição
+        cancelado: Event que interrompe a leitura entre blocos (ProcessamentoCancelado)
         
     Returns:
         tuple: (bool, str) - (válido, mensagem de erro)
     """
-    try:
-        # Tentar ler o arquivo
-        df = pd.read_csv(arquivo, dtype=str)
-        
-        # Validar colunas necessárias
-        colunas_necessarias = [
-            'Task ID',
-            'Agency',
-            'Driver name',
-            'SPX tracking num',
-            'Status'  # Adicionada coluna de status como obrigatória
-        ]
-        
-        colunas_faltantes = [col for col in colunas_necessarias if col not in df.columns]
-        if colunas_faltantes:
-            return False, f"Arquivo não contém as colunas necessárias: {', '.join(colunas_faltantes)}"
-            
-        # Validar se há dados
-        if df.empty:
-            return False, "O arquivo está vazio"
-            
-        return True, "Arquivo válido"
-        
-    except pd.errors.EmptyDataError:
-        return False, "O arquivo está vazio"
-    except pd.errors.ParserError:
-        return False, "Erro ao processar o arquivo. Verifique se o formato está correto (CSV)"
-    except FileNotFoundError:
-        return False, "Arquivo não encontrado"
-    except Exception as e:
-        return False, f"Erro ao validar arquivo: {str(e)}"
+    resultado = validar_e_reduzir_expedicao(arquivo, cancelado=cancelado)
+    return resultado.valido, resultado.mensagem
+
+def normalizar_delivery_date(delivery_date):
+    """
+    Converte um valor de Delivery Date para o formato YYYY-MM-DD
+    
+    Returns:
+        A data formatada, None se o texto não puder ser convertido,
+        ou o próprio valor quando não for texto nem Timestamp
+    """
+    if isinstance(delivery_date, pd.Timestamp):
+        return delivery_date.strftime('%Y-%m-%d')
+    if isinstance(delivery_date, str):
+        try:
+            # Tentar converter string para data
+            return pd.to_datetime(delivery_date).strftime('%Y-%m-%d')
+        except:
+            return None
+    return delivery_date
 
 def identificar_rotas_outras_janelas(df_assignment, current_window_key):
     """
     Identifica rotas que pertencem a outras janelas de carregamento
     
+    A janela é calculada uma única vez para cada Delivery Date distinto e
+    o resultado é mapeado de volta para todas as linhas do DataFrame.
+    
     Args:
         df_assignment: DataFrame com os dados do arquivo de assignment
         current_window_key: Chave da janela atual (MANHA, TARDE, NOITE)
@@ -388,38 +444,53 @@ def identificar_rotas_outras_janelas(df_assignment, current_window_key):
     Returns:
         DataFrame com coluna adicional indicando se a rota é de outra janela
     """
-    config_manager = ConfigManager()
+    config_manager = get_config_manager()
     
     # Adicionar coluna para marcar rotas de outras janelas
     df = df_assignment.copy()
     df['janela_carregamento'] = ''
     df['outra_janela'] = False
     
-    # Processar cada rota
-    for idx, row in df.iterrows():
-        delivery_date = row['Delivery Date'] if 'Delivery Date' in row else None
-        
-        if delivery_date:
-            # Converter para formato YYYY-MM-DD
-            if isinstance(delivery_date, pd.Timestamp):
-                delivery_date = delivery_date.strftime('%Y-%m-%d')
-            elif isinstance(delivery_date, str):
-                try:
-                    # Tentar converter string para data
-                    delivery_date = pd.to_datetime(delivery_date).strftime('%Y-%m-%d')
-                except:
-                    delivery_date = None
-        
+    if 'Delivery Date' not in df.columns or df.empty:
+        return df
+    
+    # Códigos de cada linha apontando para a lista de datas distintas (NaN incluído)
+    codigos, datas_unicas = pd.factorize(df['Delivery Date'], use_na_sentinel=False)
+    
+    nomes_janela = np.full(len(datas_unicas), '', dtype=object)
+    outras_janelas = np.zeros(len(datas_unicas), dtype=bool)
+    
+    for i, delivery_date in enumerate(datas_unicas):
+        if not delivery_date:
+            continue
+        delivery_date = normalizar_delivery_date(delivery_date)
         if delivery_date:
             window_key, is_other_window = config_manager.get_window_by_delivery_date(
                 delivery_date,
                 current_window_key
             )
-            df.at[idx, 'janela_carregamento'] = config_manager.get_window_name(window_key)
-            df.at[idx, 'outra_janela'] = is_other_window
+            nomes_janela[i] = config_manager.get_window_name(window_key)
+            outras_janelas[i] = is_other_window
+    
+    df['janela_carregamento'] = nomes_janela[codigos]
+    df['outra_janela'] = outras_janelas[codigos]
     
     return df
 
+def indexar_status_rotas(df_expedicao):
+    """
+    Cria o índice Task ID -> Status da primeira ocorrência de cada rota no assignment
+    
+    Returns:
+        Series indexada por Task ID
+    """
+    return (
+        df_expedicao[['Task ID', 'Status']]
+        .dropna(subset=['Task ID'])
+        .drop_duplicates(subset=['Task ID'])
+        .set_index('Task ID')['Status']
+    )
+
 def identificar_rotas_no_piso(df_auditoria, df_expedicao):
     """
     Identifica rotas que estão no piso com base nas seguintes regras:
@@ -441,776 +512,940 @@ def identificar_rotas_no_piso(df_auditoria, df_expedicao):
     # 1. Identificar rotas não validadas na conferência
     rotas_nao_validadas = set(df_auditoria[df_auditoria['AT/TO Validation Status'] != 'Validated']['AT/TO'])
     rotas_no_piso.update(rotas_nao_validadas)
-    for rota in rotas_nao_validadas:
-        status_rotas[rota] = 'nao_validada'
+    status_rotas.update(dict.fromkeys(rotas_nao_validadas, 'nao_validada'))
     
     # 2. Identificar rotas validadas na conferência mas com status "Processing" ou "Processed" no assignment
     rotas_validadas = set(df_auditoria[df_auditoria['AT/TO Validation Status'] == 'Validated']['AT/TO'])
     status_validos = ['Processing', 'Processed']
     
-    for rota in rotas_validadas:
-        # Verificar se a rota existe no assignment e tem status válido
-        if rota in df_expedicao['Task ID'].values:
-            status_rota = df_expedicao[df_expedicao['Task ID'] == rota]['Status'].iloc[0]
-            if status_rota in status_validos:
-                rotas_no_piso.add(rota)
-                status_rotas[rota] = 'validada'
+    # Índice Task ID -> Status da primeira ocorrência, construído uma única vez
+    status_por_rota = indexar_status_rotas(df_expedicao)
+    
+    # Rotas validadas que existem no assignment com status de piso
+    status_validadas = status_por_rota.reindex(pd.Index(list(rotas_validadas), dtype=object))
+    rotas_validadas_no_piso = status_validadas.index[status_validadas.isin(status_validos)]
+    
+    rotas_no_piso.update(rotas_validadas_no_piso)
+    status_rotas.update(dict.fromkeys(rotas_validadas_no_piso, 'validada'))
     
     return rotas_no_piso, status_rotas
 
-def main(expedicao_files, conferencia_file, output_dir, info_adicional, current_window_key="MANHA"):
+def gerar_csv(csv_path, relatorio, info_adicional):
+    """Exporta todas as tabelas do relatório para um único CSV, separadas por seções"""
+    (resumo_df, rotas_por_agencia, rotas_por_veiculo, expedidos_por_hora,
+     metricas_operador_df, rotas_nao_conferidas_df) = relatorio.dataframes()
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        resumo_df.to_csv(f, index=False)
+        f.write('\n')
+        f.write('Rotas expedidas por transportadora\n')
+        rotas_por_agencia.to_csv(f, index=False)
+        f.write('\n')
+        f.write('Rotas expedidas por tipo de veículo\n')
+        rotas_por_veiculo.to_csv(f, index=False)
+        f.write('\n')
+        f.write('Rotas e pedidos expedidos por hora\n')
+        expedidos_por_hora.to_csv(f, index=False)
+        f.write('\n')
+        f.write('Média de tempo entre uma conferência e outra por usuário\n')
+        metricas_operador_df.to_csv(f, index=False)
+        f.write('\n')
+        f.write('Rotas NS - ficaram no piso\n')
+        rotas_nao_conferidas_df.to_csv(f, index=False)
+        if info_adicional.strip():
+            f.write('\nInformações adicionais sobre o fechamento da expedição:\n')
+            f.write(info_adicional.strip() + '\n')
+
+    print(f'Arquivo {csv_path} gerado com sucesso!')
+
+# Tabelas do PDF com mais linhas que isto são paginadas (LongTable com o cabeçalho
+# repetido em cada página); as menores ficam inteiras na mesma página do título
+LINHAS_TABELA_INTEIRA_PDF = 30
+
+# Entrelinha padrão das células do ReportLab (FONTSIZE não a altera) e padding vertical
+ENTRELINHA_TABELA_PDF = 12
+PADDING_VERTICAL_TABELA_PDF = 3 + 3
+
+def _dados_tabela_pdf(df):
+    """Cabeçalho e linhas do DataFrame como texto, no formato de Table do ReportLab"""
+    return [list(df.columns)] + df.astype(str).values.tolist()
+
+def _alturas_linhas_pdf(dados):
     """
-    Função principal para gerar os relatórios
+    Altura de cada linha da tabela, igual à que o ReportLab calcularia
+
+    Informadas à LongTable, evitam que as alturas das linhas restantes sejam
+    recalculadas a cada quebra de página (custo quadrático no total de linhas).
+    """
+    return [
+        ENTRELINHA_TABELA_PDF * max((str(valor).count('\n') + 1 for valor in linha), default=1)
+        + PADDING_VERTICAL_TABELA_PDF
+        for linha in dados
+    ]
+
+def gerar_pdf(pdf_path, relatorio, info_adicional):
+    """Gera o relatório em PDF (ReportLab) com as tabelas e os gráficos hora a hora"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import cm
+    from reportlab.platypus import (SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph, Spacer,
+                                    KeepTogether, PageBreak, CondPageBreak, Image)
+
+    (resumo_df, rotas_por_agencia, rotas_por_veiculo, expedidos_por_hora,
+     metricas_operador_df, rotas_nao_conferidas_df) = relatorio.dataframes()
+    graficos_buffer = [io.BytesIO(png) for png in relatorio.graficos]
+
+    # Cores Shopee
+    SHOPEE_ORANGE = colors.HexColor('#FF5722')
+    SHOPEE_BG = colors.HexColor('#F5F5F5')
+    SHOPEE_TEXT = colors.HexColor('#222222')
+
+    # Estilos das tabelas, compartilhados por todas as seções
+    def estilo_tabela(alinhamento):
+        return [
+            ('BACKGROUND', (0,0), (-1,0), SHOPEE_ORANGE),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0,0), (-1,0), 11),
+            ('FONTSIZE', (0,1), (-1,-1), 10),
+            ('ALIGN', (0,0), (-1,-1), alinhamento),
+            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, SHOPEE_BG]),
+            ('GRID', (0,0), (-1,-1), 0.25, colors.lightgrey),
+        ]
+    estilo_resumo = TableStyle(estilo_tabela('CENTER'))
+    # Destaca a última linha (totais ou média geral)
+    estilo_com_total = TableStyle(estilo_tabela('LEFT') + [
+        ('BACKGROUND', (0,-1), (-1,-1), colors.HexColor('#F5F5F5')),
+        ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
+        ('LINEABOVE', (0,-1), (-1,-1), 1, colors.HexColor('#BBBBBB')),
+        ('LINEBELOW', (0,-1), (-1,-1), 1, colors.HexColor('#BBBBBB')),
+    ])
+
+    # Criar PDF
+    doc = SimpleDocTemplate(pdf_path, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
+    elements = []
+
+    styles = getSampleStyleSheet()
+    style_title = ParagraphStyle(
+        'ShopeeTitle',
+        parent=styles['Heading1'],
+        fontSize=22,
+        textColor=SHOPEE_ORANGE,
+        spaceAfter=18,
+        alignment=TA_CENTER  # Centraliza o texto
+    )
+    style_section = ParagraphStyle(
+        'ShopeeSection',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=SHOPEE_ORANGE,
+        spaceAfter=12,
+        alignment=TA_CENTER  # Centraliza o título da seção
+    )
+    style_normal = ParagraphStyle('ShopeeNormal', parent=styles['Normal'], fontSize=10, textColor=SHOPEE_TEXT)
+
+    def secao(titulo, df, estilo, espaco_titulo=0, espaco_final=18):
+        """Título e tabela: inteiros na mesma página se a tabela for pequena, senão paginados"""
+        dados = _dados_tabela_pdf(df)
+        conteudo = [Paragraph(titulo, style_section)]
+        if espaco_titulo:
+            conteudo.append(Spacer(1, espaco_titulo))
+        if len(dados) - 1 <= LINHAS_TABELA_INTEIRA_PDF:
+            table = Table(dados, hAlign='CENTER')
+            table.setStyle(estilo)
+            elements.append(KeepTogether(conteudo + [table, Spacer(1, espaco_final)]))
+        else:
+            # Sem KeepTogether: o ReportLab tentaria encaixar a tabela inteira em cada página
+            table = LongTable(dados, rowHeights=_alturas_linhas_pdf(dados), hAlign='CENTER', repeatRows=1)
+            table.setStyle(estilo)
+            elements.append(CondPageBreak(6*cm))  # não deixa o título sozinho no fim da página
+            elements.extend(conteudo + [table, Spacer(1, espaco_final)])
+
+    # Título principal
+    elements.append(Paragraph('Relatório de Expedição - Shopee', style_title))
+
+    # Adicionar turno selecionado
+    if relatorio.descricao_janela:
+        elements.append(Paragraph(relatorio.descricao_janela, style_section))
+
+    elements.append(Spacer(1, 18))
+
+    secao('Métricas Gerais', resumo_df, estilo_resumo)
+    secao('Rotas Expedidas por Transportadora', rotas_por_agencia, estilo_com_total)
+    secao('Rotas Expedidas por Tipo de Veículo', rotas_por_veiculo, estilo_com_total)
+
+    # Seção: Rotas e Pedidos Expedidos por Hora
+    # Usar PageBreak para garantir que esta seção comece em uma nova página
+    elements.append(PageBreak())
+    secao('Rotas e Pedidos Expedidos por Hora', expedidos_por_hora, estilo_com_total,
+          espaco_titulo=10, espaco_final=20)
+
+    # Adicionar gráficos na mesma página
+    if graficos_buffer and len(graficos_buffer) > 0:
+        # Adicionar gráfico logo após a tabela
+        img_width = 18 * cm
+        img_height = 9 * cm
+        elements.append(Image(graficos_buffer[0], width=img_width, height=img_height))
+        elements.append(Spacer(1, 18))
+
+    secao('Tempo Médio de Conferência e Ociosidade por Operador', metricas_operador_df, estilo_com_total)
+    secao('Rotas NS - Ficaram no Piso', rotas_nao_conferidas_df, estilo_com_total)
+
+    # Adicionar informações adicionais ao PDF
+    if info_adicional.strip():
+        elements.append(PageBreak())
+        elements.append(Paragraph('Informações adicionais sobre o fechamento da expedição:', style_section))
+        elements.append(Paragraph(info_adicional.strip().replace('\n', '<br/>'), style_normal))
+
+    # Gerar PDF
+    print('Gerando PDF...')
+    doc.build(elements)
+    print(f'Relatório PDF gerado com sucesso: {pdf_path}')
+
+# Abas do Excel: (campo de RelatorioExpedicao, nome da aba, título exibido na primeira linha)
+ABAS_XLSX = (
+    ('resumo', 'Resumo', 'Métricas Gerais'),
+    ('rotas_por_agencia', 'Rotas por Transportadora', 'Rotas Expedidas por Transportadora'),
+    ('rotas_por_veiculo', 'Rotas por Tipo de Veículo', 'Rotas Expedidas por Tipo de Veículo'),
+    ('expedidos_por_hora', 'Hora a Hora', 'Rotas e Pedidos Expedidos por Hora'),
+    ('metricas_operador', 'Métricas por Operador', 'Tempo Médio de Conferência e Ociosidade por Operador'),
+    ('rotas_nao_conferidas', 'Rotas NS', 'Rotas NS - Ficaram no Piso'),
+)
+
+def _estilos_xlsx():
+    """Estilos nomeados do Excel, compartilhados por todas as células que os usam"""
+    from openpyxl.styles import NamedStyle, PatternFill, Font, Alignment, Border, Side
+    from openpyxl.styles.fonts import DEFAULT_FONT
+
+    left_align = Alignment(horizontal='left', vertical='center')
+    fina = Side(style='thin', color='DDDDDD')
+    border = Border(left=fina, right=fina, top=fina, bottom=fina)
+    media = Side(style='medium', color='BBBBBB')
+    thick_border = Border(top=media, bottom=media, left=fina, right=fina)
+    # Mesmo estilo que o pandas aplica ao cabeçalho de DataFrame.to_excel
+    fina_preta = Side(style='thin')
+
+    return (
+        NamedStyle('relatorio_titulo', font=Font(color='FF5722', bold=True, size=16), alignment=left_align),
+        NamedStyle('relatorio_cabecalho', font=Font(color='FFFFFF', bold=True), alignment=left_align, border=border,
+                   fill=PatternFill(start_color='FF5722', end_color='FF5722', fill_type='solid')),
+        NamedStyle('relatorio_dados', font=copy(DEFAULT_FONT), alignment=left_align, border=border),
+        NamedStyle('relatorio_total', font=Font(bold=True), alignment=left_align, border=thick_border,
+                   fill=PatternFill(start_color='F5F5F5', end_color='F5F5F5', fill_type='solid')),
+        NamedStyle('relatorio_info', font=Font(bold=True),
+                   border=Border(left=fina_preta, right=fina_preta, top=fina_preta, bottom=fina_preta),
+                   alignment=Alignment(horizontal='center', vertical='top')),
+    )
+
+def _valores_xlsx(array):
+    """Valores de uma coluna como lista Python, com vazios (NaN/None) como células em branco"""
+    valores = array.tolist()
+    vazios = pd.isna(array)
+    if vazios.any():
+        for i in np.flatnonzero(vazios):
+            valores[i] = None
+    return valores
+
+def _comprimento_maximo(valores):
+    """Maior comprimento do texto dos valores não vazios de uma coluna"""
+    textos = pd.Series(valores, dtype=object).dropna()
+    return int(textos.astype(str).str.len().max()) if len(textos) else 0
+
+def _linhas_total(primeira_coluna):
+    """Máscara das linhas de total (primeira célula 'Total...' ou 'Média geral')"""
+    textos = pd.Series(primeira_coluna, dtype=object).fillna('').astype(str).str.lower()
+    return (textos.str.startswith('total') | (textos == 'média geral')).to_numpy()
+
+def _escrever_aba_xlsx(wb, nome_aba, titulo, tabela):
+    """
+    Escreve uma aba do relatório em uma única passada
+
+    Larguras das colunas calculadas a partir dos dados antes da primeira linha
+    (exigência do modo streaming); título, cabeçalho, dados e linhas de total
+    recebem os estilos nomeados à medida que as linhas são escritas.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    ws = wb.create_sheet(nome_aba)
+    colunas = [_valores_xlsx(array) for array in tabela.valores]
+
+    for indice, (nome, valores) in enumerate(zip(tabela.colunas, colunas), 1):
+        largura = max(len(str(nome)), _comprimento_maximo(valores))
+        if indice == 1:
+            largura = max(largura, len(titulo))
+        ws.column_dimensions[get_column_letter(indice)].width = largura + 2
+
+    def linha(valores, estilo):
+        celulas = []
+        for valor in valores:
+            celula = WriteOnlyCell(ws, value=valor)
+            celula.style = estilo
+            celulas.append(celula)
+        return celulas
+
+    if len(tabela.colunas) > 1:
+        ws.merged_cells.add(f'A1:{get_column_letter(len(tabela.colunas))}1')
+    ws.append(linha([titulo], 'relatorio_titulo'))
+    ws.append([])
+    ws.append(linha(tabela.colunas, 'relatorio_cabecalho'))
+    if not colunas:
+        return
+    totais = _linhas_total(colunas[0])
+    for valores, total in zip(zip(*colunas), totais):
+        ws.append(linha(valores, 'relatorio_total' if total else 'relatorio_dados'))
+
+def gerar_xlsx(xlsx_path, relatorio, info_adicional):
+    """
+    Gera o arquivo Excel estilizado, com uma aba por tabela
+
+    Cada aba é escrita em uma única passada, com estilos nomeados. Quando a
+    maior tabela passa de EXCEL_STREAMING_LINHAS linhas (.env), a pasta de
+    trabalho é gravada em modo streaming (write_only), com memória constante.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    tabelas = relatorio.tabelas()
+    limite_streaming = get_env_config().get_int('EXCEL_STREAMING_LINHAS', 10000)
+    streaming = max(tabela.linhas for tabela in tabelas.values()) > limite_streaming
+
+    wb = Workbook(write_only=streaming)
+    if not streaming:
+        wb.remove(wb.active)
+    for estilo in _estilos_xlsx():
+        wb.add_named_style(estilo)
+
+    for campo, nome_aba, titulo in ABAS_XLSX:
+        _escrever_aba_xlsx(wb, nome_aba, titulo, tabelas[campo])
+
+    if info_adicional.strip():
+        ws = wb.create_sheet('Informações Adicionais')
+        cabecalho = WriteOnlyCell(ws, value='Informações adicionais sobre o fechamento da expedição:')
+        cabecalho.style = 'relatorio_info'
+        ws.append([cabecalho])
+        ws.append([info_adicional.strip()])
+
+    wb.save(xlsx_path)
+    print(f'Arquivo {xlsx_path} gerado com sucesso!')
+
+def _cronometrar_renderizador(funcao):
+    """Executa um renderizador e retorna (tempo em segundos, tempo de CPU da thread, exceção ou None)"""
+    inicio = time.perf_counter()
+    inicio_cpu = time.thread_time()
+    erro = None
+    try:
+        funcao()
+    except Exception as e:
+        erro = e
+    return time.perf_counter() - inicio, time.thread_time() - inicio_cpu, erro
+
+def executar_renderizadores(renderizadores, em_processos=None, ao_concluir=None):
+    """
+    Executa os renderizadores em paralelo
+    
+    Por padrão cada renderizador roda em uma thread. Com RENDERIZACAO_PROCESSOS
+    no .env, cada um roda em um processo, o que evita a disputa pelo GIL entre
+    ReportLab e openpyxl em máquinas com vários núcleos (exceto no executável
+    gerado pelo PyInstaller, que usa sempre threads). A falha de um
+    renderizador não interrompe os demais.
+    
+    Args:
+        renderizadores: dict nome -> função sem argumentos que gera o arquivo
+        em_processos: força o uso de processos (True) ou threads (False)
+        ao_concluir: função chamada com o nome de cada renderizador que termina
+    
+    Returns:
+        dict nome -> (tempo em segundos, tempo de CPU em segundos, exceção ou None)
+    """
+    if em_processos is None:
+        em_processos = get_env_config().get_bool('RENDERIZACAO_PROCESSOS', False)
+    if getattr(sys, 'frozen', False):
+        em_processos = False
+    
+    executor = ProcessPoolExecutor if em_processos else ThreadPoolExecutor
+    with executor(max_workers=len(renderizadores)) as pool:
+        futuros = {nome: pool.submit(_cronometrar_renderizador, funcao) for nome, funcao in renderizadores.items()}
+        if ao_concluir is not None:
+            nomes = {futuro: nome for nome, futuro in futuros.items()}
+            for futuro in as_completed(nomes):
+                ao_concluir(nomes[futuro])
+    
+    resultados = {}
+    for nome, futuro in futuros.items():
+        try:
+            resultados[nome] = futuro.result()
+        except Exception as e:  # processo do renderizador encerrado inesperadamente
+            resultados[nome] = (0.0, 0.0, e)
+    return resultados
+
+def calcular_metricas_operador(df_validadas):
+    """
+    Tempo médio de conferência e de ociosidade por operador
+    
+    Uma única ordenação por operador e início da conferência: a ociosidade é a
+    diferença entre o início da conferência seguinte do mesmo operador e o fim
+    da atual. Os tempos permanecem numéricos (truncados em segundos, como são
+    exibidos) até a formatação final.
+    
+    Args:
+        df_validadas: conferências das rotas expedidas
+    
+    Returns:
+        DataFrame com Operador, Conferência e Ociosidade, ordenado pelo tempo de
+        conferência (decrescente) e com a linha 'Média Geral' ao final
+    """
+    colunas = ['Validation Operator', 'Validation Start Time', 'Validation End Time']
+    if any(col not in df_validadas.columns for col in colunas):
+        return pd.DataFrame([])
+    
+    df = df_validadas[colunas].dropna(subset=['Validation Operator'])
+    if df.empty:
+        return pd.DataFrame([])
+    df = df.sort_values(['Validation Operator', 'Validation Start Time'], kind='mergesort')
+    
+    proximo_inicio = df.groupby('Validation Operator', sort=False)['Validation Start Time'].shift(-1)
+    tempos = pd.DataFrame({
+        'Validation Operator': df['Validation Operator'],
+        'conferencia': df['Validation End Time'] - df['Validation Start Time'],
+        'ociosidade': proximo_inicio - df['Validation End Time'],
+    })
+    medias = tempos.groupby('Validation Operator').mean()
+    return montar_metricas_operador(medias.index.to_series(), medias['conferencia'], medias['ociosidade'])
+
+def montar_metricas_operador(operadores, conferencia, ociosidade):
+    """
+    Tabela final das métricas por operador a partir das médias de cada um
+    
+    Usada pelo relatório e pelo acompanhamento ao vivo, para que os dois
+    formatem, ordenem e calculem a 'Média Geral' da mesma forma.
+    
+    Args:
+        operadores: Series com os operadores como exportados, em ordem alfabética
+        conferencia: Series de Timedelta com a média de conferência de cada operador
+        ociosidade: Series de Timedelta com a média de ociosidade de cada operador
+    
+    Returns:
+        DataFrame com Operador, Conferência e Ociosidade, ordenado pelo tempo de
+        conferência (decrescente) e com a linha 'Média Geral' ao final
+    """
+    if len(operadores) == 0:
+        return pd.DataFrame([])
+    conferencia = truncar_segundos(pd.Series(conferencia, dtype='timedelta64[ns]'))
+    ociosidade = truncar_segundos(pd.Series(ociosidade, dtype='timedelta64[ns]'))
+    
+    metricas = pd.DataFrame({
+        'Operador': extrair_nomes_operadores(pd.Series(operadores, dtype=object)).to_numpy(),
+        'Conferência': formatar_hms(conferencia).to_numpy(),
+        'Ociosidade': formatar_hms(ociosidade).to_numpy(),
+    })
+    # A ordenação e a 'Média Geral' usam os tempos como exibidos, lidos de volta
+    # do texto: uma média negativa exibida como '-2:53:46' vale -(2:53:46)
+    conferencia_exibida = pd.to_timedelta(metricas['Conferência'])
+    ociosidade_exibida = pd.to_timedelta(metricas['Ociosidade'])
+    
+    # Ordenar por tempo de conferência decrescente, mantendo 'Média Geral' por último
+    metricas['Conferência_td'] = conferencia_exibida
+    metricas = metricas.sort_values('Conferência_td', ascending=False).drop(columns='Conferência_td')
+    
+    media_geral = pd.DataFrame([{
+        'Operador': 'Média Geral',
+        'Conferência': format_hms(conferencia_exibida.mean()),
+        'Ociosidade': format_hms(ociosidade_exibida.mean())
+    }])
+    return pd.concat([metricas, media_geral], ignore_index=True)
+
+def calcular_relatorio(expedicao_files, conferencia_file, current_window_key="MANHA", progresso=None,
+                       registro=None):
+    """
+    Etapa de cálculo: lê os arquivos de entrada e monta o modelo do relatório
     
     Args:
         expedicao_files: lista de caminhos de arquivos CSV de expedição
         conferencia_file: caminho do arquivo CSV de conferência
-        output_dir: diretório de saída para os relatórios
-        info_adicional: texto de informações adicionais sobre o fechamento da expedição
         current_window_key: chave da janela atual (MANHA, TARDE, NOITE)
+        progresso: ProgressoRelatorio que recebe cada etapa e verifica o cancelamento
+        registro: RegistroExecucao que recebe as medições de cada etapa
+    
+    Returns:
+        RelatorioExpedicao
+
+    Raises:
+        ProcessamentoCancelado: se o cancelamento foi pedido entre as etapas
     """
-    try:
-        # Validar arquivo de conferência
-        valido, mensagem = validar_arquivo_conferencia(conferencia_file)
-        if not valido:
-            raise ValueError(mensagem)
-            
-        # Validar arquivos de expedição
-        for exp_file in expedicao_files:
-            valido, mensagem = validar_arquivo_expedicao(exp_file)
-            if not valido:
-                raise ValueError(f"Erro no arquivo {os.path.basename(exp_file)}: {mensagem}")
-        
-        # Carregar dados
-        df_conferencia = pd.read_csv(conferencia_file)
-        
-        # Lista para armazenar DataFrames de expedição
-        dfs_expedicao = []
-        
-        # Processar cada arquivo de expedição
-        for exp_file in expedicao_files:
-            df_exp = pd.read_csv(exp_file)
-            # Identificar rotas de outras janelas
-            df_exp = identificar_rotas_outras_janelas(df_exp, current_window_key)
-            dfs_expedicao.append(df_exp)
-        
-        # Combinar todos os DataFrames de expedição
-        if len(dfs_expedicao) > 1:
-            df_expedicao = pd.concat(dfs_expedicao, ignore_index=True)
-        else:
-            df_expedicao = dfs_expedicao[0]
-        
-        # 3. Ler arquivo de conferência (já validado)
-        df_auditoria = pd.read_csv(conferencia_file, dtype=str)
-
-        # 4. Conversão de datas
-        for col in ['Create Time', 'Complete time', 'Driver Assigned Time', 'Agency Assigned Time']:
-            if col in df_expedicao.columns:
-                df_expedicao[col] = pd.to_datetime(df_expedicao[col], errors='coerce')
-        for col in ['Validation Start Time', 'Validation End Time']:
-            if col in df_auditoria.columns:
-                df_auditoria[col] = pd.to_datetime(df_auditoria[col], errors='coerce')
-
-        # Identificar rotas no piso usando a nova lógica
-        rotas_no_piso_set, status_rotas = identificar_rotas_no_piso(df_auditoria, df_expedicao)
-        
-        # Filtrar apenas rotas validadas (que não estão no piso)
-        df_validadas = df_auditoria[
-            (df_auditoria['AT/TO Validation Status'] == 'Validated') & 
-            (~df_auditoria['AT/TO'].isin(rotas_no_piso_set))
-        ].copy()
-
-        # 1. Quantidade de rotas expedidas (validadas e não no piso)
-        rotas_expedidas = df_validadas['AT/TO'].nunique()
-
-        # 2. Quantidade de rotas expedidas por transportadora (validadas e não no piso)
-        # Garantir 1 linha por AT/TO validado, buscar transportadora e somar pedidos expedidos corretamente
-        rotas_validas = df_validadas[['AT/TO', 'Total Final Orders Inside AT/TO']].drop_duplicates(subset=['AT/TO'])
-        
-        # Buscar informações de transportadora do arquivo de expedição apenas para complementar
-        info_transportadora = df_expedicao[['Task ID', 'Agency']].drop_duplicates(subset=['Task ID'])
-        
-        # Merge com left join para manter todas as rotas validadas
-        rotas_validas = rotas_validas.merge(
-            info_transportadora,
+    if progresso is None:
+        progresso = ProgressoRelatorio()
+    if registro is None:
+        registro = RegistroExecucao(current_window_key)
+
+    progresso.etapa('Lendo conferência')
+    registro.iniciar('Leitura da conferência')
+    cache_exportacoes = get_cache_exportacoes()
+    cache_exportacoes.reiniciar_contadores()
+
+    # Carregar e validar o arquivo de conferência (uma única leitura); se a
+    # interface já o validou por completo, o resultado guardado é reaproveitado
+    conferencia = get_arquivos_validados().retirar('conferencia', conferencia_file)
+    if conferencia is None:
+        conferencia = carregar_conferencia(conferencia_file)
+    if not conferencia.valido:
+        raise ValueError(conferencia.mensagem)
+    print(f'Conferência - {conferencia.resumo()}')
+    registro.finalizar(conferencia.linhas, conferencia.memoria, linhas_entrada=conferencia.linhas)
+
+    # Carregar, validar e reduzir os arquivos de expedição aos fatos por rota,
+    # um arquivo por processo (arquivos grandes são lidos em blocos para
+    # respeitar o teto de memória)
+    progresso.etapa('Lendo expedição')
+    registro.iniciar('Leitura e redução da expedição')
+    # No modo de perfilamento a ingestão roda em série, para que o cProfile e o tracemalloc a enxerguem
+    processos = 1 if registro.perfilamento is not None else None
+    reducao, expedicoes = reduzir_expedicoes(expedicao_files, processos)
+    for expedicao in expedicoes:
+        if not expedicao.valido:
+            raise ValueError(f"Erro no arquivo {expedicao.nome}: {expedicao.mensagem}")
+        print(f'Expedição - {expedicao.resumo()}')
+    print(f'Ingestão - {cache_exportacoes.estatisticas()}')
+    registro.registrar_cache(cache_exportacoes.contadores())
+
+    # Uma linha por rota (primeira ocorrência) com a quantidade de pacotes distintos
+    df_rotas = reducao.resultado()
+    registro.finalizar(len(df_rotas), memoria_df(df_rotas), linhas_entrada=reducao.linhas)
+    del reducao
+
+    progresso.etapa('Calculando métricas')
+    registro.iniciar('Janelas de carregamento', len(df_rotas))
+    df_expedicao = identificar_rotas_outras_janelas(df_rotas, current_window_key)
+    del df_rotas
+    registro.finalizar(len(df_expedicao), memoria_df(df_expedicao))
+
+    # 3. Dados de conferência (já lidos e validados)
+    df_auditoria = conferencia.df
+
+    # Identificar rotas no piso usando a nova lógica
+    registro.iniciar('Rotas no piso', len(df_auditoria))
+    rotas_no_piso_set, status_rotas = identificar_rotas_no_piso(df_auditoria, df_expedicao)
+    registro.finalizar(len(rotas_no_piso_set))
+
+    registro.iniciar('Métricas e tabelas', len(df_auditoria))
+
+    # Filtrar apenas rotas validadas (que não estão no piso)
+    df_validadas = df_auditoria[
+        (df_auditoria['AT/TO Validation Status'] == 'Validated') & 
+        (~df_auditoria['AT/TO'].isin(rotas_no_piso_set))
+    ].copy()
+
+    # 1. Quantidade de rotas expedidas (validadas e não no piso)
+    rotas_expedidas = df_validadas['AT/TO'].nunique()
+
+    # 2. Quantidade de rotas expedidas por transportadora (validadas e não no piso)
+    # Garantir 1 linha por AT/TO validado, buscar transportadora e somar pedidos expedidos corretamente
+    rotas_validas = df_validadas[['AT/TO', 'Total Final Orders Inside AT/TO']].drop_duplicates(subset=['AT/TO'])
+
+    # Buscar informações de transportadora do arquivo de expedição apenas para complementar
+    info_transportadora = df_expedicao[['Task ID', 'Agency']].drop_duplicates(subset=['Task ID']).astype({'Agency': object})
+
+    # Merge com left join para manter todas as rotas validadas
+    rotas_validas = rotas_validas.merge(
+        info_transportadora,
+        left_on='AT/TO',
+        right_on='Task ID',
+        how='left'
+    )
+
+    # Tratar casos onde a transportadora não foi encontrada
+    rotas_validas['Agency'] = rotas_validas['Agency'].fillna('Não informado')
+
+    rotas_por_agencia = rotas_validas.groupby('Agency').agg({
+        'AT/TO': 'nunique',
+        'Total Final Orders Inside AT/TO': lambda x: x.astype(float).sum()
+    }).reset_index()
+
+    rotas_por_agencia.columns = ['Transportadora', 'Rotas Expedidas', 'Pedidos Expedidos']
+    rotas_por_agencia['Pedidos Expedidos'] = rotas_por_agencia['Pedidos Expedidos'].astype(int)
+
+    # Ordenar por número de rotas (decrescente)
+    rotas_por_agencia = rotas_por_agencia.sort_values('Rotas Expedidas', ascending=False)
+
+    # Adicionar totais em Rotas por Transportadora
+    if not rotas_por_agencia.empty:
+        total_rotas = rotas_por_agencia['Rotas Expedidas'].sum()
+        total_pedidos = rotas_por_agencia['Pedidos Expedidos'].sum()
+        rotas_por_agencia = pd.concat([
+            rotas_por_agencia,
+            pd.DataFrame([{
+                'Transportadora': 'Total',
+                'Rotas Expedidas': total_rotas,
+                'Pedidos Expedidos': total_pedidos
+            }])
+        ], ignore_index=True)
+
+    # 3. Horário de início/fim da expedição (validadas)
+    inicio_expedicao = df_validadas['Validation Start Time'].min()
+    fim_expedicao = df_validadas['Validation End Time'].max()
+
+    # 4. Média de tempo de conferência de uma rota (validadas)
+    df_validadas['duracao_conferencia'] = df_validadas['Validation End Time'] - df_validadas['Validation Start Time']
+    media_conferencia = df_validadas['duracao_conferencia'].mean()
+    media_conferencia_fmt = format_hms(media_conferencia)
+
+    # Nova funcionalidade: Contagem de rotas por tipo de veículo
+    # Procurar por uma coluna que represente o tipo de veículo
+    vehicle_type_column = detectar_coluna_veiculo(df_expedicao.columns)
+
+    if vehicle_type_column in df_expedicao.columns:
+        # Contar rotas expedidas por tipo de veículo
+        # Usar as rotas validadas como base e buscar informação de veículo do arquivo de expedição
+        info_veiculo = df_expedicao[['Task ID', vehicle_type_column]].drop_duplicates(subset=['Task ID']).astype({vehicle_type_column: object})
+
+        rotas_validas_com_veiculo = rotas_validas.merge(
+            info_veiculo,
             left_on='AT/TO',
-            right_on='Task ID',
+            right_on='Task ID', 
             how='left'
         )
-        
-        # Tratar casos onde a transportadora não foi encontrada
-        rotas_validas['Agency'] = rotas_validas['Agency'].fillna('Não informado')
-        
-        rotas_por_agencia = rotas_validas.groupby('Agency').agg({
-            'AT/TO': 'nunique',
-            'Total Final Orders Inside AT/TO': lambda x: x.astype(float).sum()
+
+        # Substituir valores nulos ou vazios por "Não informado"
+        rotas_validas_com_veiculo[vehicle_type_column] = rotas_validas_com_veiculo[vehicle_type_column].fillna('Não informado')
+        rotas_validas_com_veiculo.loc[rotas_validas_com_veiculo[vehicle_type_column].str.strip() == '', vehicle_type_column] = 'Não informado'
+
+        # Normalizar/agrupar tipos de veículos conforme regras de negócio
+        def normalizar_tipo_veiculo(tipo):
+            if pd.isna(tipo) or str(tipo).strip() == '':
+                return 'Não informado'
+
+            tipo = str(tipo).upper()
+
+            # Regras de agrupamento
+            if 'PASSEIO' in tipo:
+                return 'PASSEIO'
+            elif 'FIORINO' in tipo:
+                return 'FIORINO'
+            elif 'MOTO' in tipo:
+                return 'MOTO'
+            elif 'VAN' in tipo:
+                return 'VAN'
+            else:
+                return tipo
+
+        # Aplicar normalização
+        rotas_validas_com_veiculo['Tipo_Normalizado'] = rotas_validas_com_veiculo[vehicle_type_column].apply(normalizar_tipo_veiculo)
+
+        rotas_por_veiculo = rotas_validas_com_veiculo.groupby('Tipo_Normalizado').agg({
+            'AT/TO': 'nunique'
         }).reset_index()
-        
-        rotas_por_agencia.columns = ['Transportadora', 'Rotas Expedidas', 'Pedidos Expedidos']
-        rotas_por_agencia['Pedidos Expedidos'] = rotas_por_agencia['Pedidos Expedidos'].astype(int)
-        
+
+        rotas_por_veiculo.columns = ['Tipo de Veículo', 'Rotas Expedidas']
+
         # Ordenar por número de rotas (decrescente)
-        rotas_por_agencia = rotas_por_agencia.sort_values('Rotas Expedidas', ascending=False)
-
-        # Adicionar totais em Rotas por Transportadora
-        if not rotas_por_agencia.empty:
-            total_rotas = rotas_por_agencia['Rotas Expedidas'].sum()
-            total_pedidos = rotas_por_agencia['Pedidos Expedidos'].sum()
-            rotas_por_agencia = pd.concat([
-                rotas_por_agencia,
+        rotas_por_veiculo = rotas_por_veiculo.sort_values('Rotas Expedidas', ascending=False)
+
+        # Adicionar totais em Rotas por Tipo de Veículo
+        if not rotas_por_veiculo.empty:
+            total_rotas = rotas_por_veiculo['Rotas Expedidas'].sum()
+            rotas_por_veiculo = pd.concat([
+                rotas_por_veiculo,
                 pd.DataFrame([{
-                    'Transportadora': 'Total',
-                    'Rotas Expedidas': total_rotas,
-                    'Pedidos Expedidos': total_pedidos
+                    'Tipo de Veículo': 'Total',
+                    'Rotas Expedidas': total_rotas
                 }])
             ], ignore_index=True)
+    else:
+        # Criar dataframe vazio se o tipo de veículo não estiver disponível
+        rotas_por_veiculo = pd.DataFrame(columns=['Tipo de Veículo', 'Rotas Expedidas'])
+        # Adicionar uma linha indicando que o tipo de veículo não está disponível
+        rotas_por_veiculo = pd.DataFrame([{
+            'Tipo de Veículo': 'Informação não disponível',
+            'Rotas Expedidas': 0
+        }, {
+            'Tipo de Veículo': 'Total',
+            'Rotas Expedidas': 0
+        }])
+        print(f"Aviso: Coluna de tipo de veículo não encontrada nos dados de expedição. Colunas disponíveis: {', '.join(df_expedicao.columns)}")
 
-        # 3. Horário de início/fim da expedição (validadas)
-        inicio_expedicao = df_validadas['Validation Start Time'].min()
-        fim_expedicao = df_validadas['Validation End Time'].max()
-
-        # 4. Média de tempo de conferência de uma rota (validadas)
-        df_validadas['duracao_conferencia'] = df_validadas['Validation End Time'] - df_validadas['Validation Start Time']
-        media_conferencia = df_validadas['duracao_conferencia'].mean()
-        media_conferencia_fmt = format_hms(media_conferencia)
-
-        # Nova funcionalidade: Contagem de rotas por tipo de veículo
-        # Procurar por uma coluna que represente o tipo de veículo
-        vehicle_type_columns = [col for col in df_expedicao.columns 
-                               if any(term in col.lower() for term in 
-                                     ['vehicle', 'veic', 'veíc', 'car', 'carro', 'truck', 'caminhão', 'caminhao', 
-                                      'tipo', 'type', 'model', 'modelo', 'transporte', 'transport'])]
-        
-        # Preferência para colunas com 'tipo' + 'veículo' ou 'vehicle' + 'type'
-        specific_columns = [col for col in vehicle_type_columns 
-                           if ('tipo' in col.lower() and ('veic' in col.lower() or 'veíc' in col.lower())) or 
-                              ('vehicle' in col.lower() and 'type' in col.lower())]
-        
-        vehicle_type_column = next(iter(specific_columns), None) if specific_columns else next(iter(vehicle_type_columns), None)
-        
-        # Se ainda não encontrou a coluna, use o nome mais comum
-        if not vehicle_type_column:
-            common_names = ['Vehicle Type', 'Tipo de Veículo', 'Tipo de Veiculo', 'Car Type', 'Tipo', 'Type']
-            for name in common_names:
-                if name in df_expedicao.columns:
-                    vehicle_type_column = name
-                    break
-        
-        if vehicle_type_column in df_expedicao.columns:
-            # Contar rotas expedidas por tipo de veículo
-            # Usar as rotas validadas como base e buscar informação de veículo do arquivo de expedição
-            info_veiculo = df_expedicao[['Task ID', vehicle_type_column]].drop_duplicates(subset=['Task ID'])
-            
-            rotas_validas_com_veiculo = rotas_validas.merge(
-                info_veiculo,
-                left_on='AT/TO',
-                right_on='Task ID', 
-                how='left'
-            )
-            
-            # Substituir valores nulos ou vazios por "Não informado"
-            rotas_validas_com_veiculo[vehicle_type_column] = rotas_validas_com_veiculo[vehicle_type_column].fillna('Não informado')
-            rotas_validas_com_veiculo.loc[rotas_validas_com_veiculo[vehicle_type_column].str.strip() == '', vehicle_type_column] = 'Não informado'
-            
-            # Normalizar/agrupar tipos de veículos conforme regras de negócio
-            def normalizar_tipo_veiculo(tipo):
-                if pd.isna(tipo) or str(tipo).strip() == '':
-                    return 'Não informado'
-                
-                tipo = str(tipo).upper()
-                
-                # Regras de agrupamento
-                if 'PASSEIO' in tipo:
-                    return 'PASSEIO'
-                elif 'FIORINO' in tipo:
-                    return 'FIORINO'
-                elif 'MOTO' in tipo:
-                    return 'MOTO'
-                elif 'VAN' in tipo:
-                    return 'VAN'
-                else:
-                    return tipo
-            
-            # Aplicar normalização
-            rotas_validas_com_veiculo['Tipo_Normalizado'] = rotas_validas_com_veiculo[vehicle_type_column].apply(normalizar_tipo_veiculo)
-            
-            rotas_por_veiculo = rotas_validas_com_veiculo.groupby('Tipo_Normalizado').agg({
-                'AT/TO': 'nunique'
-            }).reset_index()
-            
-            rotas_por_veiculo.columns = ['Tipo de Veículo', 'Rotas Expedidas']
-            
-            # Ordenar por número de rotas (decrescente)
-            rotas_por_veiculo = rotas_por_veiculo.sort_values('Rotas Expedidas', ascending=False)
-            
-            # Adicionar totais em Rotas por Tipo de Veículo
-            if not rotas_por_veiculo.empty:
-                total_rotas = rotas_por_veiculo['Rotas Expedidas'].sum()
-                rotas_por_veiculo = pd.concat([
-                    rotas_por_veiculo,
-                    pd.DataFrame([{
-                        'Tipo de Veículo': 'Total',
-                        'Rotas Expedidas': total_rotas
-                    }])
-                ], ignore_index=True)
-        else:
-            # Criar dataframe vazio se o tipo de veículo não estiver disponível
-            rotas_por_veiculo = pd.DataFrame(columns=['Tipo de Veículo', 'Rotas Expedidas'])
-            # Adicionar uma linha indicando que o tipo de veículo não está disponível
-            rotas_por_veiculo = pd.DataFrame([{
-                'Tipo de Veículo': 'Informação não disponível',
-                'Rotas Expedidas': 0
-            }, {
-                'Tipo de Veículo': 'Total',
-                'Rotas Expedidas': 0
+    # 5. Métricas por operador: tempo médio de conferência e tempo médio de ociosidade
+    metricas_operador_df = calcular_metricas_operador(df_validadas)
+
+    # 6. Rotas e pedidos expedidos por hora (validadas)
+    df_validadas['hora_expedicao'] = df_validadas['Validation End Time'].dt.floor('H')
+    rotas_por_hora = df_validadas.groupby('hora_expedicao')['AT/TO'].nunique().reset_index()
+    rotas_por_hora.columns = ['Hora', 'Rotas Expedidas']
+    pedidos_por_hora = df_validadas.groupby('hora_expedicao')['Total Final Orders Inside AT/TO'].apply(lambda x: x.astype(float).sum()).reset_index()
+    pedidos_por_hora.columns = ['Hora', 'Pedidos Expedidos']
+    expedidos_por_hora = pd.merge(rotas_por_hora, pedidos_por_hora, on='Hora')
+    expedidos_por_hora['Pedidos Expedidos'] = expedidos_por_hora['Pedidos Expedidos'].astype(int)
+
+    # Hora como intervalo ('04:00 às 05:00')
+    expedidos_por_hora['Hora'] = formatar_intervalo_hora(expedidos_por_hora['Hora'])
+
+    # Adicionar totais em Rotas e Pedidos Expedidos por Hora
+    if not expedidos_por_hora.empty:
+        total_rotas = expedidos_por_hora['Rotas Expedidas'].sum()
+        total_pedidos = expedidos_por_hora['Pedidos Expedidos'].sum()
+        expedidos_por_hora = pd.concat([
+            expedidos_por_hora,
+            pd.DataFrame([{
+                'Hora': 'Total',
+                'Rotas Expedidas': total_rotas,
+                'Pedidos Expedidos': total_pedidos
             }])
-            print(f"Aviso: Coluna de tipo de veículo não encontrada nos dados de expedição. Colunas disponíveis: {', '.join(df_expedicao.columns)}")
-
-        # 5. Métricas por operador: tempo médio de conferência e tempo médio de ociosidade
-        metricas_operador = []
-        def extrair_nome_operador(op):
-            # Remove prefixo [opsXXXXX] se existir e aplica title case
-            return re.sub(r'^\[.*?\]', '', op).strip().title()
-        if 'Validation Operator' in df_validadas.columns and 'Validation Start Time' in df_validadas.columns and 'Validation End Time' in df_validadas.columns:
-            for operador, grupo in df_validadas.groupby('Validation Operator'):
-                grupo = grupo.sort_values('Validation Start Time')
-                # Tempo médio de conferência
-                duracoes = grupo['Validation End Time'] - grupo['Validation Start Time']
-                media_conferencia = duracoes.mean()
-                # Tempo médio de ociosidade
-                ociosidade = grupo['Validation Start Time'].shift(-1) - grupo['Validation End Time']
-                media_ociosidade = ociosidade[:-1].mean()  # ignora o último, que não tem próximo
-                metricas_operador.append({
-                    'Operador': extrair_nome_operador(operador),
-                    'Conferência': format_hms(media_conferencia),
-                    'Ociosidade': format_hms(media_ociosidade)
-                })
-        metricas_operador_df = pd.DataFrame(metricas_operador)
-
-        # Adicionar linha de médias finais
-        if not metricas_operador_df.empty:
-            conferencia_td = pd.to_timedelta(metricas_operador_df['Conferência'])
-            ociosidade_td = pd.to_timedelta(metricas_operador_df['Ociosidade'])
-            media_geral_conferencia = conferencia_td.mean()
-            media_geral_ociosidade = ociosidade_td.mean()
-            metricas_operador_df = pd.concat([
-                metricas_operador_df,
-                pd.DataFrame([{
-                    'Operador': 'Média Geral',
-                    'Conferência': format_hms(media_geral_conferencia),
-                    'Ociosidade': format_hms(media_geral_ociosidade)
-                }])
-            ], ignore_index=True)
-            # Ordenar por tempo de conferência decrescente, mantendo 'Média Geral' por último
-            media_geral = metricas_operador_df[metricas_operador_df['Operador'] == 'Média Geral']
-            outros = metricas_operador_df[metricas_operador_df['Operador'] != 'Média Geral'].copy()
-            outros['Conferência_td'] = pd.to_timedelta(outros['Conferência'])
-            outros = outros.sort_values('Conferência_td', ascending=False).drop(columns='Conferência_td')
-            metricas_operador_df = pd.concat([outros, media_geral], ignore_index=True)
-
-        # 6. Rotas e pedidos expedidos por hora (validadas)
-        df_validadas['hora_expedicao'] = df_validadas['Validation End Time'].dt.floor('H')
-        rotas_por_hora = df_validadas.groupby('hora_expedicao')['AT/TO'].nunique().reset_index()
-        rotas_por_hora.columns = ['Hora', 'Rotas Expedidas']
-        pedidos_por_hora = df_validadas.groupby('hora_expedicao')['Total Final Orders Inside AT/TO'].apply(lambda x: x.astype(float).sum()).reset_index()
-        pedidos_por_hora.columns = ['Hora', 'Pedidos Expedidos']
-        expedidos_por_hora = pd.merge(rotas_por_hora, pedidos_por_hora, on='Hora')
-        expedidos_por_hora['Pedidos Expedidos'] = expedidos_por_hora['Pedidos Expedidos'].astype(int)
-
-        # Adicionar totais em Rotas e Pedidos Expedidos por Hora
-        if not expedidos_por_hora.empty:
-            total_rotas = expedidos_por_hora['Rotas Expedidas'].sum()
-            total_pedidos = expedidos_por_hora['Pedidos Expedidos'].sum()
-            expedidos_por_hora = pd.concat([
-                expedidos_por_hora,
-                pd.DataFrame([{
-                    'Hora': 'Total',
-                    'Rotas Expedidas': total_rotas,
-                    'Pedidos Expedidos': total_pedidos
-                }])
-            ], ignore_index=True)
+        ], ignore_index=True)
 
-        def hora_intervalo_str(h):
-            if pd.isnull(h):
-                return ''
-            if isinstance(h, pd.Timestamp):
-                hora_ini = h.strftime('%H:%M')
-                hora_fim = (h + pd.Timedelta(hours=1)).strftime('%H:%M')
-                return f'{hora_ini} às {hora_fim}'
-            return str(h)
+    # 7. Rotas não conferidas (no piso)
+    # Agregados por rota calculados uma única vez e combinados por join
+    rotas_piso_df = pd.DataFrame({'Rota': pd.Series(list(rotas_no_piso_set), dtype=object)})
 
-        expedidos_por_hora['Hora'] = expedidos_por_hora['Hora'].apply(hora_intervalo_str)
+    # Primeira ocorrência de cada rota no arquivo de expedição
+    info_exp = (
+        df_expedicao.dropna(subset=['Task ID'])
+        .drop_duplicates(subset=['Task ID'])
+        .set_index('Task ID')[['Agency', 'Driver name']]
+        .astype(object)
+    )
+    info_exp.columns = ['Transportadora', 'Motorista']
+    info_exp['Pacotes Expedição'] = df_expedicao.set_index('Task ID')[COLUNA_PACOTES]
 
-        # Gerar gráficos de rotas e pedidos por hora
-        graficos_buffer = criar_grafico_hora_a_hora(expedidos_por_hora)
+    # Primeira ocorrência de cada rota no arquivo de conferência
+    info_aud = (
+        df_auditoria.dropna(subset=['AT/TO'])
+        .drop_duplicates(subset=['AT/TO'])
+        .set_index('AT/TO')
+    )
+    def pedidos_como_inteiro(coluna):
+        # Mesmo resultado de int(float(valor)), com 0 para valores ausentes ou inválidos
+        if coluna not in info_aud.columns:
+            return pd.Series(0, index=info_aud.index)
+        return np.trunc(pd.to_numeric(info_aud[coluna], errors='coerce').fillna(0)).astype(int)
+    info_aud = pd.DataFrame({
+        'Pacotes Finais': pedidos_como_inteiro('Total Final Orders Inside AT/TO'),
+        'Pacotes Iniciais': pedidos_como_inteiro('Total Initial Orders Inside AT/TO'),
+    })
 
-        # 7. Rotas não conferidas (no piso)
-        rotas_conferidas = set(df_validadas['AT/TO'].unique())
-        
-        # Filtrar apenas rotas com status "Processing" ou "Processed" do arquivo de expedição
-        status_validos = ['Processing', 'Processed']
-        df_expedicao_filtrado = df_expedicao[df_expedicao['Status'].isin(status_validos)]
-        rotas_assignment = set(df_expedicao_filtrado['Task ID'].unique())
-        
-        # Encontrar todas as rotas que não foram validadas no arquivo de conferência
-        todas_rotas_auditoria = set(df_auditoria['AT/TO'].unique())
-        rotas_nao_validadas = todas_rotas_auditoria - rotas_conferidas
-        
-        # Unir rotas do assignment (apenas com status válido) que não foram conferidas 
-        # com rotas da auditoria que não foram validadas
-        rotas_nao_conferidas = (rotas_assignment - rotas_conferidas) | rotas_nao_validadas
-        
-        # Atualizar a criação do DataFrame de rotas não conferidas
-        pacotes_por_rota = []
-        for rota in rotas_no_piso_set:
-            # Buscar informações da rota no arquivo de expedição
-            info_rota_exp = df_expedicao[df_expedicao['Task ID'] == rota]
-            info_rota_aud = df_auditoria[df_auditoria['AT/TO'] == rota]
-            
-            if not info_rota_exp.empty:
-                transportadora = info_rota_exp.iloc[0].get('Agency', 'Não atribuído')
-                motorista = info_rota_exp.iloc[0].get('Driver name', 'Não atribuído')
-            else:
-                transportadora = 'Não atribuído'
-                motorista = 'Não atribuído'
-            
-            # Definir a quantidade de pacotes com base no status da rota
-            if not info_rota_aud.empty:
-                if status_rotas.get(rota) == 'validada':
-                    # Se a rota foi validada, usar o total final
-                    try:
-                        pacotes = int(float(info_rota_aud.iloc[0].get('Total Final Orders Inside AT/TO', 0)))
-                    except (ValueError, TypeError):
-                        pacotes = 0
-                else:
-                    # Se a rota não foi validada, usar o total inicial
-                    try:
-                        pacotes = int(float(info_rota_aud.iloc[0].get('Total Initial Orders Inside AT/TO', 0)))
-                    except (ValueError, TypeError):
-                        pacotes = 0
-            else:
-                # Se não encontrar na auditoria, tentar no arquivo de expedição
-                pacotes = len(info_rota_exp['SPX tracking num'].unique()) if not info_rota_exp.empty else 0
-            
-            pacotes_por_rota.append({
-                'Rota': rota,
-                'Transportadora': transportadora,
-                'Motorista': motorista,
-                'Pacotes': pacotes
-            })
-        
-        # Criar DataFrame com as rotas não conferidas
-        pacotes_por_rota_df = pd.DataFrame(pacotes_por_rota)
-        
-        # Calcular totais
-        total_rotas = len(rotas_no_piso_set)
-        total_pacotes = pacotes_por_rota_df['Pacotes'].sum() if not pacotes_por_rota_df.empty else 0
-        
-        # Criar a linha de totais
-        totais_df = pd.DataFrame([{
-            'Rota': f'Total ({total_rotas} rotas)',
-            'Transportadora': '',
-            'Motorista': '',
-            'Pacotes': total_pacotes
-        }])
-        
-        rotas_nao_conferidas_df = pd.concat([pacotes_por_rota_df, totais_df], ignore_index=True) if not pacotes_por_rota_df.empty else totais_df
-        
-        # Substituir valores nulos/nan por 'Não atribuído' nas colunas relevantes (exceto linha de total)
-        if not rotas_nao_conferidas_df.empty:
-            total_row_index = rotas_nao_conferidas_df[rotas_nao_conferidas_df['Rota'].astype(str).str.startswith('Total')].index
-            non_total_rows = ~rotas_nao_conferidas_df.index.isin(total_row_index)
-            
-            # Aplicar substituições apenas nas linhas que não são totais
-            for col in ['Transportadora', 'Motorista']:
-                if col in rotas_nao_conferidas_df.columns:
-                    # Substituir NaN
-                    rotas_nao_conferidas_df.loc[non_total_rows, col] = rotas_nao_conferidas_df.loc[non_total_rows, col].fillna('Não atribuído')
-                    
-                    # Substituir strings vazias
-                    mask_empty = (rotas_nao_conferidas_df[col].astype(str).str.strip() == '') & non_total_rows
-                    rotas_nao_conferidas_df.loc[mask_empty, col] = 'Não atribuído'
-                    
-                    # Substituir o texto literal 'nan' (case insensitive)
-                    mask_nan = (rotas_nao_conferidas_df[col].astype(str).str.lower() == 'nan') & non_total_rows
-                    rotas_nao_conferidas_df.loc[mask_nan, col] = 'Não atribuído'
-        
-        # Aplicar title case apenas na coluna de Motorista (mantendo o anterior)
-        if 'Motorista' in rotas_nao_conferidas_df.columns:
-            rotas_nao_conferidas_df['Motorista'] = rotas_nao_conferidas_df['Motorista'].astype(str).str.title()
-            # Garantir que "nan" depois de title case não seja exibido como "Nan"
-            rotas_nao_conferidas_df.loc[rotas_nao_conferidas_df['Motorista'] == 'Nan', 'Motorista'] = 'Não atribuído'
-
-        # Montar DataFrame final para exportação
-        resumo = []
-        
-        # Usar primariamente o arquivo de auditoria para as contagens
-        rotas_programadas = df_auditoria['AT/TO'].nunique()
-        pedidos_programados = df_auditoria['Total Initial Orders Inside AT/TO'].astype(float).sum()
-        
-        # Rotas expedidas e pedidos expedidos vêm das rotas validadas
-        rotas_expedidas = df_validadas['AT/TO'].nunique()
-        pedidos_expedidos = df_validadas['Total Final Orders Inside AT/TO'].astype(float).sum()
-        
-        # Rotas não conferidas são as que estão no arquivo de auditoria mas não foram validadas
-        rotas_auditoria = set(df_auditoria['AT/TO'].unique())
-        rotas_validadas = set(df_validadas['AT/TO'].unique())
-        rotas_nao_conferidas = rotas_auditoria - rotas_validadas
-        rotas_no_piso = len(rotas_nao_conferidas)
-        
-        resumo.append({'Métrica': 'Quantidade de rotas programadas', 'Valor': rotas_programadas})
-        resumo.append({'Métrica': 'Quantidade de rotas expedidas', 'Valor': rotas_expedidas})
-        resumo.append({'Métrica': 'Quantidade de pedidos programados', 'Valor': int(pedidos_programados)})
-        resumo.append({'Métrica': 'Quantidade de pedidos expedidos', 'Valor': int(pedidos_expedidos)})
-        resumo.append({'Métrica': 'Quantidade de rotas que ficaram no piso', 'Valor': rotas_no_piso})
-        resumo.append({'Métrica': 'Horário de início da expedição', 'Valor': format_hms(inicio_expedicao)})
-        resumo.append({'Métrica': 'Horário de fim da expedição', 'Valor': format_hms(fim_expedicao)})
-        resumo.append({'Métrica': 'Média de tempo de giro de bancada', 'Valor': media_conferencia_fmt})
-        
-        resumo_df = pd.DataFrame(resumo)
-
-        # Exportar todos os resultados para um único CSV, separados por seções
-        csv_path = os.path.join(output_dir, 'resumo_expedicao.csv')
-        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-            resumo_df.to_csv(f, index=False)
-            f.write('\n')
-            f.write('Rotas expedidas por transportadora\n')
-            rotas_por_agencia.to_csv(f, index=False)
-            f.write('\n')
-            f.write('Rotas expedidas por tipo de veículo\n')
-            rotas_por_veiculo.to_csv(f, index=False)
-            f.write('\n')
-            f.write('Rotas e pedidos expedidos por hora\n')
-            expedidos_por_hora.to_csv(f, index=False)
-            f.write('\n')
-            f.write('Média de tempo entre uma conferência e outra por usuário\n')
-            metricas_operador_df.to_csv(f, index=False)
-            f.write('\n')
-            f.write('Rotas NS - ficaram no piso\n')
-            rotas_nao_conferidas_df.to_csv(f, index=False)
-            if info_adicional.strip():
-                f.write('\nInformações adicionais sobre o fechamento da expedição:\n')
-                f.write(info_adicional.strip() + '\n')
-
-        print(f'Arquivo {csv_path} gerado com sucesso!')
-
-        # Função para converter DataFrame em dados para Table do ReportLab
-        def df_to_tabledata(df):
-            data = [list(df.columns)] + df.astype(str).values.tolist()
-            return data
-
-        # Cores Shopee
-        SHOPEE_ORANGE = colors.HexColor('#FF5722')
-        SHOPEE_BG = colors.HexColor('#F5F5F5')
-        SHOPEE_TEXT = colors.HexColor('#222222')
-
-        # Criar PDF
-        pdf_path = os.path.join(output_dir, 'relatorio_expedicao.pdf')
-        doc = SimpleDocTemplate(pdf_path, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
-        elements = []
-
-        styles = getSampleStyleSheet()
-        style_title = ParagraphStyle(
-            'ShopeeTitle',
-            parent=styles['Heading1'],
-            fontSize=22,
-            textColor=SHOPEE_ORANGE,
-            spaceAfter=18,
-            alignment=TA_CENTER  # Centraliza o texto
-        )
-        style_section = ParagraphStyle(
-            'ShopeeSection',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=SHOPEE_ORANGE,
-            spaceAfter=12,
-            alignment=TA_CENTER  # Centraliza o título da seção
+    rotas_piso_df = rotas_piso_df.join(info_exp, on='Rota').join(info_aud, on='Rota')
+
+    # Definir a quantidade de pacotes com base no status da rota:
+    # validada -> total final, não validada -> total inicial,
+    # ausente na auditoria -> pacotes distintos no arquivo de expedição
+    validada = rotas_piso_df['Rota'].map(status_rotas).eq('validada')
+    na_auditoria = rotas_piso_df['Pacotes Finais'].notna()
+    pacotes = np.where(validada, rotas_piso_df['Pacotes Finais'], rotas_piso_df['Pacotes Iniciais'])
+    pacotes = np.where(na_auditoria, pacotes, rotas_piso_df['Pacotes Expedição'].fillna(0))
+    rotas_piso_df['Pacotes'] = pacotes.astype(int)
+
+    pacotes_por_rota_df = rotas_piso_df[['Rota', 'Transportadora', 'Motorista', 'Pacotes']].copy()
+
+    # Substituir valores nulos, vazios ou o texto literal 'nan' por 'Não atribuído'
+    for col in ['Transportadora', 'Motorista']:
+        texto = pacotes_por_rota_df[col].astype(str)
+        sem_valor = (
+            pacotes_por_rota_df[col].isna() |
+            (texto.str.strip() == '') |
+            (texto.str.lower() == 'nan')
         )
-        style_normal = ParagraphStyle('ShopeeNormal', parent=styles['Normal'], fontSize=10, textColor=SHOPEE_TEXT)
+        pacotes_por_rota_df[col] = pacotes_por_rota_df[col].mask(sem_valor, 'Não atribuído')
 
-        # Título principal
-        elements.append(Paragraph('Relatório de Expedição - Shopee', style_title))
-        
-        # Adicionar turno selecionado
-        config_manager = ConfigManager()
-        config = config_manager.load_config()
-        window_config = config.get(current_window_key, {})
-        if window_config:
-            window_display = config_manager.format_window_display(current_window_key, window_config)
-            elements.append(Paragraph(window_display, style_section))
-        
-        elements.append(Spacer(1, 18))
+    # Calcular totais
+    total_rotas = len(rotas_no_piso_set)
+    total_pacotes = pacotes_por_rota_df['Pacotes'].sum() if not pacotes_por_rota_df.empty else 0
 
-        # Seção: Métricas Gerais
-        table = Table(df_to_tabledata(resumo_df), hAlign='CENTER')
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), SHOPEE_ORANGE),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 11),
-            ('FONTSIZE', (0,1), (-1,-1), 10),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, SHOPEE_BG]),
-            ('GRID', (0,0), (-1,-1), 0.25, colors.lightgrey),
-        ]))
-        elements.append(KeepTogether([
-            Paragraph('Métricas Gerais', style_section),
-            table,
-            Spacer(1, 18)
-        ]))
-
-        # Seção: Rotas Expedidas por Transportadora
-        table = Table(df_to_tabledata(rotas_por_agencia), hAlign='CENTER')
-        
-        # Determinar a linha de totais (normalmente é a última linha)
-        total_row = len(df_to_tabledata(rotas_por_agencia)) - 1
-        
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), SHOPEE_ORANGE),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 11),
-            ('FONTSIZE', (0,1), (-1,-1), 10),
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, SHOPEE_BG]),
-            ('GRID', (0,0), (-1,-1), 0.25, colors.lightgrey),
-            # Destacar a linha de totais
-            ('BACKGROUND', (0,total_row), (-1,total_row), colors.HexColor('#F5F5F5')),
-            ('FONTNAME', (0,total_row), (-1,total_row), 'Helvetica-Bold'),
-            ('LINEABOVE', (0,total_row), (-1,total_row), 1, colors.HexColor('#BBBBBB')),
-            ('LINEBELOW', (0,total_row), (-1,total_row), 1, colors.HexColor('#BBBBBB')),
-        ]))
-        elements.append(KeepTogether([
-            Paragraph('Rotas Expedidas por Transportadora', style_section),
-            table,
-            Spacer(1, 18)
-        ]))
-
-        # Seção: Rotas Expedidas por Tipo de Veículo
-        table = Table(df_to_tabledata(rotas_por_veiculo), hAlign='CENTER')
-        
-        # Determinar a linha de totais (normalmente é a última linha)
-        total_row = len(df_to_tabledata(rotas_por_veiculo)) - 1
-        
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), SHOPEE_ORANGE),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 11),
-            ('FONTSIZE', (0,1), (-1,-1), 10),
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, SHOPEE_BG]),
-            ('GRID', (0,0), (-1,-1), 0.25, colors.lightgrey),
-            # Destacar a linha de totais
-            ('BACKGROUND', (0,total_row), (-1,total_row), colors.HexColor('#F5F5F5')),
-            ('FONTNAME', (0,total_row), (-1,total_row), 'Helvetica-Bold'),
-            ('LINEABOVE', (0,total_row), (-1,total_row), 1, colors.HexColor('#BBBBBB')),
-            ('LINEBELOW', (0,total_row), (-1,total_row), 1, colors.HexColor('#BBBBBB')),
-        ]))
-        elements.append(KeepTogether([
-            Paragraph('Rotas Expedidas por Tipo de Veículo', style_section),
-            table,
-            Spacer(1, 18)
-        ]))
-
-        # Seção: Rotas e Pedidos Expedidos por Hora
-        # Usar PageBreak para garantir que esta seção comece em uma nova página
-        elements.append(PageBreak())
-        
-        # Título da seção
-        section_title = Paragraph('Rotas e Pedidos Expedidos por Hora', style_section)
-        
-        table = Table(df_to_tabledata(expedidos_por_hora), hAlign='CENTER')
-        
-        # Determinar a linha de totais (normalmente é a última linha)
-        total_row = len(df_to_tabledata(expedidos_por_hora)) - 1
-        
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), SHOPEE_ORANGE),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 11),
-            ('FONTSIZE', (0,1), (-1,-1), 10),
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, SHOPEE_BG]),
-            ('GRID', (0,0), (-1,-1), 0.25, colors.lightgrey),
-            # Destacar a linha de totais
-            ('BACKGROUND', (0,total_row), (-1,total_row), colors.HexColor('#F5F5F5')),
-            ('FONTNAME', (0,total_row), (-1,total_row), 'Helvetica-Bold'),
-            ('LINEABOVE', (0,total_row), (-1,total_row), 1, colors.HexColor('#BBBBBB')),
-            ('LINEBELOW', (0,total_row), (-1,total_row), 1, colors.HexColor('#BBBBBB')),
-        ]))
-        
-        # Primeiro conteúdo da página: título e tabela (mantendo juntos)
-        elements.append(KeepTogether([
-            section_title,
-            Spacer(1, 10),
-            table,
-            Spacer(1, 20)
-        ]))
-        
-        # Adicionar gráficos na mesma página
-        if graficos_buffer and len(graficos_buffer) > 0:
-            # Adicionar gráfico logo após a tabela
-            img_width = 18 * cm
-            img_height = 9 * cm
-            elements.append(Image(graficos_buffer[0], width=img_width, height=img_height))
-            elements.append(Spacer(1, 18))
-
-        # Seção: Tempo médio de conferência e ociosidade por operador
-        table = Table(df_to_tabledata(metricas_operador_df), hAlign='CENTER')
-        
-        # Determinar a linha de média geral (normalmente é a última linha)
-        total_row = len(df_to_tabledata(metricas_operador_df)) - 1
-        
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), SHOPEE_ORANGE),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 11),
-            ('FONTSIZE', (0,1), (-1,-1), 10),
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, SHOPEE_BG]),
-            ('GRID', (0,0), (-1,-1), 0.25, colors.lightgrey),
-            # Destacar a linha de média geral
-            ('BACKGROUND', (0,total_row), (-1,total_row), colors.HexColor('#F5F5F5')),
-            ('FONTNAME', (0,total_row), (-1,total_row), 'Helvetica-Bold'),
-            ('LINEABOVE', (0,total_row), (-1,total_row), 1, colors.HexColor('#BBBBBB')),
-            ('LINEBELOW', (0,total_row), (-1,total_row), 1, colors.HexColor('#BBBBBB')),
-        ]))
-        elements.append(KeepTogether([
-            Paragraph('Tempo Médio de Conferência e Ociosidade por Operador', style_section),
-            table,
-            Spacer(1, 18)
-        ]))
-
-        # Seção: Rotas NS - Ficaram no Piso
-        table = Table(df_to_tabledata(rotas_nao_conferidas_df), hAlign='CENTER')
-        
-        # Determinar a linha de totais (normalmente é a última linha)
-        total_row = len(df_to_tabledata(rotas_nao_conferidas_df)) - 1
-        
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), SHOPEE_ORANGE),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 11),
-            ('FONTSIZE', (0,1), (-1,-1), 10),
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, SHOPEE_BG]),
-            ('GRID', (0,0), (-1,-1), 0.25, colors.lightgrey),
-            # Destacar a linha de totais
-            ('BACKGROUND', (0,total_row), (-1,total_row), colors.HexColor('#F5F5F5')),
-            ('FONTNAME', (0,total_row), (-1,total_row), 'Helvetica-Bold'),
-            ('LINEABOVE', (0,total_row), (-1,total_row), 1, colors.HexColor('#BBBBBB')),
-            ('LINEBELOW', (0,total_row), (-1,total_row), 1, colors.HexColor('#BBBBBB')),
-        ]))
-        elements.append(KeepTogether([
-            Paragraph('Rotas NS - Ficaram no Piso', style_section),
-            table,
-            Spacer(1, 18)
-        ]))
-
-        # Adicionar informações adicionais ao PDF
-        if info_adicional.strip():
-            elements.append(PageBreak())
-            elements.append(Paragraph('Informações adicionais sobre o fechamento da expedição:', style_section))
-            elements.append(Paragraph(info_adicional.strip().replace('\n', '<br/>'), style_normal))
-
-        # Gerar PDF
-        print('Gerando PDF...')
-        doc.build(elements)
-        print(f'Relatório PDF gerado com sucesso: {pdf_path}')
-
-        # Geração do arquivo Excel estilizado
-        xlsx_path = os.path.join(output_dir, 'relatorio_expedicao.xlsx')
-        with pd.ExcelWriter(xlsx_path, engine='openpyxl') as writer:
-            resumo_df.to_excel(writer, sheet_name='Resumo', index=False, startrow=2)
-            rotas_por_agencia.to_excel(writer, sheet_name='Rotas por Transportadora', index=False, startrow=2)
-            rotas_por_veiculo.to_excel(writer, sheet_name='Rotas por Tipo de Veículo', index=False, startrow=2)
-            expedidos_por_hora.to_excel(writer, sheet_name='Hora a Hora', index=False, startrow=2)
-            metricas_operador_df.to_excel(writer, sheet_name='Métricas por Operador', index=False, startrow=2)
-            rotas_nao_conferidas_df.to_excel(writer, sheet_name='Rotas NS', index=False, startrow=2)
-            
-            if info_adicional.strip():
-                info_df = pd.DataFrame({'Informações adicionais sobre o fechamento da expedição:': [info_adicional.strip()]})
-                info_df.to_excel(writer, sheet_name='Informações Adicionais', index=False)
-
-            wb = writer.book
-            orange_fill = PatternFill(start_color='FF5722', end_color='FF5722', fill_type='solid')
-            white_font = Font(color='FFFFFF', bold=True)
-            left_align = Alignment(horizontal='left', vertical='center')
-            border = Border(left=Side(style='thin', color='DDDDDD'),
-                            right=Side(style='thin', color='DDDDDD'),
-                            top=Side(style='thin', color='DDDDDD'),
-                            bottom=Side(style='thin', color='DDDDDD'))
-            title_font = Font(color='FF5722', bold=True, size=16)
-
-            titulos = {
-                'Resumo': 'Métricas Gerais',
-                'Rotas por Transportadora': 'Rotas Expedidas por Transportadora',
-                'Rotas por Tipo de Veículo': 'Rotas Expedidas por Tipo de Veículo',
-                'Hora a Hora': 'Rotas e Pedidos Expedidos por Hora',
-                'Métricas por Operador': 'Tempo Médio de Conferência e Ociosidade por Operador',
-                'Rotas NS': 'Rotas NS - Ficaram no Piso'
-            }
-
-            total_fill = PatternFill(start_color='F5F5F5', end_color='F5F5F5', fill_type='solid')
-            bold_font = Font(bold=True)
-            thick_border = Border(top=Side(style='medium', color='BBBBBB'),
-                                 bottom=Side(style='medium', color='BBBBBB'),
-                                 left=Side(style='thin', color='DDDDDD'),
-                                 right=Side(style='thin', color='DDDDDD'))
-            
-            for sheet_name in ['Resumo', 'Rotas por Transportadora', 'Rotas por Tipo de Veículo', 'Hora a Hora', 'Métricas por Operador', 'Rotas NS']:
-                if sheet_name in wb.sheetnames:  # Verificar se a aba existe
-                    ws = wb[sheet_name]
-                    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=ws.max_column)
-                    cell = ws.cell(row=1, column=1)
-                    cell.value = titulos[sheet_name]
-                    cell.font = title_font
-                    cell.alignment = left_align
-                    
-                    # Estilizar cabeçalho
-                    for cell in ws[3]:
-                        cell.fill = orange_fill
-                        cell.font = white_font
-                        cell.alignment = left_align
-                        cell.border = border
-                    
-                    # Estilizar linhas de dados
-                    max_row = ws.max_row
-                    for row_idx, row in enumerate(ws.iter_rows(min_row=4, max_row=max_row), 4):
-                        # Verificar se é a última linha (totais)
-                        is_total_row = False
-                        first_cell_value = ws.cell(row=row_idx, column=1).value
-                        if first_cell_value and (str(first_cell_value).lower().startswith('total') or 
-                                                str(first_cell_value).lower() == 'média geral'):
-                            is_total_row = True
-                        
-                        for cell in row:
-                            cell.alignment = left_align
-                            
-                            if is_total_row:
-                                # Aplicar estilo especial para linha de totais
-                                cell.fill = total_fill
-                                cell.font = bold_font
-                                cell.border = thick_border
-                            else:
-                                # Estilo normal para outras linhas
-                                cell.border = border
-                    for idx, col in enumerate(ws.iter_cols(min_row=1, max_row=ws.max_row, min_col=1, max_col=ws.max_column)):
-                        max_length = 0
-                        for cell in col:
-                            if cell.value is not None:
-                                try:
-                                    if len(str(cell.value)) > max_length:
-                                        max_length = len(str(cell.value))
-                                except:
-                                    pass
-                        col_letter = get_column_letter(idx + 1)
-                        ws.column_dimensions[col_letter].width = max_length + 2
-
-        print(f'Arquivo {xlsx_path} gerado com sucesso!')
+    # Criar a linha de totais
+    totais_df = pd.DataFrame([{
+        'Rota': f'Total ({total_rotas} rotas)',
+        'Transportadora': '',
+        'Motorista': '',
+        'Pacotes': total_pacotes
+    }])
+
+    rotas_nao_conferidas_df = pd.concat([pacotes_por_rota_df, totais_df], ignore_index=True) if not pacotes_por_rota_df.empty else totais_df
+
+    # Aplicar title case apenas na coluna de Motorista (mantendo o anterior)
+    if 'Motorista' in rotas_nao_conferidas_df.columns:
+        rotas_nao_conferidas_df['Motorista'] = rotas_nao_conferidas_df['Motorista'].astype(str).str.title()
+        # Garantir que "nan" depois de title case não seja exibido como "Nan"
+        rotas_nao_conferidas_df.loc[rotas_nao_conferidas_df['Motorista'] == 'Nan', 'Motorista'] = 'Não atribuído'
+
+    # Montar DataFrame final para exportação
+    resumo = []
+
+    # Usar primariamente o arquivo de auditoria para as contagens
+    rotas_programadas = df_auditoria['AT/TO'].nunique()
+    pedidos_programados = df_auditoria['Total Initial Orders Inside AT/TO'].astype(float).sum()
+
+    # Rotas expedidas e pedidos expedidos vêm das rotas validadas
+    rotas_expedidas = df_validadas['AT/TO'].nunique()
+    pedidos_expedidos = df_validadas['Total Final Orders Inside AT/TO'].astype(float).sum()
+
+    # Rotas não conferidas são as que estão no arquivo de auditoria mas não foram validadas
+    rotas_auditoria = set(df_auditoria['AT/TO'].unique())
+    rotas_validadas = set(df_validadas['AT/TO'].unique())
+    rotas_nao_conferidas = rotas_auditoria - rotas_validadas
+    rotas_no_piso = len(rotas_nao_conferidas)
+
+    resumo.append({'Métrica': 'Quantidade de rotas programadas', 'Valor': rotas_programadas})
+    resumo.append({'Métrica': 'Quantidade de rotas expedidas', 'Valor': rotas_expedidas})
+    resumo.append({'Métrica': 'Quantidade de pedidos programados', 'Valor': int(pedidos_programados)})
+    resumo.append({'Métrica': 'Quantidade de pedidos expedidos', 'Valor': int(pedidos_expedidos)})
+    resumo.append({'Métrica': 'Quantidade de rotas que ficaram no piso', 'Valor': rotas_no_piso})
+    resumo.append({'Métrica': 'Horário de início da expedição', 'Valor': format_hms(inicio_expedicao)})
+    resumo.append({'Métrica': 'Horário de fim da expedição', 'Valor': format_hms(fim_expedicao)})
+    resumo.append({'Métrica': 'Média de tempo de giro de bancada', 'Valor': media_conferencia_fmt})
+
+    resumo_df = pd.DataFrame(resumo)
+    tabelas = (resumo_df, rotas_por_agencia, rotas_por_veiculo, expedidos_por_hora,
+               metricas_operador_df, rotas_nao_conferidas_df)
+    registro.finalizar(sum(len(df) for df in tabelas), sum(memoria_df(df) for df in tabelas))
+
+    # Gerar gráficos de rotas e pedidos por hora
+    progresso.etapa('Gerando gráficos')
+    registro.iniciar('Gráficos', len(expedidos_por_hora))
+    graficos_buffer = criar_grafico_hora_a_hora(expedidos_por_hora)
+    registro.finalizar(len(graficos_buffer), sum(buf.getbuffer().nbytes for buf in graficos_buffer))
+
+    # Descrição da janela exibida no cabeçalho do PDF e no email
+    config_manager = get_config_manager()
+    window_config = config_manager.get_schedule().config.get(current_window_key, {})
+    descricao_janela = config_manager.format_window_display(current_window_key, window_config) if window_config else ''
+
+    return RelatorioExpedicao(
+        janela=current_window_key,
+        descricao_janela=descricao_janela,
+        resumo=TabelaRelatorio.de_df(resumo_df),
+        rotas_por_agencia=TabelaRelatorio.de_df(rotas_por_agencia),
+        rotas_por_veiculo=TabelaRelatorio.de_df(rotas_por_veiculo),
+        expedidos_por_hora=TabelaRelatorio.de_df(expedidos_por_hora),
+        metricas_operador=TabelaRelatorio.de_df(metricas_operador_df),
+        rotas_nao_conferidas=TabelaRelatorio.de_df(rotas_nao_conferidas_df),
+        graficos=tuple(buf.getvalue() for buf in graficos_buffer)
+    )
+
+def renderizar_relatorio(relatorio, output_dir, info_adicional, progresso=None, registro=None):
+    """
+    Gera CSV, PDF e Excel em paralelo a partir do modelo do relatório
+    
+    Não refaz nenhum cálculo: pode ser chamada novamente, por exemplo, após
+    editar as informações adicionais.
+    
+    Args:
+        relatorio: RelatorioExpedicao retornado por calcular_relatorio
+        output_dir: diretório de saída para os relatórios
+        info_adicional: texto de informações adicionais sobre o fechamento da expedição
+        progresso: ProgressoRelatorio que recebe o andamento da geração dos arquivos
+        registro: RegistroExecucao que recebe o tempo de cada renderizador
+    
+    Raises:
+        RuntimeError: se algum dos arquivos não pôde ser gerado (os demais são gerados normalmente)
+        ProcessamentoCancelado: se o cancelamento foi pedido antes da geração
+    """
+    if progresso is None:
+        progresso = ProgressoRelatorio()
+    renderizadores = {
+        'CSV': partial(gerar_csv, os.path.join(output_dir, 'resumo_expedicao.csv'), relatorio, info_adicional),
+        'PDF': partial(gerar_pdf, os.path.join(output_dir, 'relatorio_expedicao.pdf'), relatorio, info_adicional),
+        'Excel': partial(gerar_xlsx, os.path.join(output_dir, 'relatorio_expedicao.xlsx'), relatorio, info_adicional),
+    }
+    
+    progresso.etapa('Gerando arquivos')
+    concluidos = []
+
+    def ao_concluir(nome):
+        # Arquivos já em geração não são interrompidos: o cancelamento vale até aqui
+        concluidos.append(nome)
+        progresso.etapa('Gerando arquivos', len(concluidos) / len(renderizadores), verificar_cancelamento=False)
+
+    # No modo de perfilamento os renderizadores rodam em threads perfiladas
+    perfilamento = registro.perfilamento if registro is not None else None
+    em_processos = None
+    if perfilamento is not None:
+        renderizadores = {nome: perfilamento.perfilar(funcao) for nome, funcao in renderizadores.items()}
+        em_processos = False
+        perfilamento.inicio_etapa()
+
+    inicio = time.perf_counter()
+    resultados = executar_renderizadores(renderizadores, em_processos, ao_concluir)
+    if perfilamento is not None:
+        perfilamento.fim_etapa('Geração dos arquivos')
+    linhas_relatorio = sum(tabela.linhas for tabela in relatorio.tabelas().values())
+    falhas = []
+    for nome, (tempo, cpu, erro) in resultados.items():
+        if registro is not None:
+            registro.registrar(f'Arquivo {nome}', tempo, cpu, linhas_entrada=linhas_relatorio)
+        if erro is None:
+            print(f'Renderização - {nome}: {tempo:.2f}s')
+        else:
+            print(f'Renderização - {nome}: falhou após {tempo:.2f}s: {str(erro)}')
+            falhas.append(nome)
+    print(f'Renderização - total: {time.perf_counter() - inicio:.2f}s')
+    
+    if falhas:
+        raise RuntimeError(f"Falha ao gerar: {', '.join(falhas)}")
+
+def main(expedicao_files, conferencia_file, output_dir, info_adicional, current_window_key="MANHA",
+         progresso=None, cancelamento=None, registro=None):
+    """
+    Função principal para gerar os relatórios
+    
+    O registro da execução (tempo, CPU, linhas e memória de cada etapa) é
+    gravado em JSON no diretório de saída, inclusive quando o processamento
+    falha ou é cancelado. Com PERFILAMENTO=true no .env, a execução também é
+    perfilada e o perfil de CPU (.prof) e o relatório de alocações por etapa
+    são gravados no mesmo diretório.
+    
+    Args:
+        expedicao_files: lista de caminhos de arquivos CSV de expedição
+        conferencia_file: caminho do arquivo CSV de conferência
+        output_dir: diretório de saída para os relatórios
+        info_adicional: texto de informações adicionais sobre o fechamento da expedição
+        current_window_key: chave da janela atual (MANHA, TARDE, NOITE)
+        progresso: função (etapa, fração de 0 a 1, segundos decorridos) chamada
+            a cada etapa, na thread do processamento
+        cancelamento: TokenCancelamento; o processamento para na próxima etapa
+            depois que ele for cancelado
+        registro: RegistroExecucao que recebe as medições; se omitido, um novo
+            registro é criado
+    
+    Returns:
+        RelatorioExpedicao, ou None se o processamento falhou
+
+    Raises:
+        ProcessamentoCancelado: se o processamento foi cancelado
+    """
+    andamento = ProgressoRelatorio(progresso, cancelamento)
+    if registro is None:
+        registro = RegistroExecucao(current_window_key, list(expedicao_files) + [conferencia_file])
+    env_config = get_env_config()
+    if env_config.is_profiling() and registro.perfilamento is None:
+        registro.perfilamento = PerfilamentoExecucao(env_config.get_int('PERFILAMENTO_TOP_ALOCACOES', 20))
+        registro.perfilamento.iniciar()
+    try:
+        relatorio = calcular_relatorio(expedicao_files, conferencia_file, current_window_key, andamento, registro)
+        renderizar_relatorio(relatorio, output_dir, info_adicional, andamento, registro)
+        registro.concluir('concluido')
+        andamento.concluir()
+        return relatorio
+    except ProcessamentoCancelado as e:
+        registro.concluir('cancelado', str(e))
+        print("Processamento cancelado")
+        raise
     except Exception as e:
-        print(f"Erro ao processar o relatório: {str(e)}")
\ No newline at end of file
+        registro.concluir('erro', str(e))
+        print(f"Erro ao processar o relatório: {str(e)}")
+        return None
+    finally:
+        if registro.perfilamento is not None:
+            registro.perfilamento.parar()
+        _salvar_registro(registro, output_dir)
+
+def _salvar_registro(registro, output_dir):
+    """Grava o registro da execução no diretório de saída e o mostra no console em modo debug"""
+    if get_env_config().is_debug():
+        print('\n'.join(registro.linhas_texto()))
+    if not os.path.isdir(output_dir):
+        return
+    try:
+        print(f'Registro da execução: {registro.salvar(output_dir)}')
+        if registro.perfilamento is not None:
+            for caminho in registro.perfilamento.salvar(output_dir, registro):
+                print(f'Perfil da execução: {caminho}')
+    except OSError as e:
+        print(f"Aviso: não foi possível gravar o registro da execução: {str(e)}")
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Benchmarks das etapas críticas do processamento de relatórios
+Compara as implementações vetorizadas com as versões em loop que elas substituíram
+
+Uso:
+    python benchmark_relatorios.py janelas --linhas 200000
+    python benchmark_relatorios.py piso --linhas 200000
+    python benchmark_relatorios.py ingestao --linhas 500000 --arquivos 6
+    python benchmark_relatorios.py formatacao --linhas 200000
+    python benchmark_relatorios.py importacao
+    python benchmark_relatorios.py pipeline --tamanhos 10000 100000 1000000 5000000 --saida pipeline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from config_manager import ConfigManager
+from analise_relatorios import (identificar_rotas_outras_janelas, identificar_rotas_no_piso, format_hms, formatar_hms,
+                                MODULOS_RENDERIZACAO, main as processar_relatorio)
+from dados_sinteticos import gerar_rotas, gerar_conferencia, gerar_blocos_assignment, gerar_assignment, gerar_exportacoes
+from env_config import get_env_config
+from instrumentacao import RegistroExecucao
+from reducao_expedicao import reduzir_expedicoes
+
+# Linhas de assignment de cada execução do benchmark do processamento completo
+TAMANHOS_PIPELINE = (10000, 100000, 1000000, 5000000)
+
+
+def _identificar_rotas_outras_janelas_loop(df_assignment, current_window_key):
+    """Implementação anterior (iterrows), mantida apenas como referência de benchmark"""
+    config_manager = ConfigManager()
+    df = df_assignment.copy()
+    df['janela_carregamento'] = ''
+    df['outra_janela'] = False
+
+    for idx, row in df.iterrows():
+        delivery_date = row['Delivery Date'] if 'Delivery Date' in row else None
+        if delivery_date:
+            if isinstance(delivery_date, pd.Timestamp):
+                delivery_date = delivery_date.strftime('%Y-%m-%d')
+            elif isinstance(delivery_date, str):
+                try:
+                    delivery_date = pd.to_datetime(delivery_date).strftime('%Y-%m-%d')
+                except:
+                    delivery_date = None
+        if delivery_date:
+            window_key, is_other_window = config_manager.get_window_by_delivery_date(
+                delivery_date,
+                current_window_key
+            )
+            df.at[idx, 'janela_carregamento'] = config_manager.get_window_name(window_key)
+            df.at[idx, 'outra_janela'] = is_other_window
+
+    return df
+
+
+def _identificar_rotas_no_piso_loop(df_auditoria, df_expedicao):
+    """Implementação anterior (busca linear por rota), mantida apenas como referência de benchmark"""
+    rotas_no_piso = set()
+    status_rotas = {}
+    rotas_nao_validadas = set(df_auditoria[df_auditoria['AT/TO Validation Status'] != 'Validated']['AT/TO'])
+    rotas_no_piso.update(rotas_nao_validadas)
+    for rota in rotas_nao_validadas:
+        status_rotas[rota] = 'nao_validada'
+
+    rotas_validadas = set(df_auditoria[df_auditoria['AT/TO Validation Status'] == 'Validated']['AT/TO'])
+    for rota in rotas_validadas:
+        if rota in df_expedicao['Task ID'].values:
+            status_rota = df_expedicao[df_expedicao['Task ID'] == rota]['Status'].iloc[0]
+            if status_rota in ['Processing', 'Processed']:
+                rotas_no_piso.add(rota)
+                status_rotas[rota] = 'validada'
+    return rotas_no_piso, status_rotas
+
+
+def _cronometrar(funcao, *args, repeticoes=1):
+    """Executa a função e retorna (menor tempo em segundos, último resultado)"""
+    melhor = float('inf')
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def benchmark_janelas(linhas):
+    """Classificação de janela de carregamento: iterrows x vetorizado"""
+    df = gerar_assignment(linhas)
+    tempo_loop, df_loop = _cronometrar(_identificar_rotas_outras_janelas_loop, df, 'TARDE')
+    tempo_vet, df_vet = _cronometrar(identificar_rotas_outras_janelas, df, 'TARDE', repeticoes=3)
+
+    colunas = ['janela_carregamento', 'outra_janela']
+    iguais = df_loop[colunas].equals(df_vet[colunas])
+
+    print(f"Classificação de janelas - {linhas} linhas")
+    print(f"  loop (iterrows): {tempo_loop:.3f}s")
+    print(f"  vetorizado:      {tempo_vet:.3f}s")
+    print(f"  ganho:           {tempo_loop / tempo_vet:.1f}x")
+    print(f"  resultados idênticos: {'sim' if iguais else 'NÃO'}")
+    return iguais
+
+
+def benchmark_piso(linhas):
+    """Identificação de rotas no piso: busca linear por rota x índice Task ID -> Status"""
+    df_rotas = gerar_rotas(max(1, linhas // 40))
+    df_expedicao = pd.concat(gerar_blocos_assignment(df_rotas, linhas), ignore_index=True)
+    df_auditoria = gerar_conferencia(df_rotas)
+    tempo_loop, resultado_loop = _cronometrar(_identificar_rotas_no_piso_loop, df_auditoria, df_expedicao)
+    tempo_idx, resultado_idx = _cronometrar(identificar_rotas_no_piso, df_auditoria, df_expedicao, repeticoes=3)
+
+    iguais = resultado_loop == resultado_idx
+
+    print(f"Rotas no piso - {linhas} linhas, {len(df_auditoria)} rotas")
+    print(f"  busca linear: {tempo_loop:.3f}s")
+    print(f"  índice:       {tempo_idx:.3f}s")
+    print(f"  ganho:        {tempo_loop / tempo_idx:.1f}x")
+    print(f"  resultados idênticos: {'sim' if iguais else 'NÃO'}")
+    return iguais
+
+
+def benchmark_ingestao(linhas, arquivos=6):
+    """Ingestão e redução de vários arquivos de expedição: série x pool de processos"""
+    # O cache de exportações mascararia o custo do parse nas repetições
+    os.environ['CACHE_EXPORTACOES'] = 'false'
+
+    nucleos = os.cpu_count() or 1
+    quantidades = sorted({p for p in (1, 2, 4, 8) if p <= nucleos} | {min(nucleos, arquivos)})
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminhos = []
+        for i in range(arquivos):
+            caminho = os.path.join(diretorio, f'expedicao_{i}.csv')
+            gerar_assignment(linhas, seed=i).to_csv(caminho, index=False)
+            caminhos.append(caminho)
+
+        print(f"Ingestão - {arquivos} arquivos x {linhas} linhas, {nucleos} núcleo(s)")
+        tempo_serie = None
+        referencia = None
+        iguais = True
+        for processos in quantidades:
+            tempo, (reducao, _) = _cronometrar(lambda: reduzir_expedicoes(caminhos, processos=processos))
+            resultado = reducao.resultado()
+            if referencia is None:
+                tempo_serie, referencia = tempo, resultado
+            else:
+                iguais = iguais and resultado.astype(object).equals(referencia.astype(object))
+            print(f"  {processos} processo(s): {tempo:.3f}s ({tempo_serie / tempo:.1f}x)")
+        print(f"  resultados idênticos: {'sim' if iguais else 'NÃO'}")
+    return iguais
+
+
+def benchmark_formatacao(linhas):
+    """Formatação HH:MM:SS: format_hms valor a valor x formatar_hms vetorizado"""
+    rng = np.random.default_rng(42)
+    # Durações de -1h a 30h (com frações de segundo) e horários ao longo de um dia, com ausentes
+    duracoes = pd.Series(pd.to_timedelta(rng.integers(-3600 * 10**9, 30 * 3600 * 10**9, linhas), unit='ns'))
+    horarios = pd.Series(pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 86400 * 10**9, linhas), unit='ns'))
+    duracoes[::50] = pd.NaT
+    horarios[::50] = pd.NaT
+
+    iguais = True
+    print(f"Formatação HH:MM:SS - {linhas} valores")
+    for nome, serie in [('durações', duracoes), ('horários', horarios)]:
+        tempo_escalar, esperado = _cronometrar(lambda: serie.map(format_hms))
+        tempo_vet, obtido = _cronometrar(formatar_hms, serie, repeticoes=3)
+        iguais = iguais and esperado.equals(obtido)
+        print(f"  {nome}: valor a valor {tempo_escalar:.3f}s, vetorizado {tempo_vet:.3f}s "
+              f"({tempo_escalar / tempo_vet:.1f}x)")
+    print(f"  resultados idênticos: {'sim' if iguais else 'NÃO'}")
+    return iguais
+
+
+def _importar_em_processo_novo(modulo):
+    """
+    Importa o módulo em um interpretador novo (importação a frio)
+
+    Returns:
+        tuple: (tempo em segundos ou None se falhou, bibliotecas de renderização carregadas junto)
+    """
+    codigo = (
+        "import sys, time\n"
+        "inicio = time.perf_counter()\n"
+        f"import {modulo}\n"
+        "print(time.perf_counter() - inicio)\n"
+        f"print(','.join(m for m in {MODULOS_RENDERIZACAO!r} if m in sys.modules))\n"
+    )
+    resultado = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    if resultado.returncode != 0:
+        return None, []
+    tempo, carregadas = resultado.stdout.splitlines()[-2:]
+    return float(tempo), [m for m in carregadas.split(',') if m]
+
+
+def benchmark_importacao(linhas=None):
+    """
+    Tempo de importação a frio da interface, da análise e de cada biblioteca de renderização
+
+    A importação da interface deve caber no orçamento ORCAMENTO_INICIO_GUI_MS e
+    não pode carregar as bibliotecas de renderização (que são pré-carregadas em
+    segundo plano depois que a janela abre).
+    """
+    orcamento_ms = get_env_config().get_int('ORCAMENTO_INICIO_GUI_MS', 2000)
+    dentro = True
+    print(f"Importação a frio (orçamento da interface: {orcamento_ms} ms)")
+    for modulo in ('gui_relatorio', 'analise_relatorios') + MODULOS_RENDERIZACAO:
+        tempo, carregadas = _importar_em_processo_novo(modulo)
+        if tempo is None:
+            print(f"  {modulo}: não foi possível importar")
+            dentro = dentro and modulo != 'gui_relatorio'
+            continue
+        linha = f"  {modulo}: {tempo * 1000:.0f} ms"
+        if modulo in ('gui_relatorio', 'analise_relatorios') and carregadas:
+            linha += f" - carrega {', '.join(carregadas)} na importação"
+            dentro = False
+        if modulo == 'gui_relatorio' and tempo * 1000 > orcamento_ms:
+            linha += " - ACIMA DO ORÇAMENTO"
+            dentro = False
+        print(linha)
+    print(f"  dentro do orçamento: {'sim' if dentro else 'NÃO'}")
+    return dentro
+
+
+def _versao_codigo():
+    """Commit atual do repositório (com '+' se houver alterações locais), ou None fora do git"""
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=diretorio, check=True).stdout.strip()
+        alterado = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                                  text=True, cwd=diretorio, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('+' if alterado else '')
+
+
+def benchmark_pipeline(tamanhos=TAMANHOS_PIPELINE, saida='benchmark_pipeline.json', arquivos=1):
+    """
+    Processamento completo (main) sobre exportações sintéticas de tamanhos crescentes
+
+    Cada tamanho é gerado em um diretório temporário e processado uma vez; o
+    tempo, a CPU, as linhas e a memória de cada etapa vêm do registro da
+    execução. O resultado de todos os tamanhos é gravado em JSON, junto com a
+    versão do código e do ambiente, para comparação entre versões.
+    """
+    # O cache de exportações mascararia o custo do parse
+    os.environ['CACHE_EXPORTACOES'] = 'false'
+
+    execucoes = []
+    concluidos = True
+    for linhas in tamanhos:
+        with tempfile.TemporaryDirectory() as diretorio:
+            inicio = time.perf_counter()
+            expedicoes, conferencia = gerar_exportacoes(diretorio, linhas, arquivos=arquivos)
+            tempo_geracao = time.perf_counter() - inicio
+
+            saida_relatorios = os.path.join(diretorio, 'relatorios')
+            os.makedirs(saida_relatorios)
+            registro = RegistroExecucao('TARDE', expedicoes + [conferencia])
+            processar_relatorio(expedicoes, conferencia, saida_relatorios, '', 'TARDE', registro=registro)
+
+        concluidos = concluidos and registro.situacao == 'concluido'
+        execucao = registro.como_dict()
+        execucao['linhas'] = linhas
+        execucao['tempo_geracao_s'] = round(tempo_geracao, 4)
+        execucoes.append(execucao)
+
+        print(f"Processamento completo - {linhas} linhas ({registro.situacao})")
+        for etapa in execucao['etapas']:
+            print(f"  {etapa['etapa']}: {etapa['tempo_s']:.3f}s (CPU {etapa['cpu_s']:.3f}s)")
+        print(f"  total: {registro.tempo_total:.3f}s")
+
+    resultado = {
+        'versao': 1,
+        'data_hora': datetime.now().isoformat(timespec='seconds'),
+        'codigo': _versao_codigo(),
+        'ambiente': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'sistema': platform.platform(),
+            'nucleos': os.cpu_count(),
+        },
+        'arquivos_por_execucao': arquivos,
+        'execucoes': execucoes,
+    }
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {saida}")
+    return concluidos
+
+
+BENCHMARKS = {
+    'janelas': benchmark_janelas,
+    'piso': benchmark_piso,
+    'ingestao': benchmark_ingestao,
+    'formatacao': benchmark_formatacao,
+    'importacao': benchmark_importacao,
+    'pipeline': benchmark_pipeline,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks do processamento de relatórios')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS), help='Benchmark a executar')
+    parser.add_argument('--linhas', type=int, default=20000, help='Quantidade de linhas sintéticas (por arquivo na ingestão)')
+    parser.add_argument('--arquivos', type=int,
+                        help='Quantidade de arquivos de assignment (padrão: 6 na ingestão, 1 no pipeline)')
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=list(TAMANHOS_PIPELINE),
+                        help='Linhas de assignment de cada execução do pipeline')
+    parser.add_argument('--saida', default='benchmark_pipeline.json', help='Arquivo JSON com os resultados do pipeline')
+    args = parser.parse_args()
+
+    if args.benchmark == 'ingestao':
+        resultado = benchmark_ingestao(args.linhas, args.arquivos or 6)
+    elif args.benchmark == 'pipeline':
+        resultado = benchmark_pipeline(args.tamanhos, args.saida, args.arquivos or 1)
+    else:
+        resultado = BENCHMARKS[args.benchmark](args.linhas)
+    sys.exit(0 if resultado else 1)
@@ -0,0 +1,183 @@
+"""
+Cache local das exportações já lidas e tipadas
+Cada arquivo de entrada é guardado em formato Arrow IPC, identificado pelo hash
+do conteúdo do CSV e pela versão dos esquemas. Uma nova execução sobre o mesmo
+arquivo carrega o DataFrame via memory mapping em vez de refazer o parse.
+"""
+
+import hashlib
+import os
+import threading
+import numpy as np
+from env_config import get_env_config
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow é opcional: sem ele o cache fica desativado
+    pa = None
+    feather = None
+
+EXTENSAO_CACHE = '.arrow'
+TAMANHO_BLOCO_HASH = 4 * 1024 * 1024
+
+
+def hash_arquivo(caminho):
+    """Hash (blake2b) do conteúdo do arquivo, lido em blocos"""
+    h = hashlib.blake2b(digest_size=20)
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO_HASH), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+class CacheExportacoes:
+    """Cache em disco de DataFrames tipados, com limite de tamanho e remoção LRU"""
+
+    def __init__(self, diretorio='cache', limite_mb=1024, ativo=True):
+        """
+        Args:
+            diretorio: pasta onde os arquivos de cache são gravados
+            limite_mb: tamanho máximo do cache; os itens menos usados recentemente
+                são removidos quando o limite é ultrapassado
+            ativo: permite desligar o cache por configuração
+        """
+        self.diretorio = diretorio
+        self.limite_bytes = limite_mb * 1024 * 1024
+        self.ativo = ativo and pa is not None
+        self.acertos = 0
+        self.falhas = 0
+        self.removidos = 0
+        self._lock = threading.Lock()
+
+    def chave(self, arquivo, esquema, versao):
+        """Chave do cache: hash do conteúdo do CSV + nome e versão do esquema"""
+        return f"{esquema.nome}-v{versao}-{hash_arquivo(arquivo)}"
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave + EXTENSAO_CACHE)
+
+    def carregar(self, chave):
+        """
+        Carrega o DataFrame associado à chave
+
+        Returns:
+            DataFrame ou None se a chave não estiver no cache
+        """
+        if not self.ativo:
+            return None
+
+        caminho = self._caminho(chave)
+        try:
+            tabela = feather.read_table(caminho, memory_map=True)
+            df = tabela.to_pandas()
+        except (FileNotFoundError, OSError, pa.ArrowException):
+            with self._lock:
+                self.falhas += 1
+            return None
+
+        # Arrow devolve textos ausentes como None; a análise espera NaN
+        colunas_texto = df.select_dtypes(include='object').columns
+        if len(colunas_texto):
+            df[colunas_texto] = df[colunas_texto].where(df[colunas_texto].notna(), np.nan)
+
+        # Atualizar o horário de acesso para a política LRU
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.acertos += 1
+        return df
+
+    def salvar(self, chave, df):
+        """Grava o DataFrame no cache e aplica o limite de tamanho"""
+        if not self.ativo:
+            return False
+
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            caminho = self._caminho(chave)
+            temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            # Sem compressão para permitir leitura via memory mapping
+            feather.write_feather(tabela, temporario, compression='uncompressed')
+            os.replace(temporario, caminho)
+        except Exception as e:
+            print(f"Aviso: não foi possível gravar o cache de exportações: {str(e)}")
+            return False
+
+        self.aplicar_limite()
+        return True
+
+    def aplicar_limite(self):
+        """Remove os itens menos usados recentemente até respeitar o limite de tamanho"""
+        with self._lock:
+            try:
+                itens = []
+                for nome in os.listdir(self.diretorio):
+                    if nome.endswith(EXTENSAO_CACHE):
+                        caminho = os.path.join(self.diretorio, nome)
+                        stat = os.stat(caminho)
+                        itens.append((stat.st_mtime, stat.st_size, caminho))
+            except OSError:
+                return
+
+            total = sum(item[1] for item in itens)
+            for _, tamanho, caminho in sorted(itens):
+                if total <= self.limite_bytes:
+                    break
+                try:
+                    os.remove(caminho)
+                    total -= tamanho
+                    self.removidos += 1
+                except OSError:
+                    pass
+
+    def reiniciar_contadores(self):
+        """Zera os contadores de acertos, falhas e itens removidos"""
+        with self._lock:
+            self.acertos = 0
+            self.falhas = 0
+            self.removidos = 0
+
+    def somar_contadores(self, acertos, falhas, removidos=0):
+        """Soma contadores obtidos em outro processo (ingestão paralela)"""
+        with self._lock:
+            self.acertos += acertos
+            self.falhas += falhas
+            self.removidos += removidos
+
+    def contadores(self):
+        """Contadores do cache como dicionário (para o registro da execução)"""
+        with self._lock:
+            return {'ativo': self.ativo, 'acertos': self.acertos, 'falhas': self.falhas,
+                    'removidos': self.removidos}
+
+    def estatisticas(self):
+        """Texto com os contadores do cache"""
+        if not self.ativo:
+            motivo = 'pyarrow não instalado' if pa is None else 'desativado na configuração'
+            return f"cache de exportações inativo ({motivo})"
+        return (f"cache de exportações: {self.acertos} acerto(s), {self.falhas} falha(s), "
+                f"{self.removidos} removido(s)")
+
+
+_cache_exportacoes = None
+_cache_exportacoes_lock = threading.Lock()
+
+
+def get_cache_exportacoes() -> CacheExportacoes:
+    """Retorna a instância global do cache, configurada pelo .env (segura entre threads)"""
+    global _cache_exportacoes
+    if _cache_exportacoes is None:
+        with _cache_exportacoes_lock:
+            if _cache_exportacoes is None:
+                env = get_env_config()
+                _cache_exportacoes = CacheExportacoes(
+                    diretorio=env.get('CACHE_EXPORTACOES_DIR', 'cache'),
+                    limite_mb=env.get_int('CACHE_EXPORTACOES_LIMITE_MB', 1024),
+                    ativo=env.get_bool('CACHE_EXPORTACOES', True)
+                )
+    return _cache_exportacoes
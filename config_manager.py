@@ -1,7 +1,96 @@
+import copy
 import json
 import os
+import threading
+from bisect import bisect_right
 from datetime import datetime, time, timedelta
 
+SEGUNDOS_DIA = 24 * 3600
+
+def _segundos_do_dia(horario):
+    """Converte um time (ou texto HH:MM) em segundos desde a meia-noite"""
+    if isinstance(horario, str):
+        horario = datetime.strptime(horario, "%H:%M").time()
+    return horario.hour * 3600 + horario.minute * 60 + horario.second + horario.microsecond / 1e6
+
+class JanelasCompiladas:
+    """
+    Agenda de janelas pré-processada a partir do windows_config.json
+    
+    Os limites de cada janela são convertidos uma única vez em segundos do dia
+    e guardados em listas ordenadas, permitindo responder "qual janela contém
+    o horário T" por busca binária. Janelas que cruzam a meia-noite
+    (ex: 22:00 às 02:00) são divididas em dois segmentos. Cada segmento guarda
+    a posição da janela no arquivo: quando janelas se sobrepõem, vale a
+    primeira do windows_config.json, como na busca linear original.
+    """
+    
+    def __init__(self, config):
+        self.config = config
+        
+        segmentos = []
+        inicios_janela = []
+        for ordem, (window_key, window_config) in enumerate(config.items()):
+            inicio = _segundos_do_dia(window_config["inicio"])
+            fim = _segundos_do_dia(window_config["fim"])
+            inicios_janela.append((inicio, ordem, window_key))
+            if inicio <= fim:
+                segmentos.append((inicio, fim, ordem, window_key))
+            else:
+                segmentos.append((inicio, SEGUNDOS_DIA, ordem, window_key))
+                segmentos.append((0, fim, ordem, window_key))
+        
+        segmentos.sort(key=lambda seg: (seg[0], seg[1], seg[2]))
+        self.inicios = [seg[0] for seg in segmentos]
+        self.fins = [seg[1] for seg in segmentos]
+        self.ordens = [seg[2] for seg in segmentos]
+        self.chaves = [seg[3] for seg in segmentos]
+        
+        # Maior fim visto até cada posição, para tratar janelas sobrepostas
+        self.maior_fim = []
+        maior = -1
+        for fim in self.fins:
+            maior = max(maior, fim)
+            self.maior_fim.append(maior)
+        
+        inicios_janela.sort(key=lambda item: (item[0], item[1]))
+        self.inicios_janela = [item[0] for item in inicios_janela]
+        
+        # Primeira janela (na ordem do arquivo) entre as que começam a partir de cada posição
+        self.primeira_a_partir = [None] * len(inicios_janela)
+        primeira = None
+        for i in range(len(inicios_janela) - 1, -1, -1):
+            if primeira is None or inicios_janela[i][1] < primeira[1]:
+                primeira = inicios_janela[i]
+            self.primeira_a_partir[i] = primeira[2]
+    
+    def janela_em(self, horario):
+        """
+        Retorna a chave da janela que contém o horário (limites inclusivos) ou None
+        
+        Entre janelas sobrepostas, retorna a primeira na ordem do arquivo.
+        """
+        t = _segundos_do_dia(horario)
+        i = bisect_right(self.inicios, t) - 1
+        melhor = None
+        while i >= 0 and self.maior_fim[i] >= t:
+            if self.fins[i] >= t and (melhor is None or self.ordens[i] < self.ordens[melhor]):
+                melhor = i
+            i -= 1
+        return self.chaves[melhor] if melhor is not None else None
+    
+    def proxima_janela(self, horario):
+        """Retorna a chave da primeira janela (na ordem do arquivo) que começa depois do horário ou None"""
+        i = bisect_right(self.inicios_janela, _segundos_do_dia(horario))
+        if i < len(self.primeira_a_partir):
+            return self.primeira_a_partir[i]
+        return None
+
+# Cache global das agendas compiladas, compartilhado entre GUI e análise
+# caminho absoluto -> (assinatura do arquivo, JanelasCompiladas)
+_cache_janelas = {}
+_cache_lock = threading.RLock()
+
 class ConfigManager:
     def __init__(self):
         self.config_dir = "config"
@@ -31,18 +120,38 @@ class ConfigManager:
         if not os.path.exists(self.config_file):
             self.save_config(self.default_config)
     
+    def get_schedule(self):
+        """
+        Retorna a agenda compilada das janelas
+        
+        O arquivo só é relido quando seu mtime (ou tamanho) muda; as demais
+        chamadas, de qualquer thread, reutilizam a agenda em cache.
+        """
+        caminho = os.path.abspath(self.config_file)
+        with _cache_lock:
+            try:
+                if not os.path.exists(caminho):
+                    self.ensure_config_exists()
+                    _cache_janelas.pop(caminho, None)
+                    return JanelasCompiladas(self.default_config)
+                
+                stat = os.stat(caminho)
+                assinatura = (stat.st_mtime_ns, stat.st_size)
+                em_cache = _cache_janelas.get(caminho)
+                if em_cache and em_cache[0] == assinatura:
+                    return em_cache[1]
+                
+                with open(caminho, 'r', encoding='utf-8') as f:
+                    janelas = JanelasCompiladas(json.load(f))
+                _cache_janelas[caminho] = (assinatura, janelas)
+                return janelas
+            except Exception as e:
+                print(f"Erro ao carregar configurações: {str(e)}")
+                return JanelasCompiladas(self.default_config)
+    
     def load_config(self):
         """Carrega as configurações do arquivo"""
-        try:
-            if not os.path.exists(self.config_file):
-                self.ensure_config_exists()
-                return self.default_config
-            
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Erro ao carregar configurações: {str(e)}")
-            return self.default_config
+        return copy.deepcopy(self.get_schedule().config)
     
     def save_config(self, config):
         """Salva as configurações no arquivo"""
@@ -52,6 +161,10 @@ class ConfigManager:
             
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=4, ensure_ascii=False)
+            
+            # Forçar recompilação mesmo se o mtime não mudar (resolução do sistema de arquivos)
+            with _cache_lock:
+                _cache_janelas.pop(os.path.abspath(self.config_file), None)
             return True
         except Exception as e:
             print(f"Erro ao salvar configurações: {str(e)}")
@@ -60,15 +173,11 @@ class ConfigManager:
     def get_current_window(self):
         """Retorna a janela atual baseada no horário do sistema"""
         try:
-            config = self.load_config()
-            current_time = datetime.now().time()
+            janelas = self.get_schedule()
+            window_key = janelas.janela_em(datetime.now().time())
             
-            for window_key, window_config in config.items():
-                start = datetime.strptime(window_config["inicio"], "%H:%M").time()
-                end = datetime.strptime(window_config["fim"], "%H:%M").time()
-                
-                if start <= current_time <= end:
-                    return window_key, window_config
+            if window_key is not None:
+                return window_key, dict(janelas.config[window_key])
             
             return None, None
         except Exception as e:
@@ -102,21 +211,17 @@ class ConfigManager:
             # Se delivery_date é hoje
             if delivery_date == today:
                 current_time = datetime.now().time()
-                config = self.load_config()
+                janelas = self.get_schedule()
                 
                 # Determinar janela baseado no horário atual
-                for window_key, window_config in config.items():
-                    start = datetime.strptime(window_config["inicio"], "%H:%M").time()
-                    end = datetime.strptime(window_config["fim"], "%H:%M").time()
-                    
-                    if start <= current_time <= end:
-                        return window_key, False
+                window_key = janelas.janela_em(current_time)
+                if window_key is not None:
+                    return window_key, False
                 
                 # Se não estiver em nenhuma janela, usar a próxima janela disponível
-                for window_key, window_config in config.items():
-                    start = datetime.strptime(window_config["inicio"], "%H:%M").time()
-                    if current_time < start:
-                        return window_key, (current_window_key != window_key)
+                window_key = janelas.proxima_janela(current_time)
+                if window_key is not None:
+                    return window_key, (current_window_key != window_key)
             
             # Se delivery_date é futuro, é uma rota irregular
             return current_window_key, True
@@ -128,18 +233,23 @@ class ConfigManager:
     def get_window_name(self, window_key):
         """Retorna o nome amigável da janela"""
         try:
-            config = self.load_config()
-            return config[window_key]["nome"]
+            return self.get_schedule().config[window_key]["nome"]
         except:
             return window_key
     
     def is_previous_window(self, window_key_a, window_key_b):
         """Verifica se uma janela é anterior a outra"""
         try:
-            config = self.load_config()
             windows_order = ["MANHA", "TARDE", "NOITE"]
             idx_a = windows_order.index(window_key_a)
             idx_b = windows_order.index(window_key_b)
             return idx_a < idx_b
         except:
-            return False 
\ No newline at end of file
+            return False
+
+# Instância global do gerenciador
+config_manager = ConfigManager()
+
+def get_config_manager() -> ConfigManager:
+    """Retorna instância global do gerenciador de janelas"""
+    return config_manager
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Exportações sintéticas de conferência e de assignment (expedição)
+Gera arquivos no formato das exportações reais, com dados aleatórios mas
+coerentes entre si: as rotas da conferência são as do assignment, parte delas
+fica no piso (não validada ou validada com pacotes ainda em processamento) e
+parte dos pacotes aparece duplicada. Usado pelos benchmarks para medir o
+processamento sem depender de exportações reais.
+
+Uso:
+    python dados_sinteticos.py saida/ --linhas 1000000 --arquivos 3
+"""
+
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+TRANSPORTADORAS = ('Agencia A', 'Agencia B', 'Transportadora C', 'Transportadora D', 'Logistica E')
+TIPOS_VEICULO = ('PASSEIO 1.0', 'FIORINO', 'MOTO', 'VAN', 'CAMINHAO 3/4', '')
+
+STATUS_EXPEDIDO = ('Delivered', 'Assigned')
+STATUS_PISO = ('Processing', 'Processed')
+STATUS_NAO_VALIDADO = ('Pending', 'Validating')
+
+# Linhas de assignment geradas (e gravadas) por vez
+LINHAS_POR_BLOCO = 500000
+
+FORMATO_DATA_HORA = '%Y-%m-%d %H:%M:%S'
+
+
+def gerar_rotas(rotas, operadores=40, transportadoras=TRANSPORTADORAS, tipos_veiculo=TIPOS_VEICULO,
+                fracao_piso=0.1, pacotes_por_rota=40, data_base=None, seed=42):
+    """
+    Sorteia os atributos de cada rota (um registro por rota)
+
+    Metade das rotas no piso não foi validada na conferência; a outra metade
+    foi validada, mas os pacotes ainda constam em processamento no assignment.
+
+    Args:
+        rotas: quantidade de rotas
+        operadores: quantidade de operadores da conferência
+        transportadoras: nomes das transportadoras
+        tipos_veiculo: tipos de veículo ('' = não informado)
+        fracao_piso: fração das rotas que ficam no piso
+        pacotes_por_rota: média de pacotes por rota (totais da conferência)
+        data_base: dia da operação (padrão: hoje)
+        seed: semente do gerador aleatório
+
+    Returns:
+        DataFrame com uma linha por rota
+    """
+    rng = np.random.default_rng(seed)
+    data_base = pd.Timestamp.now().normalize() if data_base is None else pd.Timestamp(data_base).normalize()
+
+    sorteio = rng.random(rotas)
+    nao_validada = sorteio < fracao_piso / 2
+    em_processamento = ~nao_validada & (sorteio < fracao_piso)
+
+    status = rng.choice(np.array(STATUS_EXPEDIDO, dtype=object), rotas, p=[0.8, 0.2])
+    status[em_processamento] = rng.choice(np.array(STATUS_PISO, dtype=object), int(em_processamento.sum()))
+
+    # Entregas do dia anterior, do dia e do seguinte (janelas diferentes), algumas sem data
+    datas = [(data_base + pd.Timedelta(days=d)).strftime('%Y-%m-%d') for d in (-1, 0, 1)] + [np.nan]
+    nomes_operadores = np.array(
+        [f'[ops{10000 + i}]operador {chr(97 + i % 26)} silva {i}' for i in range(operadores)], dtype=object
+    )
+
+    inicio = data_base + pd.Timedelta(hours=4) + pd.to_timedelta(rng.integers(0, 10 * 3600, rotas), unit='s')
+    fim = inicio + pd.to_timedelta(rng.integers(60, 900, rotas), unit='s')
+    iniciais = rng.poisson(pacotes_por_rota, rotas) + 1
+    finais = np.maximum(iniciais - rng.integers(0, 3, rotas), 0)
+
+    return pd.DataFrame({
+        'rota': [f'AT{20250000000 + i}' for i in range(rotas)],
+        'transportadora': rng.choice(np.array(transportadoras, dtype=object), rotas),
+        'motorista': [f'motorista {i}' for i in range(rotas)],
+        'veiculo': rng.choice(np.array(tipos_veiculo, dtype=object), rotas),
+        'status': status,
+        'data_entrega': rng.choice(np.array(datas, dtype=object), rotas, p=[0.3, 0.5, 0.15, 0.05]),
+        'validada': ~nao_validada,
+        'inicio': inicio,
+        'fim': fim,
+        'operador': rng.choice(nomes_operadores, rotas),
+        'iniciais': iniciais,
+        'finais': finais,
+    })
+
+
+def gerar_conferencia(df_rotas, seed=42):
+    """
+    Gera a exportação de conferência correspondente às rotas
+
+    Args:
+        df_rotas: rotas sorteadas por gerar_rotas
+        seed: semente do gerador aleatório
+
+    Returns:
+        DataFrame no formato da exportação de conferência
+    """
+    rng = np.random.default_rng(seed)
+    validada = df_rotas['validada'].to_numpy()
+    status = np.where(
+        validada, 'Validated',
+        rng.choice(np.array(STATUS_NAO_VALIDADO, dtype=object), len(df_rotas))
+    )
+    inicio = df_rotas['inicio'].dt.strftime(FORMATO_DATA_HORA).where(validada, '')
+    fim = df_rotas['fim'].dt.strftime(FORMATO_DATA_HORA).where(validada, '')
+    return pd.DataFrame({
+        'AT/TO': df_rotas['rota'],
+        'AT/TO Validation Status': status,
+        'Total Initial Orders Inside AT/TO': df_rotas['iniciais'],
+        'Total Final Orders Inside AT/TO': df_rotas['finais'],
+        'Validation Start Time': inicio,
+        'Validation End Time': fim,
+        'Validation Operator': df_rotas['operador'].where(validada, ''),
+        'Station': 'SP01',
+    })
+
+
+def gerar_blocos_assignment(df_rotas, linhas, fracao_duplicados=0.01, linhas_por_bloco=LINHAS_POR_BLOCO,
+                            inicio_pacotes=0, seed=42):
+    """
+    Gera as linhas do assignment em blocos, para não manter tudo em memória
+
+    Cada pacote pertence a uma rota sorteada; uma fração das linhas repete um
+    pacote já gerado no mesmo bloco (mesma rota e mesmo código de rastreio).
+
+    Args:
+        df_rotas: rotas sorteadas por gerar_rotas
+        linhas: total de linhas (pacotes, incluindo duplicados)
+        fracao_duplicados: fração das linhas que repete um pacote
+        linhas_por_bloco: linhas de cada DataFrame gerado
+        inicio_pacotes: primeiro número de pacote (para vários arquivos sem colisão)
+        seed: semente do gerador aleatório
+
+    Yields:
+        DataFrame no formato da exportação de assignment
+    """
+    rng = np.random.default_rng(seed)
+    rotas = df_rotas['rota'].to_numpy()
+    transportadoras = df_rotas['transportadora'].to_numpy()
+    motoristas = df_rotas['motorista'].to_numpy()
+    veiculos = df_rotas['veiculo'].to_numpy()
+    status = df_rotas['status'].to_numpy()
+    datas = df_rotas['data_entrega'].to_numpy()
+    atribuicao = df_rotas['inicio'] - pd.Timedelta(hours=2)
+    criacao = (atribuicao - pd.Timedelta(hours=1)).dt.strftime(FORMATO_DATA_HORA).to_numpy()
+    motorista_atribuido = atribuicao.dt.strftime(FORMATO_DATA_HORA).to_numpy()
+    transportadora_atribuida = (atribuicao - pd.Timedelta(minutes=30)).dt.strftime(FORMATO_DATA_HORA).to_numpy()
+    concluido = np.where(
+        status == 'Delivered',
+        (df_rotas['fim'] + pd.Timedelta(hours=3)).dt.strftime(FORMATO_DATA_HORA).to_numpy(),
+        ''
+    )
+
+    gerados = 0
+    while gerados < linhas:
+        tamanho = min(linhas_por_bloco, linhas - gerados)
+        rota_por_linha = rng.integers(0, len(rotas), tamanho)
+        pacotes = np.arange(inicio_pacotes + gerados, inicio_pacotes + gerados + tamanho)
+
+        # Linhas duplicadas copiam rota e pacote de outra linha do bloco
+        duplicados = rng.random(tamanho) < fracao_duplicados
+        origem = rng.integers(0, tamanho, int(duplicados.sum()))
+        rota_por_linha[duplicados] = rota_por_linha[origem]
+        pacotes[duplicados] = pacotes[origem]
+
+        yield pd.DataFrame({
+            'Task ID': rotas[rota_por_linha],
+            'Agency': transportadoras[rota_por_linha],
+            'Driver name': motoristas[rota_por_linha],
+            'SPX tracking num': [f'BR{p:012d}' for p in pacotes],
+            'Status': status[rota_por_linha],
+            'Delivery Date': datas[rota_por_linha],
+            'Create Time': criacao[rota_por_linha],
+            'Complete time': concluido[rota_por_linha],
+            'Driver Assigned Time': motorista_atribuido[rota_por_linha],
+            'Agency Assigned Time': transportadora_atribuida[rota_por_linha],
+            'Vehicle Type': veiculos[rota_por_linha],
+            'Weight': np.round(rng.random(tamanho) * 5, 3),
+        })
+        gerados += tamanho
+
+
+def gerar_assignment(linhas, rotas=None, fracao_duplicados=0.0, seed=42, **parametros_rotas):
+    """
+    Gera o assignment completo em um único DataFrame (para volumes que cabem em memória)
+
+    Args:
+        linhas: quantidade de pacotes (linhas)
+        rotas: quantidade de rotas distintas (padrão: linhas / 40)
+        fracao_duplicados: fração das linhas que repete um pacote
+        seed: semente do gerador aleatório
+        parametros_rotas: demais parâmetros de gerar_rotas
+    """
+    rotas = rotas or max(1, linhas // 40)
+    df_rotas = gerar_rotas(rotas, seed=seed, **parametros_rotas)
+    blocos = list(gerar_blocos_assignment(df_rotas, linhas, fracao_duplicados, seed=seed))
+    return pd.concat(blocos, ignore_index=True) if len(blocos) > 1 else blocos[0]
+
+
+def gerar_exportacoes(diretorio, linhas, pacotes_por_rota=40, arquivos=1, operadores=40,
+                      transportadoras=TRANSPORTADORAS, tipos_veiculo=TIPOS_VEICULO, fracao_piso=0.1,
+                      fracao_duplicados=0.01, data_base=None, seed=42):
+    """
+    Grava no diretório uma exportação de conferência e as de assignment
+
+    Args:
+        diretorio: diretório de destino (criado se não existir)
+        linhas: total de linhas de assignment, divididas entre os arquivos
+        pacotes_por_rota: média de pacotes por rota
+        arquivos: quantidade de arquivos de assignment
+        operadores: quantidade de operadores da conferência
+        transportadoras: nomes das transportadoras
+        tipos_veiculo: tipos de veículo ('' = não informado)
+        fracao_piso: fração das rotas que ficam no piso
+        fracao_duplicados: fração das linhas de assignment que repete um pacote
+        data_base: dia da operação (padrão: hoje)
+        seed: semente do gerador aleatório
+
+    Returns:
+        tuple: (caminhos dos arquivos de assignment, caminho do arquivo de conferência)
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    df_rotas = gerar_rotas(
+        max(1, linhas // pacotes_por_rota), operadores, transportadoras, tipos_veiculo,
+        fracao_piso, pacotes_por_rota, data_base, seed
+    )
+
+    conferencia = os.path.join(diretorio, 'conferencia.csv')
+    gerar_conferencia(df_rotas, seed).to_csv(conferencia, index=False)
+
+    caminhos = []
+    inicio = 0
+    for i in range(arquivos):
+        linhas_arquivo = linhas // arquivos + (1 if i < linhas % arquivos else 0)
+        caminho = os.path.join(diretorio, f'expedicao_{i + 1}.csv')
+        blocos = gerar_blocos_assignment(df_rotas, linhas_arquivo, fracao_duplicados,
+                                         inicio_pacotes=inicio, seed=seed + i + 1)
+        for j, bloco in enumerate(blocos):
+            bloco.to_csv(caminho, mode='w' if j == 0 else 'a', header=j == 0, index=False)
+        caminhos.append(caminho)
+        inicio += linhas_arquivo
+    return caminhos, conferencia
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Gera exportações sintéticas de conferência e assignment')
+    parser.add_argument('diretorio', help='Diretório de destino dos arquivos CSV')
+    parser.add_argument('--linhas', type=int, default=100000, help='Total de linhas de assignment')
+    parser.add_argument('--arquivos', type=int, default=1, help='Quantidade de arquivos de assignment')
+    parser.add_argument('--pacotes-por-rota', type=int, default=40, help='Média de pacotes por rota')
+    parser.add_argument('--operadores', type=int, default=40, help='Quantidade de operadores da conferência')
+    parser.add_argument('--transportadoras', type=int, default=len(TRANSPORTADORAS),
+                        help='Quantidade de transportadoras')
+    parser.add_argument('--fracao-piso', type=float, default=0.1, help='Fração das rotas que ficam no piso')
+    parser.add_argument('--fracao-duplicados', type=float, default=0.01,
+                        help='Fração das linhas de assignment duplicadas')
+    parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório')
+    args = parser.parse_args()
+
+    transportadoras = tuple(TRANSPORTADORAS[i] if i < len(TRANSPORTADORAS) else f'Transportadora {i + 1}'
+                            for i in range(args.transportadoras))
+    caminhos, conferencia = gerar_exportacoes(
+        args.diretorio, args.linhas, args.pacotes_por_rota, args.arquivos, args.operadores,
+        transportadoras, fracao_piso=args.fracao_piso, fracao_duplicados=args.fracao_duplicados, seed=args.seed
+    )
+    print(f"Conferência: {conferencia}")
+    for caminho in caminhos:
+        print(f"Assignment: {caminho}")
@@ -165,7 +165,7 @@ Sistema de Relatórios Shopee"""
         except Exception as e:
             return False, f"Erro inesperado: {str(e)}"
     
-    def enviar_email_relatorio(self, pdf_path, csv_path, xlsx_path, janela_info="", info_adicional=""):
+    def enviar_email_relatorio(self, pdf_path, csv_path, xlsx_path, janela_info="", info_adicional="", relatorio=None):
         """
         Envia o email com os relatórios em anexo
         
@@ -175,6 +175,8 @@ Sistema de Relatórios Shopee"""
             xlsx_path: Caminho para o arquivo XLSX
             janela_info: Informação sobre a janela (turno)
             info_adicional: Informações adicionais do processamento
+            relatorio: RelatorioExpedicao; quando informado, fornece a janela
+                (se janela_info não for passado) e as métricas gerais do corpo
         
         Returns:
             tuple: (sucesso: bool, mensagem: str)
@@ -206,12 +208,20 @@ Sistema de Relatórios Shopee"""
             # Preparar informações para o corpo da mensagem
             data_hora = datetime.now().strftime("%d/%m/%Y às %H:%M")
             
+            if relatorio is not None and not janela_info:
+                janela_info = relatorio.descricao_janela
+            
             # Formatear corpo da mensagem
             corpo_formatado = config["corpo_mensagem"].format(
                 data_hora=data_hora,
                 janela=janela_info if janela_info else "Não especificada"
             )
             
+            # Adicionar as métricas gerais do relatório
+            if relatorio is not None and relatorio.metricas():
+                linhas_metricas = [f"- {metrica}: {valor}" for metrica, valor in relatorio.metricas().items()]
+                corpo_formatado += "\n\nMétricas gerais:\n" + "\n".join(linhas_metricas)
+            
             # Adicionar informações extras se fornecidas
             if info_adicional and info_adicional.strip():
                 corpo_formatado += f"\n\nInformações adicionais:\n{info_adicional.strip()}"
@@ -118,6 +118,10 @@ class EnvConfig:
         """Verifica se modo debug está ativado"""
         return self.get_bool('DEBUG', False)
     
+    def is_profiling(self) -> bool:
+        """Verifica se o modo de perfilamento (cProfile + tracemalloc) está ativado"""
+        return self.get_bool('PERFILAMENTO', False)
+    
     def create_env_from_config(self, config_data: dict) -> bool:
         """
         Cria arquivo .env a partir de configurações existentes
@@ -166,6 +170,7 @@ class EnvConfig:
                 f.write("UNIDADE_NOME=Mauá LSP64\n")
                 f.write("ENVIRONMENT=production\n")
                 f.write("DEBUG=false\n")
+                f.write("PERFILAMENTO=false\n")
             
             print(f"✅ Arquivo {self.env_file} criado com sucesso!")
             return True
@@ -0,0 +1,293 @@
+"""
+Registro de esquemas das exportações SPX
+Declara, para cada arquivo de entrada, as colunas usadas pela análise, seus
+tipos e os nomes alternativos aceitos no cabeçalho
+"""
+
+import numpy as np
+import pandas as pd
+
+# Versão dos esquemas; incrementar ao mudar colunas ou tipos invalida o cache de exportações
+VERSAO_ESQUEMAS = 2
+
+# Tipos suportados pelos esquemas
+TEXTO = 'texto'
+CATEGORIA = 'categoria'
+DATA = 'data'
+NUMERO = 'numero'
+
+# Formatos de data/hora das exportações SPX, do mais comum (e mais rápido) para o mais raro;
+# valores fora desses formatos passam pela inferência do pandas
+FORMATOS_DATA_SPX = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', 'ISO8601')
+
+# Valores preenchidos usados para reconhecer o formato de uma coluna de data
+LINHAS_AMOSTRA_FORMATO = 100
+
+# Textos tratados como vazios (e não como inválidos) nas colunas de data e número
+TEXTOS_NULOS = ('', 'NaT', 'nat', 'NaN', 'nan', 'None', 'none', 'null', 'NULL')
+
+# Linhas lidas para estimar a memória de uma leitura sem projeção
+LINHAS_AMOSTRA_MEMORIA = 1000
+
+TERMOS_VEICULO = ['vehicle', 'veic', 'veíc', 'car', 'carro', 'truck', 'caminhão', 'caminhao',
+                  'tipo', 'type', 'model', 'modelo', 'transporte', 'transport']
+NOMES_COMUNS_VEICULO = ['Vehicle Type', 'Tipo de Veículo', 'Tipo de Veiculo', 'Car Type', 'Tipo', 'Type']
+
+
+def detectar_coluna_veiculo(colunas):
+    """
+    Procura, entre os nomes de colunas, a que representa o tipo de veículo
+
+    Returns:
+        Nome da coluna encontrada ou None
+    """
+    colunas = list(colunas)
+    vehicle_type_columns = [col for col in colunas
+                           if any(term in col.lower() for term in TERMOS_VEICULO)]
+
+    # Preferência para colunas com 'tipo' + 'veículo' ou 'vehicle' + 'type'
+    specific_columns = [col for col in vehicle_type_columns
+                       if ('tipo' in col.lower() and ('veic' in col.lower() or 'veíc' in col.lower())) or
+                          ('vehicle' in col.lower() and 'type' in col.lower())]
+
+    vehicle_type_column = next(iter(specific_columns), None) if specific_columns else next(iter(vehicle_type_columns), None)
+
+    # Se ainda não encontrou a coluna, use o nome mais comum
+    if not vehicle_type_column:
+        for name in NOMES_COMUNS_VEICULO:
+            if name in colunas:
+                return name
+
+    return vehicle_type_column
+
+
+class ColunaEsquema:
+    """Coluna usada pela análise, com tipo e nomes alternativos"""
+
+    def __init__(self, nome, tipo=TEXTO, aliases=(), formatos=FORMATOS_DATA_SPX):
+        """
+        Args:
+            nome: nome canônico da coluna (usado pela análise)
+            tipo: TEXTO, CATEGORIA, DATA ou NUMERO
+            aliases: outros nomes aceitos no cabeçalho do CSV
+            formatos: formatos tentados, em ordem, na conversão de colunas DATA
+        """
+        self.nome = nome
+        self.tipo = tipo
+        self.aliases = tuple(aliases)
+        self.formatos = tuple(formatos)
+
+    def nomes_aceitos(self):
+        """Nome canônico seguido dos aliases"""
+        return (self.nome,) + self.aliases
+
+
+class EsquemaExportacao:
+    """Conjunto de colunas de uma exportação e regras de leitura/tipagem"""
+
+    def __init__(self, nome, colunas, coluna_veiculo=None):
+        """
+        Args:
+            nome: identificação do esquema (ex: 'conferencia')
+            colunas: lista de ColunaEsquema
+            coluna_veiculo: ColunaEsquema preenchida pela coluna detectada
+                por detectar_coluna_veiculo, quando existir
+        """
+        self.nome = nome
+        self.colunas = list(colunas)
+        self.coluna_veiculo = coluna_veiculo
+
+    def colunas_tipadas(self):
+        """Colunas do esquema, incluindo a de veículo quando existir"""
+        if self.coluna_veiculo:
+            return self.colunas + [self.coluna_veiculo]
+        return list(self.colunas)
+
+    def tipos(self):
+        """Dicionário nome canônico -> tipo"""
+        return {col.nome: col.tipo for col in self.colunas_tipadas()}
+
+    def resolver_colunas(self, cabecalho):
+        """
+        Relaciona as colunas do cabeçalho com os nomes canônicos do esquema
+
+        A comparação ignora maiúsculas/minúsculas e espaços nas bordas. Colunas
+        do esquema ausentes no cabeçalho são simplesmente omitidas; a
+        validação de obrigatórias acontece depois, sobre o DataFrame.
+
+        Returns:
+            dict: nome no arquivo -> nome canônico
+        """
+        por_nome = {}
+        for original in cabecalho:
+            por_nome.setdefault(str(original).strip().lower(), original)
+
+        mapa = {}
+        for coluna in self.colunas:
+            for aceito in coluna.nomes_aceitos():
+                original = por_nome.get(aceito.strip().lower())
+                if original is not None and original not in mapa:
+                    mapa[original] = coluna.nome
+                    break
+
+        if self.coluna_veiculo:
+            restantes = [col for col in cabecalho if col not in mapa]
+            original = detectar_coluna_veiculo(restantes)
+            if original is not None:
+                mapa[original] = self.coluna_veiculo.nome
+
+        return mapa
+
+    def aplicar_tipos(self, df, invalidos=None, tipos=None):
+        """
+        Converte as colunas lidas como texto para os tipos do esquema (in-place)
+
+        Valores que não puderam ser convertidos viram NaT/NaN. Se invalidos for
+        um dicionário, recebe nome da coluna -> primeiro valor inválido, para
+        que a validação não precise converter tudo de novo. tipos restringe a
+        conversão às colunas desses tipos (ex: só DATA e NUMERO em cada bloco
+        de uma leitura em blocos).
+        """
+        for coluna in self.colunas_tipadas():
+            nome = coluna.nome
+            if nome not in df.columns or (tipos is not None and coluna.tipo not in tipos):
+                continue
+            invalido = None
+            if coluna.tipo == CATEGORIA:
+                df[nome] = df[nome].astype('category')
+            elif coluna.tipo == DATA:
+                df[nome], invalido = converter_datas(df[nome], coluna.formatos)
+            elif coluna.tipo == NUMERO:
+                df[nome], invalido = converter_numeros(df[nome])
+            if invalidos is not None and invalido is not None:
+                invalidos[nome] = invalido
+        return df
+
+
+def _nao_convertidos(valores, convertidos):
+    """Valores preenchidos que ficaram nulos após a conversão (só olha as posições nulas)"""
+    nulos = convertidos.isna()
+    if not nulos.any():
+        return valores.iloc[:0]
+    candidatos = valores[nulos]
+    return candidatos[candidatos.notna()]
+
+
+def _primeiro_invalido(valores, convertidos):
+    """
+    Primeiro valor preenchido que não pôde ser convertido, ou None
+
+    Textos que o pandas trata como nulos ('NaT', 'None', ...) não contam como
+    inválidos.
+    """
+    restantes = _nao_convertidos(valores, convertidos)
+    if not len(restantes):
+        return None
+    restantes = restantes[~restantes.astype(str).str.strip().isin(TEXTOS_NULOS)]
+    return restantes.iloc[0] if len(restantes) else None
+
+
+def detectar_formato_data(valores, formatos=FORMATOS_DATA_SPX):
+    """
+    Primeiro dos formatos que reconhece uma amostra dos valores preenchidos
+
+    Returns:
+        Formato encontrado ou None (nenhum formato conhecido ou coluna vazia)
+    """
+    amostra = valores.dropna().iloc[:LINHAS_AMOSTRA_FORMATO]
+    if amostra.empty:
+        return None
+    for formato in formatos:
+        try:
+            pd.to_datetime(amostra, format=formato, errors='raise')
+            return formato
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def converter_datas(valores, formatos=FORMATOS_DATA_SPX):
+    """
+    Converte uma Series de textos em datas usando o formato conhecido da coluna
+
+    O formato é escolhido por uma amostra, na ordem de formatos (do mais
+    rápido para o mais raro), e aplicado à coluna inteira; linhas que não o
+    seguem passam pela inferência do pandas. Valores repetidos são convertidos
+    uma única vez (cache=True).
+
+    Returns:
+        tuple: (Series datetime64, primeiro valor inválido ou None)
+    """
+    if pd.api.types.is_datetime64_any_dtype(valores):
+        return valores, None
+
+    formato = detectar_formato_data(valores, formatos)
+    try:
+        datas = pd.to_datetime(valores, format=formato, errors='coerce', cache=True)
+        if datas.dtype != 'datetime64[ns]':
+            raise TypeError('datas com fuso horário')
+        nulos = datas.isna().to_numpy()
+        if formato is not None and nulos.any():
+            restantes = pd.to_datetime(valores[nulos], errors='coerce', cache=True)
+            if restantes.dtype != 'datetime64[ns]':
+                raise TypeError('datas com fuso horário')
+            datas.iloc[np.flatnonzero(nulos)] = restantes.to_numpy()
+    except (ValueError, TypeError):
+        # Formatos mistos ou com fuso horário: conversão direta, como texto livre
+        return pd.to_datetime(valores, errors='coerce'), None
+
+    return datas, _primeiro_invalido(valores, datas)
+
+
+def converter_numeros(valores):
+    """
+    Converte uma Series de textos em números
+
+    Returns:
+        tuple: (Series numérica, primeiro valor inválido ou None)
+    """
+    numeros = pd.to_numeric(valores, errors='coerce')
+    return numeros, _primeiro_invalido(valores, numeros)
+
+
+def memoria_df(df):
+    """Memória ocupada pelo DataFrame, em bytes"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def estimar_memoria_sem_projecao(arquivo, linhas):
+    """
+    Estima a memória que o arquivo ocuparia lido por inteiro, sem projeção nem tipos
+
+    Usa uma amostra das primeiras linhas para obter o custo médio por linha.
+    """
+    if linhas == 0:
+        return 0
+    amostra = pd.read_csv(arquivo, nrows=LINHAS_AMOSTRA_MEMORIA)
+    if amostra.empty:
+        return 0
+    return int(memoria_df(amostra) / len(amostra) * linhas)
+
+
+ESQUEMA_CONFERENCIA = EsquemaExportacao('conferencia', [
+    ColunaEsquema('AT/TO', TEXTO, aliases=('AT TO', 'AT/TO ID')),
+    ColunaEsquema('AT/TO Validation Status', CATEGORIA, aliases=('Validation Status',)),
+    ColunaEsquema('Total Initial Orders Inside AT/TO', NUMERO, aliases=('Total Initial Orders',)),
+    ColunaEsquema('Total Final Orders Inside AT/TO', NUMERO, aliases=('Total Final Orders',)),
+    ColunaEsquema('Validation Start Time', DATA),
+    ColunaEsquema('Validation End Time', DATA),
+    ColunaEsquema('Validation Operator', TEXTO, aliases=('Operator',)),
+])
+
+ESQUEMA_EXPEDICAO = EsquemaExportacao('expedicao', [
+    ColunaEsquema('Task ID', TEXTO, aliases=('TaskID', 'Task Id')),
+    ColunaEsquema('Agency', CATEGORIA, aliases=('Agency Name',)),
+    ColunaEsquema('Driver name', TEXTO, aliases=('Driver Name', 'Driver')),
+    ColunaEsquema('SPX tracking num', TEXTO, aliases=('SPX Tracking Number', 'Tracking Number')),
+    ColunaEsquema('Status', CATEGORIA),
+    ColunaEsquema('Delivery Date', CATEGORIA),
+    ColunaEsquema('Create Time', DATA),
+    ColunaEsquema('Complete time', DATA),
+    ColunaEsquema('Driver Assigned Time', DATA),
+    ColunaEsquema('Agency Assigned Time', DATA),
+], coluna_veiculo=ColunaEsquema('Vehicle Type', CATEGORIA))
@@ -1,15 +1,23 @@
+import time
+INICIO_EXECUCAO = time.perf_counter()  # referência para o tempo de abertura da interface
+
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter import ttk
 import ttkbootstrap as tb
 import os
+import gc
+import queue
 import threading
 import sys
-import pandas as pd
-from config_manager import ConfigManager
+from concurrent.futures import ThreadPoolExecutor
+from config_manager import get_config_manager
+from env_config import get_env_config
 from window_config_dialog import WindowConfigDialog
 from email_manager import EmailManager
 from email_config_dialog import EmailConfigDialog
+from progresso import TokenCancelamento, ProcessamentoCancelado
+from instrumentacao import RegistroExecucao, ARQUIVO_REGISTRO
 
 # Cores da Shopee
 SHOPEE_ORANGE = '#FF5722'
@@ -50,6 +58,9 @@ expedicao_listbox = None
 conferencia_listbox = None
 window_label = None
 window_var = None
+btn_gerar = None
+btn_cancelar = None
+barra_progresso = None
 
 # Função para atualizar toda a interface
 def atualizar_interface(root=None, scroll_canvas=None, main_frame=None, 
@@ -179,6 +190,34 @@ def reaplicar_scroll_universal():
         except Exception as e:
             print(f"⚠️ Erro ao reaplicar scroll universal: {e}")
 
+def preaquecer_modulos():
+    """
+    Importa em segundo plano o módulo de análise (pandas) e as bibliotecas dos
+    renderizadores, para que a seleção de arquivos e o primeiro relatório não
+    travem a interface importando-os
+    """
+    def carregar():
+        inicio = time.perf_counter()
+        try:
+            import analise_relatorios
+            analise_relatorios.preaquecer_renderizadores()
+        except Exception as e:
+            print(f"⚠️ Pré-carregamento dos módulos falhou: {e}")
+            return
+        print(f"🔥 Módulos de análise pré-carregados em {time.perf_counter() - inicio:.2f}s")
+
+    threading.Thread(target=carregar, daemon=True).start()
+
+def concluir_inicializacao():
+    """Mede o tempo de abertura da interface e inicia o pré-carregamento dos módulos"""
+    tempo_ms = (time.perf_counter() - INICIO_EXECUCAO) * 1000
+    orcamento_ms = get_env_config().get_int('ORCAMENTO_INICIO_GUI_MS', 2000)
+    if tempo_ms > orcamento_ms:
+        print(f"⚠️ Interface aberta em {tempo_ms:.0f} ms (orçamento: {orcamento_ms} ms)")
+    else:
+        print(f"⏱️ Interface aberta em {tempo_ms:.0f} ms")
+    preaquecer_modulos()
+
 def get_window_key_from_display(display_text):
     """Extrai a chave da janela do texto de exibição"""
     if "Manhã" in display_text or "AM" in display_text:
@@ -189,7 +228,94 @@ def get_window_key_from_display(display_text):
         return "NOITE"
     return None
 
-def processar(expedicao_files, conferencia_file, output_dir, info_adicional, status_label, window_var):
+# ===== FILA DA INTERFACE =====
+# Threads de trabalho não podem alterar widgets: enfileiram a chamada, que é
+# executada na thread da interface por drenar_fila_interface
+INTERVALO_FILA_INTERFACE_MS = 50
+
+fila_interface = queue.Queue()
+processamento_atual = None  # TokenCancelamento do processamento em andamento
+
+def na_interface(funcao, *args, **kwargs):
+    """Agenda funcao(*args, **kwargs) para execução na thread da interface"""
+    fila_interface.put((funcao, args, kwargs))
+
+def drenar_fila_interface():
+    """Executa as chamadas enfileiradas pelas threads de trabalho e se reagenda"""
+    try:
+        while True:
+            try:
+                funcao, args, kwargs = fila_interface.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                funcao(*args, **kwargs)
+            except Exception as e:
+                print(f"⚠️ Erro ao atualizar a interface: {e}")
+    finally:
+        root.after(INTERVALO_FILA_INTERFACE_MS, drenar_fila_interface)
+
+def abrir_pasta(output_dir):
+    os.startfile(output_dir) if os.name == 'nt' else os.system(f'xdg-open "{output_dir}"')
+
+def perguntar_abrir_pasta(titulo, mensagem, output_dir):
+    """Pergunta se deseja abrir a pasta dos relatórios e a abre (thread da interface)"""
+    if messagebox.askyesno(titulo, mensagem):
+        abrir_pasta(output_dir)
+
+def atualizar_progresso(etapa, fracao, decorrido):
+    """Mostra a etapa atual, a porcentagem e o tempo decorrido (thread da interface)"""
+    barra_progresso.configure(value=fracao * 100)
+    status_label.config(
+        text=f'{etapa}... {fracao:.0%} ({decorrido:.0f}s)',
+        foreground=SHOPEE_ORANGE
+    )
+
+def mostrar_painel_depuracao(registro, output_dir):
+    """Janela com as medições de cada etapa do processamento (modo debug)"""
+    painel = tk.Toplevel(root)
+    painel.title('Depuração - Etapas do processamento')
+    painel.configure(bg=DARK_BG)
+    painel.transient(root)
+
+    colunas = ('etapa', 'tempo', 'cpu', 'entrada', 'saida', 'memoria')
+    titulos = ('Etapa', 'Tempo (s)', 'CPU (s)', 'Linhas entrada', 'Linhas saída', 'Memória (MB)')
+    tabela = ttk.Treeview(painel, columns=colunas, show='headings', height=len(registro.etapas) + 1)
+    for coluna, titulo in zip(colunas, titulos):
+        tabela.heading(coluna, text=titulo)
+        tabela.column(coluna, width=240 if coluna == 'etapa' else 110, anchor='w' if coluna == 'etapa' else 'e')
+    for medicao in registro.etapas:
+        dados = medicao.como_dict()
+        tabela.insert('', tk.END, values=tuple('-' if dados[chave] is None else dados[chave] for chave in (
+            'etapa', 'tempo_s', 'cpu_s', 'linhas_entrada', 'linhas_saida', 'memoria_mb'
+        )))
+    tabela.pack(fill='both', expand=True, padx=10, pady=10)
+
+    tk.Label(
+        painel,
+        text='\n'.join(registro.linhas_resumo()) + '\n' +
+             f'Registro: {os.path.join(output_dir, ARQUIVO_REGISTRO)}',
+        font=('Segoe UI', 10),
+        bg=DARK_BG,
+        fg=DARK_TEXT,
+        justify='left'
+    ).pack(anchor='w', padx=10, pady=(0, 10))
+
+def finalizar_processamento():
+    """Libera os botões ao fim do processamento (thread da interface)"""
+    global processamento_atual
+    processamento_atual = None
+    btn_gerar.configure(state='normal')
+    btn_cancelar.configure(state='disabled')
+
+def processar(expedicao_files, conferencia_file, output_dir, info_adicional, window_display, cancelamento):
+    """
+    Gera os relatórios numa thread separada
+
+    Widgets e caixas de diálogo são acessados somente pela fila da interface
+    (na_interface), nunca diretamente desta thread.
+    """
+    registro = None
     try:
         from analise_relatorios import main as processar_relatorio
         
@@ -206,8 +332,7 @@ def processar(expedicao_files, conferencia_file, output_dir, info_adicional, sta
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
-        # Obter janela selecionada
-        window_display = window_var.get()
+        # Janela selecionada (lida na thread da interface)
         if window_display == "Selecione a Janela de Carregamento":
             raise ValueError("Por favor, selecione a janela de carregamento!")
             
@@ -215,16 +340,23 @@ def processar(expedicao_files, conferencia_file, output_dir, info_adicional, sta
         if not window_key:
             raise ValueError("Janela de carregamento inválida!")
             
-        status_label.config(text='Processando...', foreground=SHOPEE_ORANGE)
-        root.update()  # Forçar atualização da interface
+        na_interface(status_label.config, text='Processando...', foreground=SHOPEE_ORANGE)
         
         # Chama a função principal do script, passando os arquivos e diretório
-        processar_relatorio(expedicao_files, conferencia_file, output_dir, info_adicional, window_key)
+        registro = RegistroExecucao(window_key, list(expedicao_files) + [conferencia_file])
+        relatorio = processar_relatorio(
+            expedicao_files, conferencia_file, output_dir, info_adicional, window_key,
+            progresso=lambda *andamento: na_interface(atualizar_progresso, *andamento),
+            cancelamento=cancelamento,
+            registro=registro
+        )
+        if relatorio is None:
+            raise RuntimeError("Falha ao processar o relatório (veja o log para detalhes)")
         
         # Mostrar mensagem de sucesso com detalhes
         msg = 'Relatórios gerados com sucesso!\n'
         msg += f'Local: {output_dir}'
-        status_label.config(text=msg, foreground='#4CAF50')
+        na_interface(status_label.config, text=msg, foreground='#4CAF50')
         
         # ===== ENVIO AUTOMÁTICO DE EMAIL =====
         try:
@@ -238,34 +370,27 @@ def processar(expedicao_files, conferencia_file, output_dir, info_adicional, sta
                 
                 print("📧 Iniciando envio automático de email...")
                 
-                status_label.config(text='Enviando email...', foreground=SHOPEE_ORANGE)
-                root.update()
+                na_interface(status_label.config, text='Enviando email...', foreground=SHOPEE_ORANGE)
                 
                 # Definir caminhos dos arquivos gerados
                 pdf_path = os.path.join(output_dir, 'relatorio_expedicao.pdf')
                 csv_path = os.path.join(output_dir, 'resumo_expedicao.csv')
                 xlsx_path = os.path.join(output_dir, 'relatorio_expedicao.xlsx')
                 
-                # Obter informação da janela para o email
-                config_manager = ConfigManager()
-                window_config = config_manager.load_config().get(window_key, {})
-                janela_info = ""
-                if window_config:
-                    janela_info = config_manager.format_window_display(window_key, window_config)
-                
-                # Enviar email
+                # Enviar email (janela e métricas vêm do modelo do relatório)
                 sucesso_email, mensagem_email = email_manager.enviar_email_relatorio(
                     pdf_path=pdf_path,
                     csv_path=csv_path, 
                     xlsx_path=xlsx_path,
-                    janela_info=janela_info,
-                    info_adicional=info_adicional
+                    info_adicional=info_adicional,
+                    relatorio=relatorio
                 )
                 
                 if sucesso_email:
                     print(f"✅ Email enviado com sucesso!")
-                    status_label.config(text=f'{msg}\n✉️ Email enviado com sucesso!', foreground='#4CAF50')
-                    messagebox.showinfo(
+                    na_interface(status_label.config, text=f'{msg}\n✉️ Email enviado com sucesso!', foreground='#4CAF50')
+                    na_interface(
+                        messagebox.showinfo,
                         'Sucesso Completo', 
                         f'Relatórios gerados e email enviado com sucesso!\n\n'
                         f'📁 Local: {output_dir}\n'
@@ -274,50 +399,55 @@ def processar(expedicao_files, conferencia_file, output_dir, info_adicional, sta
                     )
                 else:
                     print(f"❌ Falha no envio de email: {mensagem_email}")
-                    status_label.config(text=f'{msg}\n⚠️ Erro no envio do email', foreground='#FF9800')
-                    if messagebox.askyesno(
+                    na_interface(status_label.config, text=f'{msg}\n⚠️ Erro no envio do email', foreground='#FF9800')
+                    na_interface(
+                        perguntar_abrir_pasta,
                         'Relatórios Gerados', 
                         f'Relatórios gerados com sucesso, mas houve um erro no envio do email:\n\n'
                         f'❌ {mensagem_email}\n\n'
                         f'💡 Verifique as configurações de email (credenciais, senha de app do Gmail).\n\n'
-                        f'Deseja abrir a pasta dos relatórios?'
-                    ):
-                        os.startfile(output_dir) if os.name == 'nt' else os.system(f'xdg-open "{output_dir}"')
+                        f'Deseja abrir a pasta dos relatórios?',
+                        output_dir
+                    )
                     return
             else:
                 print("⚠️ Configurações de email incompletas - envio automático desabilitado")
                 
                 # Email não configurado - apenas notificar
-                if messagebox.askyesno(
+                na_interface(
+                    perguntar_abrir_pasta,
                     'Relatórios Gerados', 
                     f'Relatórios gerados com sucesso!\n\n'
                     f'📁 Local: {output_dir}\n\n'
                     f'ℹ️ Email automático não configurado.\n'
                     f'Configure em "Configurações de Email" para envio automático.\n\n'
-                    f'Deseja abrir a pasta?'
-                ):
-                    os.startfile(output_dir) if os.name == 'nt' else os.system(f'xdg-open "{output_dir}"')
+                    f'Deseja abrir a pasta?',
+                    output_dir
+                )
                 return
                 
         except Exception as e:
             # Erro no sistema de email - relatórios foram gerados com sucesso
             print(f"❌ Erro no sistema de email: {str(e)}")
             
-            status_label.config(text=f'{msg}\n⚠️ Erro no sistema de email', foreground='#FF9800')
-            if messagebox.askyesno(
+            na_interface(status_label.config, text=f'{msg}\n⚠️ Erro no sistema de email', foreground='#FF9800')
+            na_interface(
+                perguntar_abrir_pasta,
                 'Relatórios Gerados', 
                 f'Relatórios gerados com sucesso, mas houve um erro no sistema de email:\n\n'
                 f'❌ {str(e)}\n\n'
                 f'💡 Verifique as configurações de email (credenciais, conexão com internet).\n\n'
-                f'Deseja abrir a pasta dos relatórios?'
-            ):
-                os.startfile(output_dir) if os.name == 'nt' else os.system(f'xdg-open "{output_dir}"')
+                f'Deseja abrir a pasta dos relatórios?',
+                output_dir
+            )
             return
         
         # Perguntar se deseja abrir o diretório (apenas se email foi enviado com sucesso)
-        if messagebox.askyesno('Sucesso', 'Deseja abrir a pasta dos relatórios?'):
-            os.startfile(output_dir) if os.name == 'nt' else os.system(f'xdg-open "{output_dir}"')
+        na_interface(perguntar_abrir_pasta, 'Sucesso', 'Deseja abrir a pasta dos relatórios?', output_dir)
         
+    except ProcessamentoCancelado:
+        na_interface(barra_progresso.configure, value=0)
+        na_interface(status_label.config, text='Processamento cancelado', foreground='#FF9800')
     except Exception as e:
         erro = str(e)
         # Formatar mensagens de erro comuns
@@ -328,8 +458,184 @@ def processar(expedicao_files, conferencia_file, output_dir, info_adicional, sta
         elif "formato está correto" in erro:
             erro = "Formato do arquivo de conferência inválido!\nVerifique se é um CSV válido."
             
-        status_label.config(text=f'Erro: {erro}', foreground='#F44336')
-        messagebox.showerror('Erro', f'Ocorreu um erro ao gerar os relatórios:\n\n{erro}')
+        na_interface(status_label.config, text=f'Erro: {erro}', foreground='#F44336')
+        na_interface(messagebox.showerror, 'Erro', f'Ocorreu um erro ao gerar os relatórios:\n\n{erro}')
+    finally:
+        if registro is not None and registro.etapas and get_env_config().is_debug():
+            na_interface(mostrar_painel_depuracao, registro, output_dir)
+        # Os dados intermediários do processamento (inclusive de um cancelado)
+        # já estão sem referências: devolve a memória antes do próximo relatório
+        gc.collect()
+        na_interface(finalizar_processamento)
+
+# ===== VALIDAÇÃO DE ARQUIVOS EM SEGUNDO PLANO =====
+TEXTO_VALIDANDO = 'validando…'
+TEXTO_CANCELADO = 'validação cancelada'
+
+executor_validacao = None
+# (lista 'expedicao' ou 'conferencia', caminho do arquivo) -> Event que cancela a validação em andamento.
+# Alterado só na thread da interface; a entrada sai quando a validação termina
+validacoes_arquivos = {}
+
+def obter_executor_validacao():
+    """Pool de threads compartilhado pelas validações de arquivos"""
+    global executor_validacao
+    if executor_validacao is None:
+        trabalhadores = get_env_config().get_int('THREADS_VALIDACAO', 0) or min(4, os.cpu_count() or 1)
+        executor_validacao = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='validacao')
+    return executor_validacao
+
+def localizar_item(listbox, nome_arquivo):
+    """Índice do item do arquivo na lista (válido, em validação, cancelado ou com erro), ou None"""
+    prefixo = f"{nome_arquivo} ("
+    for i in range(listbox.size()):
+        item = listbox.get(i)
+        if item == nome_arquivo or (
+            item.startswith(prefixo) and
+            item[len(prefixo):].startswith((TEXTO_VALIDANDO, TEXTO_CANCELADO, 'ERRO: '))
+        ):
+            return i
+    return None
+
+def atualizar_status_lista(listbox):
+    """Mostra no status quantos arquivos da lista estão válidos e quantos em validação"""
+    itens = [listbox.get(i) for i in range(listbox.size())]
+    validos = len([item for item in itens if not item.endswith(')')])
+    validando = len([item for item in itens if item.endswith(f'({TEXTO_VALIDANDO})')])
+    if validando:
+        status_label.config(
+            text=f'{validos} arquivo(s) válido(s) na lista, {validando} {TEXTO_VALIDANDO}',
+            foreground=SHOPEE_ORANGE
+        )
+    elif validos:
+        status_label.config(text=f'{validos} arquivo(s) válido(s) na lista', foreground='#4CAF50')
+    else:
+        status_label.config(text='Nenhum arquivo válido na lista', foreground='#F44336')
+
+def concluir_validacao(tipo, listbox, var, arquivo, cancelado, valido, mensagem):
+    """
+    Aplica o resultado da validação de um arquivo na lista (thread da interface)
+
+    Arquivos válidos entram na variável de caminhos; reprovados ou cancelados
+    saem dela. Resultados de arquivos já removidos da lista, ou de uma
+    validação substituída por outra do mesmo arquivo, são ignorados.
+    """
+    if validacoes_arquivos.get((tipo, arquivo)) is not cancelado:
+        return
+    nome_arquivo = os.path.basename(arquivo)
+    i = localizar_item(listbox, nome_arquivo)
+    if i is None:
+        return
+
+    caminhos = [f for f in var.get().split(";") if f and f != arquivo]
+    listbox.delete(i)
+    if valido:
+        listbox.insert(i, nome_arquivo)
+        listbox.itemconfig(i, {'fg': '#4CAF50'})  # Verde para arquivos válidos
+        caminhos.append(arquivo)
+    elif mensagem == TEXTO_CANCELADO:
+        listbox.insert(i, f"{nome_arquivo} ({TEXTO_CANCELADO})")
+        listbox.itemconfig(i, {'fg': SHOPEE_GRAY})
+    else:
+        listbox.insert(i, f"{nome_arquivo} (ERRO: {mensagem})")
+        listbox.itemconfig(i, {'fg': '#F44336'})  # Vermelho para arquivos inválidos
+    var.set(";".join(caminhos))
+    atualizar_status_lista(listbox)
+
+def encerrar_validacao(tipo, arquivo, cancelado):
+    """Remove o registro da validação que terminou, se ela não foi substituída (thread da interface)"""
+    if validacoes_arquivos.get((tipo, arquivo)) is cancelado:
+        del validacoes_arquivos[(tipo, arquivo)]
+
+def cancelar_validacoes(tipo, nomes_arquivos):
+    """Cancela as validações em andamento dos arquivos com esses nomes (itens removidos da lista)"""
+    for (tipo_validacao, arquivo), cancelado in validacoes_arquivos.items():
+        if tipo_validacao == tipo and os.path.basename(arquivo) in nomes_arquivos:
+            cancelado.set()
+
+def validar_arquivo_em_segundo_plano(arquivo, tipo, listbox, var, cancelado):
+    """
+    Valida um arquivo numa thread do pool: primeiro a validação rápida (cabeçalho
+    e amostra), cujo resultado aparece na lista, depois a completa, cujo
+    resultado fica guardado para o processamento
+
+    A validação completa é registrada como em andamento antes de o resultado
+    rápido liberar o arquivo na lista: um processamento iniciado nesse
+    intervalo espera por ela em vez de ler o arquivo de novo. O cancelamento
+    é verificado também entre os blocos da leitura completa; cancelada, ela
+    para sem alterar o resultado rápido já exibido.
+    """
+    def publicar(valido, mensagem):
+        # Widgets só podem ser alterados na thread da interface
+        na_interface(concluir_validacao, tipo, listbox, var, arquivo, cancelado, valido, mensagem)
+
+    try:
+        validar_arquivo(arquivo, tipo, cancelado, publicar)
+    finally:
+        # Depois dos resultados publicados, na mesma fila da interface
+        na_interface(encerrar_validacao, tipo, arquivo, cancelado)
+
+def validar_arquivo(arquivo, tipo, cancelado, publicar):
+    """Validação rápida e completa de um arquivo (ver validar_arquivo_em_segundo_plano)"""
+    if cancelado.is_set():
+        publicar(False, TEXTO_CANCELADO)
+        return
+    try:
+        import ingestao
+        valido, mensagem = getattr(ingestao, f'validar_amostra_{tipo}')(arquivo)
+        if not valido:
+            publicar(valido, mensagem)
+            return
+
+        validados = ingestao.get_arquivos_validados()
+        em_andamento = validados.iniciar(tipo, arquivo)
+        try:
+            publicar(valido, mensagem)
+            if cancelado.is_set():
+                return
+            import analise_relatorios
+            valido, mensagem = getattr(analise_relatorios, f'validar_arquivo_{tipo}')(arquivo, cancelado)
+        finally:
+            validados.concluir(tipo, arquivo, em_andamento)
+        if not valido:
+            publicar(False, mensagem)
+    except ProcessamentoCancelado:
+        return
+    except Exception as e:
+        publicar(False, f'Erro ao validar arquivo: {str(e)}')
+
+def validar_selecao(arquivos, tipo, listbox, var):
+    """
+    Inclui os arquivos selecionados na lista como "validando…" e despacha a
+    validação de cada um para o pool de threads
+
+    Um novo lote cancela as validações ainda pendentes do lote anterior da
+    mesma lista, exceto as dos arquivos selecionados de novo, que continuam.
+    Arquivos da lista com validação cancelada ou com erro são validados de novo.
+    """
+    for (tipo_anterior, arquivo), cancelado in validacoes_arquivos.items():
+        if tipo_anterior == tipo and arquivo not in arquivos:
+            cancelado.set()
+
+    executor = obter_executor_validacao()
+    for arquivo in arquivos:
+        nome_arquivo = os.path.basename(arquivo)
+        i = localizar_item(listbox, nome_arquivo)
+        if i is not None:
+            item = listbox.get(i)
+            anterior = validacoes_arquivos.get((tipo, arquivo))
+            if item == nome_arquivo or (item == f"{nome_arquivo} ({TEXTO_VALIDANDO})" and
+                                        anterior is not None and not anterior.is_set()):
+                continue  # Já válido ou ainda em validação
+            listbox.delete(i)  # Cancelado (ou com cancelamento pendente) ou com erro: valida de novo
+        else:
+            i = tk.END
+        listbox.insert(i, f"{nome_arquivo} ({TEXTO_VALIDANDO})")
+        listbox.itemconfig(i, {'fg': SHOPEE_GRAY})
+        cancelado = threading.Event()
+        validacoes_arquivos[(tipo, arquivo)] = cancelado
+        executor.submit(validar_arquivo_em_segundo_plano, arquivo, tipo, listbox, var, cancelado)
+    atualizar_status_lista(listbox)
 
 def selecionar_expedicao():
     global expedicao_var, expedicao_listbox, status_label
@@ -339,69 +645,7 @@ def selecionar_expedicao():
     )
     
     if files:
-        try:
-            # Importar função de validação
-            from analise_relatorios import validar_arquivo_expedicao
-            
-            # Obter arquivos já existentes na lista
-            arquivos_existentes = []
-            for i in range(expedicao_listbox.size()):
-                arquivo = expedicao_listbox.get(i)
-                if not arquivo.endswith(')'):  # Ignorar arquivos com erro
-                    arquivos_existentes.append(arquivo)
-            
-            # Validar cada arquivo novo
-            arquivos_validos = []
-            for file in files:
-                nome_arquivo = os.path.basename(file)
-                if nome_arquivo in arquivos_existentes:
-                    continue  # Pular arquivos que já estão na lista
-                    
-                valido, mensagem = validar_arquivo_expedicao(file)
-                if valido:
-                    arquivos_validos.append(file)
-                    expedicao_listbox.insert(tk.END, nome_arquivo)
-                    expedicao_listbox.itemconfig(tk.END, {'fg': '#4CAF50'})  # Verde para arquivos válidos
-                else:
-                    expedicao_listbox.insert(tk.END, f"{nome_arquivo} (ERRO: {mensagem})")
-                    expedicao_listbox.itemconfig(tk.END, {'fg': '#F44336'})  # Vermelho para arquivos inválidos
-            
-            # Atualizar a variável com todos os arquivos válidos (existentes + novos)
-            todos_arquivos_validos = []
-            for i in range(expedicao_listbox.size()):
-                arquivo = expedicao_listbox.get(i)
-                if not arquivo.endswith(')'):  # Ignorar arquivos com erro
-                    # Se for um arquivo existente, usar o caminho completo
-                    if arquivo in arquivos_existentes:
-                        for f in expedicao_var.get().split(";"):
-                            if arquivo == os.path.basename(f):
-                                todos_arquivos_validos.append(f)
-                                break
-                    else:  # Se for um arquivo novo
-                        for f in arquivos_validos:
-                            if arquivo == os.path.basename(f):
-                                todos_arquivos_validos.append(f)
-                                break
-            
-            if todos_arquivos_validos:
-                expedicao_var.set(";".join(todos_arquivos_validos))
-                status_label.config(
-                    text=f'{len(todos_arquivos_validos)} arquivo(s) válido(s) na lista',
-                    foreground='#4CAF50'
-                )
-            else:
-                expedicao_var.set('')
-                status_label.config(
-                    text='Nenhum arquivo válido na lista',
-                    foreground='#F44336'
-                )
-                
-        except Exception as e:
-            status_label.config(
-                text=f'Erro ao validar arquivos: {str(e)}',
-                foreground='#F44336'
-            )
-            messagebox.showerror('Erro', f'Erro ao validar os arquivos:\n\n{str(e)}')
+        validar_selecao(files, 'expedicao', expedicao_listbox, expedicao_var)
     else:
         if expedicao_listbox.size() == 0:
             status_label.config(
@@ -417,69 +661,7 @@ def selecionar_conferencia():
     )
     
     if files:
-        try:
-            # Importar função de validação
-            from analise_relatorios import validar_arquivo_conferencia
-            
-            # Obter arquivos já existentes na lista
-            arquivos_existentes = []
-            for i in range(conferencia_listbox.size()):
-                arquivo = conferencia_listbox.get(i)
-                if not arquivo.endswith(')'):  # Ignorar arquivos com erro
-                    arquivos_existentes.append(arquivo)
-            
-            # Validar cada arquivo novo
-            arquivos_validos = []
-            for file in files:
-                nome_arquivo = os.path.basename(file)
-                if nome_arquivo in arquivos_existentes:
-                    continue  # Pular arquivos que já estão na lista
-                    
-            valido, mensagem = validar_arquivo_conferencia(file)
-            if valido:
-                    arquivos_validos.append(file)
-                    conferencia_listbox.insert(tk.END, nome_arquivo)
-                    conferencia_listbox.itemconfig(tk.END, {'fg': '#4CAF50'})  # Verde para arquivos válidos
-            else:
-                conferencia_listbox.insert(tk.END, f"{nome_arquivo} (ERRO: {mensagem})")
-                conferencia_listbox.itemconfig(tk.END, {'fg': '#F44336'})  # Vermelho para arquivos inválidos
-            
-            # Atualizar a variável com todos os arquivos válidos (existentes + novos)
-            todos_arquivos_validos = []
-            for i in range(conferencia_listbox.size()):
-                arquivo = conferencia_listbox.get(i)
-                if not arquivo.endswith(')'):  # Ignorar arquivos com erro
-                    # Se for um arquivo existente, usar o caminho completo
-                    if arquivo in arquivos_existentes:
-                        for f in conferencia_var.get().split(";"):
-                            if arquivo == os.path.basename(f):
-                                todos_arquivos_validos.append(f)
-                                break
-                    else:  # Se for um arquivo novo
-                        for f in arquivos_validos:
-                            if arquivo == os.path.basename(f):
-                                todos_arquivos_validos.append(f)
-                                break
-            
-            if todos_arquivos_validos:
-                conferencia_var.set(";".join(todos_arquivos_validos))
-                status_label.config(
-                    text=f'{len(todos_arquivos_validos)} arquivo(s) válido(s) na lista',
-                    foreground='#4CAF50'
-                )
-            else:
-                conferencia_var.set('')
-                status_label.config(
-                    text='Nenhum arquivo válido na lista',
-                    foreground='#F44336'
-                )
-                
-        except Exception as e:
-            status_label.config(
-                text=f'Erro ao validar arquivos: {str(e)}',
-                foreground='#F44336'
-            )
-            messagebox.showerror('Erro', f'Erro ao validar os arquivos:\n\n{str(e)}')
+        validar_selecao(files, 'conferencia', conferencia_listbox, conferencia_var)
     else:
         if conferencia_listbox.size() == 0:
             status_label.config(
@@ -495,6 +677,9 @@ def selecionar_diretorio():
 
 def on_gerar():
     global expedicao_var, conferencia_var, output_dir_var, info_text, placeholder_text, status_label, window_var
+    global processamento_atual
+    if processamento_atual is not None:
+        return
     expedicao_files_str = expedicao_var.get()
     conferencia_files_str = conferencia_var.get()
     output_dir = output_dir_var.get()
@@ -512,14 +697,32 @@ def on_gerar():
     if not expedicao_files or not conferencia_files or not output_dir:
         status_label.config(text='Selecione todos os arquivos e diretório!', foreground='#F44336')
         return
+
+    for listbox in (expedicao_listbox, conferencia_listbox):
+        if any(listbox.get(i).endswith(f'({TEXTO_VALIDANDO})') for i in range(listbox.size())):
+            status_label.config(text='Aguarde a validação dos arquivos selecionados', foreground='#FF9800')
+            return
         
+    processamento_atual = TokenCancelamento()
+    btn_gerar.configure(state='disabled')
+    btn_cancelar.configure(state='normal')
+    barra_progresso.configure(value=0)
+
     # Rodar processamento em thread separada para não travar a GUI
     threading.Thread(
         target=processar,
-        args=(expedicao_files, conferencia_files[0], output_dir, info_adicional, status_label, window_var),  # Por enquanto, usando apenas o primeiro arquivo de conferência
+        args=(expedicao_files, conferencia_files[0], output_dir, info_adicional, window_var.get(), processamento_atual),  # Por enquanto, usando apenas o primeiro arquivo de conferência
         daemon=True
     ).start()
 
+def on_cancelar():
+    """Pede o cancelamento do processamento, que para ao fim da etapa atual"""
+    if processamento_atual is None:
+        return
+    processamento_atual.cancelar()
+    btn_cancelar.configure(state='disabled')
+    status_label.config(text='Cancelando ao fim da etapa atual...', foreground='#FF9800')
+
 # Função para criar frames de seção
 def create_section_frame(parent, title_text):
     frame = tk.Frame(parent, bg=DARK_BG)
@@ -584,7 +787,7 @@ def abrir_configuracao_email():
 
 def atualizar_janela_atual():
     global window_label
-    config_manager = ConfigManager()
+    config_manager = get_config_manager()
     window_key, window_config = config_manager.get_current_window()
     
     if window_config:
@@ -629,6 +832,10 @@ def remover_selecionados_expedicao():
                         novos_caminhos.append(caminho)
                         break
     
+    # Itens removidos param a validação ainda em andamento (inclusive a completa de um arquivo já válido)
+    removidos = [expedicao_listbox.get(i) for i in indices_selecionados]
+    cancelar_validacoes('expedicao', {nome.removesuffix(f' ({TEXTO_VALIDANDO})') for nome in removidos})
+
     # Limpar a listbox
     expedicao_listbox.delete(0, tk.END)
     
@@ -636,13 +843,20 @@ def remover_selecionados_expedicao():
     for nome in nomes_mantidos:
         expedicao_listbox.insert(tk.END, nome)
         # Restaurar a cor do item
-        if nome.endswith(')'): # Se for um arquivo com erro
+        if nome.endswith(f'({TEXTO_VALIDANDO})') or nome.endswith(f'({TEXTO_CANCELADO})'):
+            expedicao_listbox.itemconfig(tk.END, {'fg': SHOPEE_GRAY})
+        elif nome.endswith(')'): # Se for um arquivo com erro
             expedicao_listbox.itemconfig(tk.END, {'fg': '#F44336'})
         else:
             expedicao_listbox.itemconfig(tk.END, {'fg': '#4CAF50'})
     
     # Atualizar a variável com os caminhos restantes
     expedicao_var.set(";".join(novos_caminhos))
+
+    # Descartar os resultados da validação completa dos arquivos removidos
+    from ingestao import get_arquivos_validados
+    for caminho in set(caminhos_completos) - set(novos_caminhos):
+        get_arquivos_validados().descartar(caminho)
     
     # Atualizar status
     arquivos_validos = len([nome for nome in nomes_mantidos if not nome.endswith(')')])
@@ -685,6 +899,10 @@ def remover_selecionados_conferencia():
                         novos_caminhos.append(caminho)
                         break
     
+    # Itens removidos param a validação ainda em andamento (inclusive a completa de um arquivo já válido)
+    removidos = [conferencia_listbox.get(i) for i in indices_selecionados]
+    cancelar_validacoes('conferencia', {nome.removesuffix(f' ({TEXTO_VALIDANDO})') for nome in removidos})
+
     # Limpar a listbox
     conferencia_listbox.delete(0, tk.END)
     
@@ -692,13 +910,20 @@ def remover_selecionados_conferencia():
     for nome in nomes_mantidos:
         conferencia_listbox.insert(tk.END, nome)
         # Restaurar a cor do item
-        if nome.endswith(')'): # Se for um arquivo com erro
+        if nome.endswith(f'({TEXTO_VALIDANDO})') or nome.endswith(f'({TEXTO_CANCELADO})'):
+            conferencia_listbox.itemconfig(tk.END, {'fg': SHOPEE_GRAY})
+        elif nome.endswith(')'): # Se for um arquivo com erro
             conferencia_listbox.itemconfig(tk.END, {'fg': '#F44336'})
         else:
             conferencia_listbox.itemconfig(tk.END, {'fg': '#4CAF50'})
     
     # Atualizar a variável com os caminhos restantes
     conferencia_var.set(";".join(novos_caminhos))
+
+    # Descartar os resultados da validação completa dos arquivos removidos
+    from ingestao import get_arquivos_validados
+    for caminho in set(caminhos_completos) - set(novos_caminhos):
+        get_arquivos_validados().descartar(caminho)
     
     # Atualizar status
     arquivos_validos = len([nome for nome in nomes_mantidos if not nome.endswith(')')])
@@ -748,6 +973,7 @@ def inicializar_interface():
     global root, scroll_canvas, main_frame, top_frame, title_frame, title, logo_label
     global conferencia_label, output_dir_label, info_text, placeholder_text, status_label
     global expedicao_var, conferencia_var, output_dir_var, expedicao_listbox, conferencia_listbox, window_label, window_var
+    global btn_gerar, btn_cancelar, barra_progresso
 
     # GUI principal com tema escuro
     root = tb.Window(themename='darkly')  # Usando tema escuro do ttkbootstrap
@@ -936,7 +1162,7 @@ def inicializar_interface():
     config_button.pack(side='right', padx=5)
     
     # Dropdown para seleção de janela
-    config_manager = ConfigManager()
+    config_manager = get_config_manager()
     config = config_manager.load_config()
     window_options = [config_manager.format_window_display(k, v) for k, v in config.items()]
     
@@ -1122,15 +1348,37 @@ def inicializar_interface():
     info_text.bind("<FocusIn>", on_info_focus_in)
     info_text.bind("<FocusOut>", on_info_focus_out)
 
-    # Botão principal
+    # Botão principal e cancelamento
+    acoes_frame = tk.Frame(main_frame, bg=DARK_BG)
+    acoes_frame.pack(pady=(30, 10))
+
     btn_gerar = ttk.Button(
-        main_frame,
+        acoes_frame,
         text='Gerar Relatórios',
         style='warning.TButton',
         width=25,
         command=on_gerar
     )
-    btn_gerar.pack(pady=30)
+    btn_gerar.pack(side='left', padx=5)
+
+    btn_cancelar = ttk.Button(
+        acoes_frame,
+        text='Cancelar',
+        style='danger.Outline.TButton',
+        width=12,
+        command=on_cancelar,
+        state='disabled'
+    )
+    btn_cancelar.pack(side='left', padx=5)
+
+    # Progresso do processamento
+    barra_progresso = ttk.Progressbar(
+        main_frame,
+        mode='determinate',
+        maximum=100,
+        value=0
+    )
+    barra_progresso.pack(fill='x', pady=(10, 0))
 
     # Status
     status_label = tk.Label(
@@ -1218,6 +1466,12 @@ def inicializar_interface():
     # ===== GERENCIAMENTO DE FOCO =====
     configurar_gerenciamento_foco()
 
+    # Executado quando o mainloop começa, com a janela já desenhada
+    root.after(0, concluir_inicializacao)
+    root.after(0, drenar_fila_interface)
+
 # Inicializar e executar a interface
-inicializar_interface()
-root.mainloop() 
\ No newline at end of file
+# (protegido para que os processos da ingestão paralela possam importar o módulo principal)
+if __name__ == "__main__":
+    inicializar_interface()
+    root.mainloop()
@@ -0,0 +1,480 @@
+"""
+Camada de ingestão dos arquivos de entrada
+Lê cada CSV uma única vez, aplica as regras de validação sobre o DataFrame
+carregado e entrega o mesmo objeto para a etapa de análise
+
+A validação tem dois níveis: a rápida lê só o cabeçalho e uma amostra das
+primeiras linhas (resposta imediata na seleção de arquivos); a completa lê o
+arquivo em blocos, para no primeiro bloco inválido e guarda o resultado para
+que o processamento não leia o arquivo de novo.
+"""
+
+import os
+import threading
+import time
+import pandas as pd
+from esquemas import (ESQUEMA_CONFERENCIA, ESQUEMA_EXPEDICAO, VERSAO_ESQUEMAS, CATEGORIA, DATA, NUMERO,
+                      memoria_df, estimar_memoria_sem_projecao)
+from cache_exportacoes import get_cache_exportacoes
+from progresso import ProcessamentoCancelado
+
+# Colunas obrigatórias de cada exportação
+COLUNAS_CONFERENCIA = [
+    'AT/TO',
+    'AT/TO Validation Status',
+    'Total Final Orders Inside AT/TO',
+    'Validation Start Time',
+    'Validation End Time'
+]
+
+COLUNAS_EXPEDICAO = [
+    'Task ID',
+    'Agency',
+    'Driver name',
+    'SPX tracking num',
+    'Status'  # Adicionada coluna de status como obrigatória
+]
+
+# Linhas lidas pela validação rápida (cabeçalho + amostra)
+LINHAS_AMOSTRA_VALIDACAO = 1000
+
+# Linhas por bloco na leitura da validação completa
+LINHAS_BLOCO_VALIDACAO = 100000
+
+
+class ArquivoCarregado:
+    """Resultado da leitura de um arquivo de entrada"""
+
+    def __init__(self, caminho, df=None, tempo_leitura=0.0, valido=False, mensagem='',
+                 memoria=0, memoria_economizada=0, do_cache=False, linhas=None, em_blocos=False):
+        """
+        Args:
+            caminho: caminho do arquivo CSV lido
+            df: DataFrame carregado (None se a leitura falhou)
+            tempo_leitura: tempo gasto no parse do arquivo, em segundos
+            valido: resultado da validação
+            mensagem: mensagem de validação ou de erro
+            memoria: memória ocupada pelo DataFrame tipado, em bytes
+            memoria_economizada: estimativa de memória poupada pela projeção
+                de colunas e tipagem, em bytes
+            do_cache: True se o DataFrame veio do cache de exportações
+            linhas: linhas lidas, quando o DataFrame completo não é mantido
+            em_blocos: True se o arquivo foi lido em blocos
+        """
+        self.caminho = caminho
+        self.df = df
+        self.tempo_leitura = tempo_leitura
+        self.valido = valido
+        self.mensagem = mensagem
+        self.memoria = memoria
+        self.memoria_economizada = memoria_economizada
+        self.do_cache = do_cache
+        self._linhas = linhas
+        self.em_blocos = em_blocos
+
+    @property
+    def nome(self):
+        """Nome do arquivo sem o diretório"""
+        return os.path.basename(self.caminho)
+
+    @property
+    def linhas(self):
+        """Quantidade de linhas carregadas"""
+        if self._linhas is not None:
+            return self._linhas
+        return len(self.df) if self.df is not None else 0
+
+    def liberar_df(self):
+        """Descarta o DataFrame, mantendo a contagem de linhas e as estatísticas"""
+        self._linhas = self.linhas
+        self.df = None
+
+    def resumo(self):
+        """Texto curto com as estatísticas de leitura do arquivo"""
+        if self.do_cache:
+            origem = 'do cache'
+        elif self.em_blocos:
+            origem = 'lidas em blocos'
+        else:
+            origem = 'lidas'
+        return (f"{self.nome}: {self.linhas} linhas {origem} em {self.tempo_leitura:.2f}s, "
+                f"{self.memoria / 1024 ** 2:.1f} MB em memória "
+                f"({self.memoria_economizada / 1024 ** 2:.1f} MB economizados)")
+
+
+def ler_csv(arquivo, esquema, linhas=None):
+    """
+    Lê do CSV apenas as colunas declaradas no esquema, como texto
+
+    Aceita caminho ou buffer em memória. As colunas são renomeadas para os
+    nomes canônicos do esquema.
+
+    Args:
+        linhas: quantidade máxima de linhas lidas (padrão: o arquivo inteiro)
+
+    Returns:
+        tuple: (DataFrame, tempo de leitura em segundos)
+    """
+    inicio = time.perf_counter()
+    cabecalho = pd.read_csv(arquivo, nrows=0).columns
+    mapa = esquema.resolver_colunas(cabecalho)
+    if hasattr(arquivo, 'seek'):
+        arquivo.seek(0)
+    df = pd.read_csv(arquivo, dtype=str, usecols=list(mapa), nrows=linhas).rename(columns=mapa)
+    return df, time.perf_counter() - inicio
+
+
+def ler_csv_em_blocos(arquivo, esquema, linhas_por_bloco):
+    """
+    Lê do CSV as colunas declaradas no esquema em blocos de linhas, como texto
+
+    Apenas um bloco fica em memória por vez; cada bloco já vem com os nomes
+    canônicos do esquema.
+
+    Yields:
+        DataFrame com até linhas_por_bloco linhas
+    """
+    cabecalho = pd.read_csv(arquivo, nrows=0).columns
+    mapa = esquema.resolver_colunas(cabecalho)
+    with pd.read_csv(arquivo, dtype=str, usecols=list(mapa), chunksize=linhas_por_bloco) as leitor:
+        for bloco in leitor:
+            yield bloco.rename(columns=mapa)
+
+
+def mensagem_erro_leitura(erro):
+    """Mensagem de validação correspondente a um erro na leitura do CSV"""
+    if isinstance(erro, pd.errors.EmptyDataError):
+        return "O arquivo está vazio"
+    if isinstance(erro, pd.errors.ParserError):
+        return "Erro ao processar o arquivo. Verifique se o formato está correto (CSV)"
+    if isinstance(erro, FileNotFoundError):
+        return "Arquivo não encontrado"
+    return f"Erro ao validar arquivo: {str(erro)}"
+
+
+def validar_df_conferencia(df, invalidos=None, amostra=False):
+    """
+    Aplica as regras de validação da conferência sobre um DataFrame já carregado
+
+    Args:
+        df: DataFrame lido (como texto ou já tipado)
+        invalidos: primeiro valor não convertido por coluna, preenchido por
+            esquema.aplicar_tipos; se None, as colunas de data e número são
+            convertidas aqui só para a validação
+        amostra: True se df é só parte do arquivo (amostra ou bloco); regras
+            que dependem do arquivo inteiro (rotas validadas) não são aplicadas
+
+    Returns:
+        tuple: (bool, str) - (válido, mensagem de erro)
+    """
+    colunas_faltantes = [col for col in COLUNAS_CONFERENCIA if col not in df.columns]
+    if colunas_faltantes:
+        return False, f"Arquivo não contém as colunas necessárias: {', '.join(colunas_faltantes)}"
+
+    # Validar se há dados
+    if df.empty:
+        return False, "O arquivo está vazio"
+
+    # Validar se há rotas validadas
+    if not amostra and not (df['AT/TO Validation Status'] == 'Validated').any():
+        return False, "Não há rotas validadas no arquivo"
+
+    if invalidos is None:
+        invalidos = {}
+        ESQUEMA_CONFERENCIA.aplicar_tipos(df[COLUNAS_CONFERENCIA].copy(), invalidos)
+
+    # Validar formato das datas
+    for col in ['Validation Start Time', 'Validation End Time']:
+        if col in invalidos:
+            return False, f"Formato de data inválido na coluna {col}"
+
+    # Validar formato dos números
+    if 'Total Final Orders Inside AT/TO' in invalidos:
+        return False, "Formato inválido na coluna de quantidade de pedidos"
+
+    return True, "Arquivo válido"
+
+
+def validar_df_expedicao(df, invalidos=None, amostra=False):
+    """
+    Aplica as regras de validação da expedição sobre um DataFrame já carregado
+
+    Datas inválidas da expedição não reprovam o arquivo (viram NaT); invalidos
+    e amostra são aceitos apenas pela simetria com validar_df_conferencia.
+
+    Returns:
+        tuple: (bool, str) - (válido, mensagem de erro)
+    """
+    colunas_faltantes = [col for col in COLUNAS_EXPEDICAO if col not in df.columns]
+    if colunas_faltantes:
+        return False, f"Arquivo não contém as colunas necessárias: {', '.join(colunas_faltantes)}"
+
+    # Validar se há dados
+    if df.empty:
+        return False, "O arquivo está vazio"
+
+    return True, "Arquivo válido"
+
+
+def _resultado_valido(arquivo, df, tempo, mensagem, do_cache=False):
+    """Monta o ArquivoCarregado de um arquivo válido com as estatísticas de memória"""
+    memoria = memoria_df(df)
+    try:
+        memoria_economizada = max(0, estimar_memoria_sem_projecao(arquivo, len(df)) - memoria)
+    except Exception:
+        memoria_economizada = 0
+
+    return ArquivoCarregado(arquivo, df=df, tempo_leitura=tempo, valido=True, mensagem=mensagem,
+                            memoria=memoria, memoria_economizada=memoria_economizada, do_cache=do_cache)
+
+
+def verificar_cancelamento(cancelado):
+    """Lança ProcessamentoCancelado se a leitura foi cancelada (cancelado: threading.Event ou None)"""
+    if cancelado is not None and cancelado.is_set():
+        raise ProcessamentoCancelado("Validação cancelada")
+
+
+def _ler_validando_em_blocos(arquivo, esquema, validador, cancelado=None):
+    """
+    Lê o arquivo em blocos, convertendo datas e números e validando cada bloco
+
+    A leitura para no primeiro bloco com coluna faltante ou valor inválido, e
+    lança ProcessamentoCancelado entre blocos se cancelado for sinalizado.
+
+    Returns:
+        tuple: (DataFrame tipado ou None, valores inválidos por coluna, mensagem de erro)
+    """
+    blocos = []
+    invalidos = {}
+    for bloco in ler_csv_em_blocos(arquivo, esquema, LINHAS_BLOCO_VALIDACAO):
+        verificar_cancelamento(cancelado)
+        esquema.aplicar_tipos(bloco, invalidos, tipos=(DATA, NUMERO))
+        valido, mensagem = validador(bloco, invalidos, amostra=True)
+        if not valido:
+            return None, invalidos, mensagem
+        blocos.append(bloco)
+
+    df = pd.concat(blocos, ignore_index=True) if len(blocos) > 1 else blocos[0]
+    # Categorias só depois de juntar os blocos, para que cada coluna tenha um único conjunto
+    esquema.aplicar_tipos(df, tipos=(CATEGORIA,))
+    return df, invalidos, ''
+
+
+def _carregar(arquivo, esquema, validador, cancelado=None):
+    """
+    Lê o arquivo em blocos, aplica os tipos do esquema e valida o resultado
+
+    Cada coluna de data/número é convertida uma única vez: a validação usa os
+    valores inválidos registrados durante a tipagem, e a leitura para no
+    primeiro bloco inválido.
+
+    Arquivos já processados anteriormente (mesmo conteúdo e mesma versão de
+    esquema) são carregados do cache de exportações. Se cancelado (Event) for
+    sinalizado, a leitura para no bloco seguinte com ProcessamentoCancelado.
+    """
+    cache = get_cache_exportacoes()
+    chave = None
+    if cache.ativo:
+        inicio = time.perf_counter()
+        try:
+            chave = cache.chave(arquivo, esquema, VERSAO_ESQUEMAS)
+        except FileNotFoundError:
+            return ArquivoCarregado(arquivo, mensagem="Arquivo não encontrado")
+        except OSError:
+            chave = None
+        if chave:
+            df = cache.carregar(chave)
+            if df is not None:
+                # Só arquivos válidos são gravados no cache
+                return _resultado_valido(arquivo, df, time.perf_counter() - inicio, "Arquivo válido", do_cache=True)
+
+    inicio = time.perf_counter()
+    try:
+        df, invalidos, mensagem = _ler_validando_em_blocos(arquivo, esquema, validador, cancelado)
+    except ProcessamentoCancelado:
+        raise
+    except Exception as e:
+        return ArquivoCarregado(arquivo, mensagem=mensagem_erro_leitura(e))
+
+    if df is None:
+        return ArquivoCarregado(arquivo, tempo_leitura=time.perf_counter() - inicio, mensagem=mensagem)
+
+    try:
+        valido, mensagem = validador(df, invalidos)
+    except Exception as e:
+        valido, mensagem = False, f"Erro ao validar arquivo: {str(e)}"
+    tempo = time.perf_counter() - inicio
+
+    if not valido:
+        return ArquivoCarregado(arquivo, df=df, tempo_leitura=tempo, valido=valido, mensagem=mensagem)
+
+    if chave:
+        cache.salvar(chave, df)
+
+    return _resultado_valido(arquivo, df, tempo, mensagem)
+
+
+def _validar_amostra(arquivo, esquema, validador):
+    """Validação rápida: cabeçalho e primeiras linhas do arquivo"""
+    try:
+        df, _ = ler_csv(arquivo, esquema, linhas=LINHAS_AMOSTRA_VALIDACAO)
+    except Exception as e:
+        return False, mensagem_erro_leitura(e)
+
+    try:
+        invalidos = {}
+        esquema.aplicar_tipos(df, invalidos, tipos=(DATA, NUMERO))
+        # Se a amostra não chegou ao limite, ela é o arquivo inteiro
+        return validador(df, invalidos, amostra=len(df) >= LINHAS_AMOSTRA_VALIDACAO)
+    except Exception as e:
+        return False, f"Erro ao validar arquivo: {str(e)}"
+
+
+def validar_amostra_conferencia(arquivo):
+    """
+    Validação rápida do arquivo de conferência (cabeçalho e amostra)
+
+    Não garante que o restante do arquivo seja válido; para isso use
+    carregar_conferencia.
+
+    Returns:
+        tuple: (bool, str) - (válido, mensagem de erro)
+    """
+    return _validar_amostra(arquivo, ESQUEMA_CONFERENCIA, validar_df_conferencia)
+
+
+def validar_amostra_expedicao(arquivo):
+    """
+    Validação rápida de um arquivo de expedição (cabeçalho e amostra)
+
+    Returns:
+        tuple: (bool, str) - (válido, mensagem de erro)
+    """
+    return _validar_amostra(arquivo, ESQUEMA_EXPEDICAO, validar_df_expedicao)
+
+
+def carregar_conferencia(arquivo, cancelado=None):
+    """
+    Carrega e valida o arquivo de conferência
+
+    Args:
+        arquivo: caminho do arquivo CSV de conferência
+        cancelado: Event que interrompe a leitura (ProcessamentoCancelado)
+
+    Returns:
+        ArquivoCarregado com o DataFrame tipado e o resultado da validação
+    """
+    return _carregar(arquivo, ESQUEMA_CONFERENCIA, validar_df_conferencia, cancelado)
+
+
+def carregar_expedicao(arquivo, cancelado=None):
+    """
+    Carrega e valida um arquivo de expedição (assignment)
+
+    Args:
+        arquivo: caminho do arquivo CSV de expedição
+        cancelado: Event que interrompe a leitura (ProcessamentoCancelado)
+
+    Returns:
+        ArquivoCarregado com o DataFrame tipado e o resultado da validação
+    """
+    return _carregar(arquivo, ESQUEMA_EXPEDICAO, validar_df_expedicao, cancelado)
+
+
+class ArquivosValidados:
+    """
+    Resultados da validação completa, guardados para o processamento
+
+    Cada resultado é entregue uma única vez e só enquanto o arquivo não mudar
+    (mesmo tamanho e data de modificação), de modo que o processamento não
+    precise ler de novo um arquivo que a interface acabou de validar. Enquanto
+    a validação completa de um arquivo está em andamento (iniciar/concluir),
+    retirar espera pelo seu resultado em vez de deixar o processamento ler o
+    arquivo de novo, ao mesmo tempo.
+    """
+
+    def __init__(self):
+        self._resultados = {}
+        self._em_andamento = {}
+        self._lock = threading.Lock()
+
+    def iniciar(self, tipo, arquivo):
+        """
+        Registra uma validação completa em andamento
+
+        Returns:
+            Event a ser passado a concluir quando a validação terminar (com ou sem sucesso)
+        """
+        evento = threading.Event()
+        with self._lock:
+            self._em_andamento[(tipo, os.path.abspath(arquivo))] = evento
+        return evento
+
+    def concluir(self, tipo, arquivo, evento):
+        """Marca a validação completa registrada por iniciar como terminada"""
+        with self._lock:
+            chave = (tipo, os.path.abspath(arquivo))
+            if self._em_andamento.get(chave) is evento:
+                del self._em_andamento[chave]
+        evento.set()
+
+    @staticmethod
+    def _assinatura(arquivo):
+        estado = os.stat(arquivo)
+        return estado.st_size, estado.st_mtime_ns
+
+    def guardar(self, tipo, arquivo, resultado):
+        """Guarda o resultado da validação completa de um arquivo ('conferencia' ou 'expedicao')"""
+        try:
+            assinatura = self._assinatura(arquivo)
+        except OSError:
+            return
+        with self._lock:
+            self._resultados[(tipo, os.path.abspath(arquivo))] = (assinatura, resultado)
+
+    def retirar(self, tipo, arquivo):
+        """
+        Resultado guardado para o arquivo, removendo-o do registro
+
+        Se a validação completa do arquivo ainda está em andamento, espera por ela.
+
+        Returns:
+            O resultado guardado, ou None se não houver ou se o arquivo mudou
+        """
+        with self._lock:
+            em_andamento = self._em_andamento.get((tipo, os.path.abspath(arquivo)))
+        if em_andamento is not None:
+            print(f"Aguardando a validação completa de {os.path.basename(arquivo)}")
+            em_andamento.wait()
+        with self._lock:
+            guardado = self._resultados.pop((tipo, os.path.abspath(arquivo)), None)
+        if guardado is None:
+            return None
+        assinatura, resultado = guardado
+        try:
+            if self._assinatura(arquivo) != assinatura:
+                return None
+        except OSError:
+            return None
+        return resultado
+
+    def descartar(self, arquivo):
+        """Remove os resultados guardados de um arquivo (ex: retirado da lista na interface)"""
+        caminho = os.path.abspath(arquivo)
+        with self._lock:
+            for chave in [chave for chave in self._resultados if chave[1] == caminho]:
+                del self._resultados[chave]
+
+
+_arquivos_validados = None
+_arquivos_validados_lock = threading.Lock()
+
+
+def get_arquivos_validados():
+    """Retorna a instância global dos resultados de validação guardados (segura entre threads)"""
+    global _arquivos_validados
+    if _arquivos_validados is None:
+        with _arquivos_validados_lock:
+            if _arquivos_validados is None:
+                _arquivos_validados = ArquivosValidados()
+    return _arquivos_validados
@@ -0,0 +1,385 @@
+"""
+Instrumentação do processamento de relatórios
+Mede cada etapa do processamento (tempo de relógio, tempo de CPU, linhas de
+entrada e de saída e memória dos DataFrames produzidos) e grava o registro da
+execução em JSON ao lado dos relatórios gerados. No modo de perfilamento
+(PERFILAMENTO=true no .env) a execução também é perfilada com cProfile e
+tracemalloc. Não depende de pandas, para ser importado pela interface sem custo.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Nome do registro da execução gravado no diretório de saída
+ARQUIVO_REGISTRO = 'execucao_relatorio.json'
+
+VERSAO_REGISTRO = 2
+
+# Artefatos do modo de perfilamento gravados no diretório de saída
+ARQUIVO_PERFIL = 'perfil_execucao.prof'
+ARQUIVO_ALOCACOES = 'perfil_alocacoes.txt'
+
+# Quadros de pilha guardados por alocação (mais quadros = snapshots mais lentos)
+QUADROS_ALOCACAO = 8
+
+# Funções listadas no resumo do cProfile, por tempo acumulado
+FUNCOES_RESUMO_PERFIL = 40
+
+# Diretório do projeto, para apontar a linha do nosso código em cada alocação
+_DIRETORIO_PROJETO = os.path.dirname(os.path.abspath(__file__))
+
+
+def pico_memoria_mb():
+    """
+    Pico de memória residente (RSS) do processo atual desde o seu início, em MB
+
+    Processos filhos (ingestão paralela, renderização em processos) não entram
+    na conta. Retorna None se a plataforma não informar o pico.
+    """
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ContadoresMemoria(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD),
+                ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t),
+                ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t),
+                ('PeakPagefileUsage', ctypes.c_size_t),
+            ]
+
+        contadores = ContadoresMemoria()
+        contadores.cb = ctypes.sizeof(contadores)
+        processo_atual = ctypes.windll.kernel32.GetCurrentProcess
+        processo_atual.restype = wintypes.HANDLE
+        obter_contadores = ctypes.windll.psapi.GetProcessMemoryInfo
+        obter_contadores.argtypes = [wintypes.HANDLE, ctypes.POINTER(ContadoresMemoria), wintypes.DWORD]
+        if not obter_contadores(processo_atual(), ctypes.byref(contadores), contadores.cb):
+            return None
+        return contadores.PeakWorkingSetSize / 1024 ** 2
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é informado em bytes no macOS e em KB nos demais sistemas
+    return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+
+class PerfilamentoExecucao:
+    """
+    Perfil de CPU (cProfile) e de alocações (tracemalloc) de uma execução
+
+    O cProfile mede a thread que inicia o perfilamento; funções executadas em
+    outras threads entram no mesmo perfil se forem envolvidas por perfilar.
+    O tracemalloc é zerado no início de cada etapa do RegistroExecucao; no fim
+    da etapa são guardados o pico e as maiores alocações ainda retidas, de modo
+    que cada etapa só paga pelo que ela mesma alocou.
+    """
+
+    def __init__(self, top_alocacoes=20):
+        """
+        Args:
+            top_alocacoes: alocações listadas por etapa
+        """
+        self.top_alocacoes = top_alocacoes
+        self.perfil = cProfile.Profile()
+        self.perfis_threads = []
+        self.alocacoes = []  # (etapa, pico em bytes, estatísticas das maiores alocações)
+        self._iniciou_tracemalloc = False
+
+    def iniciar(self):
+        """Liga o tracemalloc e o cProfile"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(QUADROS_ALOCACAO)
+            self._iniciou_tracemalloc = True
+        self.perfil.enable()
+
+    def parar(self):
+        """Desliga o cProfile e o tracemalloc (se foi ligado aqui)"""
+        self.perfil.disable()
+        if self._iniciou_tracemalloc:
+            tracemalloc.stop()
+            self._iniciou_tracemalloc = False
+
+    def perfilar(self, funcao):
+        """Envolve uma função que será executada em outra thread para que entre no perfil"""
+        def executar(*args, **kwargs):
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError:
+                # Python 3.12+: o perfil principal já cobre todas as threads
+                return funcao(*args, **kwargs)
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                perfil.disable()
+                self.perfis_threads.append(perfil)
+        return executar
+
+    def inicio_etapa(self):
+        """Zera as alocações rastreadas e o pico no início de uma etapa"""
+        if tracemalloc.is_tracing():
+            tracemalloc.clear_traces()
+
+    def fim_etapa(self, nome):
+        """Registra o pico e as maiores alocações retidas desde o início da etapa"""
+        if not tracemalloc.is_tracing():
+            return
+        _, pico = tracemalloc.get_traced_memory()
+        estatisticas = [
+            estatistica for estatistica in tracemalloc.take_snapshot().statistics('traceback')
+            if estatistica.traceback[-1].filename != tracemalloc.__file__
+        ]
+        self.alocacoes.append((nome, pico, estatisticas[:self.top_alocacoes]))
+
+    @staticmethod
+    def _descrever_alocacao(estatistica):
+        """Linha da alocação e, se for fora do projeto, a linha do projeto que a originou"""
+        quadros = list(reversed(estatistica.traceback))  # do mais recente ao mais antigo
+        alocacao = quadros[0] if quadros else None
+        texto = f"{alocacao.filename}:{alocacao.lineno}" if alocacao else '?'
+        if alocacao and not alocacao.filename.startswith(_DIRETORIO_PROJETO):
+            do_projeto = next((q for q in quadros if q.filename.startswith(_DIRETORIO_PROJETO)), None)
+            if do_projeto is not None:
+                texto += f" (a partir de {os.path.basename(do_projeto.filename)}:{do_projeto.lineno})"
+        return texto
+
+    def salvar(self, diretorio, registro=None):
+        """
+        Grava o perfil do cProfile (.prof) e o relatório de alocações por etapa
+
+        Args:
+            diretorio: diretório de saída
+            registro: RegistroExecucao da mesma execução, para o cabeçalho do relatório
+
+        Returns:
+            list: caminhos dos arquivos gravados
+        """
+        caminho_perfil = os.path.join(diretorio, ARQUIVO_PERFIL)
+        estatisticas = pstats.Stats(self.perfil)
+        for perfil in self.perfis_threads:
+            estatisticas.add(perfil)
+        estatisticas.dump_stats(caminho_perfil)
+
+        caminho_alocacoes = os.path.join(diretorio, ARQUIVO_ALOCACOES)
+        with open(caminho_alocacoes, 'w', encoding='utf-8') as f:
+            f.write("Perfil da execução do relatório\n")
+            if registro is not None:
+                f.write(f"Data: {registro.data_hora.isoformat(timespec='seconds')} | janela: {registro.janela} | "
+                        f"situação: {registro.situacao}\n")
+                f.write(f"Tempo total: {registro.tempo_total:.2f}s\n")
+                pico = registro.pico_memoria
+                f.write(f"Pico de memória (RSS): {'não disponível' if pico is None else f'{pico:.0f} MB'}\n")
+            f.write(f"Perfil de CPU: {ARQUIVO_PERFIL} (abrir com python -m pstats ou snakeviz)\n")
+
+            for nome, pico, alocacoes in self.alocacoes:
+                f.write(f"\n=== {nome} - pico rastreado {pico / 1024 ** 2:.1f} MB ===\n")
+                if not alocacoes:
+                    f.write("  (nenhuma alocação retida)\n")
+                for estatistica in alocacoes:
+                    f.write(f"  {estatistica.size / 1024 ** 2:>9.2f} MB  {estatistica.count:>9} blocos  "
+                            f"{self._descrever_alocacao(estatistica)}\n")
+
+            f.write(f"\n=== Funções com maior tempo acumulado (cProfile) ===\n")
+            estatisticas.stream = f
+            estatisticas.sort_stats('cumulative').print_stats(FUNCOES_RESUMO_PERFIL)
+        return [caminho_perfil, caminho_alocacoes]
+
+
+class MedicaoEtapa:
+    """Medição de uma etapa do processamento"""
+
+    def __init__(self, nome, linhas_entrada=None):
+        """
+        Args:
+            nome: nome da etapa
+            linhas_entrada: linhas recebidas pela etapa, se aplicável
+        """
+        self.nome = nome
+        self.linhas_entrada = linhas_entrada
+        self.linhas_saida = None
+        self.memoria = None  # bytes dos DataFrames produzidos pela etapa
+        self.tempo = 0.0     # tempo de relógio, em segundos
+        self.cpu = 0.0       # tempo de CPU, em segundos
+
+    def como_dict(self):
+        """Medição como dicionário serializável em JSON"""
+        return {
+            'etapa': self.nome,
+            'tempo_s': round(self.tempo, 4),
+            'cpu_s': round(self.cpu, 4),
+            'linhas_entrada': self.linhas_entrada,
+            'linhas_saida': self.linhas_saida,
+            'memoria_mb': None if self.memoria is None else round(self.memoria / 1024 ** 2, 3),
+        }
+
+
+class RegistroExecucao:
+    """
+    Registro das etapas de uma execução do processamento
+
+    As etapas de cálculo são marcadas em sequência com iniciar/finalizar; o
+    tempo de CPU é o do processo principal (trabalho feito em processos de
+    ingestão paralela não entra na conta). Etapas medidas em outra thread ou
+    processo, como os renderizadores, entram prontas com registrar.
+    """
+
+    def __init__(self, janela=None, arquivos=(), perfilamento=None):
+        """
+        Args:
+            janela: chave da janela processada (MANHA, TARDE, NOITE)
+            arquivos: caminhos dos arquivos de entrada
+            perfilamento: PerfilamentoExecucao que recebe o início e o fim de cada etapa
+        """
+        self.janela = janela
+        self.perfilamento = perfilamento
+        self.arquivos = [os.path.basename(arquivo) for arquivo in arquivos]
+        self.data_hora = datetime.now()
+        self.situacao = 'em andamento'
+        self.mensagem = ''
+        self.etapas = []
+        self.tempo_total = 0.0
+        self.pico_memoria = None  # MB, medido ao concluir
+        self.cache = None  # contadores do cache de exportações na ingestão
+
+        self._inicio = time.perf_counter()
+        self._atual = None
+        self._inicio_atual = (0.0, 0.0)
+
+    def iniciar(self, nome, linhas_entrada=None):
+        """Inicia a medição de uma etapa, encerrando a anterior se ainda estiver aberta"""
+        if self._atual is not None:
+            self.finalizar()
+        if self.perfilamento is not None:
+            self.perfilamento.inicio_etapa()
+        self._atual = MedicaoEtapa(nome, linhas_entrada)
+        self._inicio_atual = (time.perf_counter(), time.process_time())
+        return self._atual
+
+    def finalizar(self, linhas_saida=None, memoria=None, linhas_entrada=None):
+        """
+        Encerra a etapa em andamento
+
+        Args:
+            linhas_saida: linhas produzidas pela etapa
+            memoria: memória dos DataFrames produzidos pela etapa, em bytes
+            linhas_entrada: linhas recebidas, quando só são conhecidas ao fim da etapa
+        """
+        medicao = self._atual
+        if medicao is None:
+            return None
+        if linhas_entrada is not None:
+            medicao.linhas_entrada = linhas_entrada
+        inicio, inicio_cpu = self._inicio_atual
+        medicao.tempo = time.perf_counter() - inicio
+        medicao.cpu = time.process_time() - inicio_cpu
+        medicao.linhas_saida = linhas_saida
+        medicao.memoria = memoria
+        self.etapas.append(medicao)
+        self._atual = None
+        if self.perfilamento is not None:
+            self.perfilamento.fim_etapa(medicao.nome)
+        return medicao
+
+    def registrar(self, nome, tempo, cpu, linhas_entrada=None, linhas_saida=None, memoria=None):
+        """Inclui uma etapa medida externamente (por exemplo, em outra thread)"""
+        medicao = MedicaoEtapa(nome, linhas_entrada)
+        medicao.tempo = tempo
+        medicao.cpu = cpu
+        medicao.linhas_saida = linhas_saida
+        medicao.memoria = memoria
+        self.etapas.append(medicao)
+        return medicao
+
+    def registrar_cache(self, contadores):
+        """
+        Guarda os contadores do cache de exportações da execução
+
+        Args:
+            contadores: dict com ativo, acertos, falhas e removidos (CacheExportacoes.contadores)
+        """
+        self.cache = dict(contadores)
+
+    def concluir(self, situacao, mensagem=''):
+        """
+        Encerra o registro
+
+        Args:
+            situacao: 'concluido', 'cancelado' ou 'erro'
+            mensagem: detalhe do cancelamento ou do erro
+        """
+        if self._atual is not None:
+            self.finalizar()
+        self.situacao = situacao
+        self.mensagem = mensagem
+        self.tempo_total = time.perf_counter() - self._inicio
+        self.pico_memoria = pico_memoria_mb()
+
+    def como_dict(self):
+        """Registro como dicionário serializável em JSON"""
+        return {
+            'versao': VERSAO_REGISTRO,
+            'data_hora': self.data_hora.isoformat(timespec='seconds'),
+            'janela': self.janela,
+            'arquivos': self.arquivos,
+            'situacao': self.situacao,
+            'mensagem': self.mensagem,
+            'tempo_total_s': round(self.tempo_total, 4),
+            'pico_memoria_mb': None if self.pico_memoria is None else round(self.pico_memoria, 1),
+            'cache_exportacoes': self.cache,
+            'etapas': [medicao.como_dict() for medicao in self.etapas],
+        }
+
+    def salvar(self, diretorio):
+        """
+        Grava o registro em JSON no diretório informado
+
+        Returns:
+            str: caminho do arquivo gravado
+        """
+        caminho = os.path.join(diretorio, ARQUIVO_REGISTRO)
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(self.como_dict(), f, ensure_ascii=False, indent=2)
+        return caminho
+
+    def linhas_texto(self):
+        """Linhas de texto com uma etapa por linha, para o console"""
+        def numero(valor):
+            return '-' if valor is None else f'{valor:,}'.replace(',', '.')
+
+        linhas = [f"{'Etapa':<32} {'Tempo':>8} {'CPU':>8} {'Entrada':>12} {'Saída':>12} {'MB':>9}"]
+        for medicao in self.etapas:
+            memoria = '-' if medicao.memoria is None else f'{medicao.memoria / 1024 ** 2:.1f}'
+            linhas.append(
+                f"{medicao.nome:<32} {medicao.tempo:>7.2f}s {medicao.cpu:>7.2f}s "
+                f"{numero(medicao.linhas_entrada):>12} {numero(medicao.linhas_saida):>12} {memoria:>9}"
+            )
+        return linhas + self.linhas_resumo()
+
+    def linhas_resumo(self):
+        """Linhas de texto com o cache de exportações e o total da execução"""
+        linhas = []
+        if self.cache is not None:
+            if self.cache['ativo']:
+                linhas.append(f"Cache de exportações: {self.cache['acertos']} acerto(s), {self.cache['falhas']} "
+                              f"falha(s), {self.cache['removidos']} removido(s)")
+            else:
+                linhas.append("Cache de exportações: inativo")
+        pico = '' if self.pico_memoria is None else f", pico de memória {self.pico_memoria:.0f} MB"
+        linhas.append(f"Total: {self.tempo_total:.2f}s ({self.situacao}){pico}")
+        return linhas
@@ -0,0 +1,114 @@
+"""
+Modelo do relatório de expedição
+Resultado compacto e imutável da etapa de cálculo: as tabelas do relatório
+(guardadas como um array por coluna), a descrição da janela e os gráficos.
+CSV, PDF, Excel e email são gerados a partir deste modelo, que pode ser
+serializado com pickle e reutilizado sem refazer o processamento.
+"""
+
+from dataclasses import dataclass, fields
+import pandas as pd
+
+
+class _Imutavel:
+    """Suporte a pickle para dataclasses congeladas com __slots__"""
+
+    __slots__ = ()
+
+    def __getstate__(self):
+        return tuple(getattr(self, campo.name) for campo in fields(self))
+
+    def __setstate__(self, estado):
+        for campo, valor in zip(fields(self), estado):
+            object.__setattr__(self, campo.name, valor)
+
+
+@dataclass(frozen=True)
+class TabelaRelatorio(_Imutavel):
+    """Tabela do relatório: nomes das colunas e um array (somente leitura) por coluna"""
+
+    __slots__ = ('colunas', 'valores')
+
+    colunas: tuple
+    valores: tuple
+
+    @classmethod
+    def de_df(cls, df):
+        """Cria a tabela a partir de um DataFrame, preservando o dtype de cada coluna"""
+        valores = []
+        for coluna in df.columns:
+            array = df[coluna].to_numpy(copy=True)
+            array.flags.writeable = False
+            valores.append(array)
+        return cls(tuple(df.columns), tuple(valores))
+
+    @property
+    def linhas(self):
+        """Quantidade de linhas da tabela"""
+        return len(self.valores[0]) if self.valores else 0
+
+    def df(self):
+        """DataFrame com os dados da tabela (uma cópia, que pode ser modificada)"""
+        return pd.DataFrame(
+            {coluna: array.copy() for coluna, array in zip(self.colunas, self.valores)},
+            columns=list(self.colunas)
+        )
+
+
+# Campos de RelatorioExpedicao que são tabelas, na ordem em que aparecem no relatório
+TABELAS_RELATORIO = (
+    'resumo', 'rotas_por_agencia', 'rotas_por_veiculo',
+    'expedidos_por_hora', 'metricas_operador', 'rotas_nao_conferidas',
+)
+
+
+@dataclass(frozen=True)
+class RelatorioExpedicao(_Imutavel):
+    """Resultado do processamento de uma janela de expedição"""
+
+    __slots__ = (
+        'janela', 'descricao_janela', 'resumo', 'rotas_por_agencia', 'rotas_por_veiculo',
+        'expedidos_por_hora', 'metricas_operador', 'rotas_nao_conferidas', 'graficos',
+    )
+
+    janela: str                           # chave da janela (MANHA, TARDE, NOITE)
+    descricao_janela: str                 # texto exibido no cabeçalho do PDF e no email
+    resumo: TabelaRelatorio               # Métrica / Valor
+    rotas_por_agencia: TabelaRelatorio
+    rotas_por_veiculo: TabelaRelatorio
+    expedidos_por_hora: TabelaRelatorio
+    metricas_operador: TabelaRelatorio
+    rotas_nao_conferidas: TabelaRelatorio
+    graficos: tuple                       # imagens PNG (bytes) dos gráficos hora a hora
+
+    def tabelas(self):
+        """
+        Tabelas do relatório por nome, na ordem em que aparecem no relatório
+
+        Returns:
+            dict: nome do campo -> TabelaRelatorio
+        """
+        return {nome: getattr(self, nome) for nome in TABELAS_RELATORIO}
+
+    def dataframes(self):
+        """
+        DataFrames das tabelas, na ordem em que aparecem no relatório
+
+        Returns:
+            tuple: (resumo, rotas por transportadora, rotas por tipo de veículo,
+                hora a hora, métricas por operador, rotas no piso)
+        """
+        return (
+            self.resumo.df(),
+            self.rotas_por_agencia.df(),
+            self.rotas_por_veiculo.df(),
+            self.expedidos_por_hora.df(),
+            self.metricas_operador.df(),
+            self.rotas_nao_conferidas.df(),
+        )
+
+    def metricas(self):
+        """Métricas gerais como dicionário Métrica -> Valor"""
+        if not self.resumo.linhas:
+            return {}
+        return dict(zip(*self.resumo.valores))
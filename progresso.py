@@ -0,0 +1,90 @@
+"""
+Progresso e cancelamento do processamento de relatórios
+O processamento informa cada etapa (nome, fração concluída e tempo decorrido)
+a um callback e verifica um token de cancelamento entre as etapas. Não
+depende de pandas nem da interface, para ser importado por ambos sem custo.
+"""
+
+import threading
+import time
+
+# Etapas do processamento, na ordem, com o peso relativo de cada uma na barra de progresso
+ETAPAS_RELATORIO = (
+    ('Lendo conferência', 1),
+    ('Lendo expedição', 4),
+    ('Calculando métricas', 2),
+    ('Gerando gráficos', 1),
+    ('Gerando arquivos', 3),
+)
+
+ETAPA_CONCLUIDA = 'Concluído'
+
+
+class ProcessamentoCancelado(Exception):
+    """Processamento interrompido a pedido do usuário"""
+
+
+class TokenCancelamento:
+    """Sinaliza, de qualquer thread, que o processamento deve parar na próxima etapa"""
+
+    def __init__(self):
+        self._evento = threading.Event()
+
+    def cancelar(self):
+        """Pede o cancelamento; o processamento para ao chegar na próxima etapa"""
+        self._evento.set()
+
+    @property
+    def cancelado(self):
+        """True se o cancelamento já foi pedido"""
+        return self._evento.is_set()
+
+    def verificar(self):
+        """Lança ProcessamentoCancelado se o cancelamento foi pedido"""
+        if self.cancelado:
+            raise ProcessamentoCancelado("Processamento cancelado pelo usuário")
+
+
+class ProgressoRelatorio:
+    """Acompanha as etapas do processamento e as informa ao callback"""
+
+    def __init__(self, callback=None, cancelamento=None, etapas=ETAPAS_RELATORIO):
+        """
+        Args:
+            callback: função (etapa, fração de 0 a 1, segundos decorridos) ou None
+            cancelamento: TokenCancelamento verificado a cada etapa, ou None
+            etapas: sequência de (nome da etapa, peso)
+        """
+        self.callback = callback
+        self.cancelamento = cancelamento
+        self.inicio = time.perf_counter()
+
+        total = sum(peso for _, peso in etapas)
+        self._faixas = {}
+        acumulado = 0
+        for nome, peso in etapas:
+            self._faixas[nome] = (acumulado / total, peso / total)
+            acumulado += peso
+
+    def etapa(self, nome, fracao_etapa=0.0, verificar_cancelamento=True):
+        """
+        Informa o andamento de uma etapa
+
+        Args:
+            nome: nome da etapa (um dos nomes de ETAPAS_RELATORIO)
+            fracao_etapa: parte da etapa já concluída (0 = início, 1 = fim)
+            verificar_cancelamento: se True, lança ProcessamentoCancelado
+                quando o cancelamento foi pedido
+        """
+        if verificar_cancelamento and self.cancelamento is not None:
+            self.cancelamento.verificar()
+        inicio, largura = self._faixas[nome]
+        self._informar(nome, inicio + largura * min(1.0, fracao_etapa))
+
+    def concluir(self):
+        """Informa o fim do processamento"""
+        self._informar(ETAPA_CONCLUIDA, 1.0)
+
+    def _informar(self, nome, fracao):
+        if self.callback is not None:
+            self.callback(nome, fracao, time.perf_counter() - self.inicio)
@@ -0,0 +1,536 @@
+"""
+Redução das exportações de expedição (assignment) aos fatos por rota
+O relatório só precisa, de cada Task ID, da primeira ocorrência (transportadora,
+motorista, status, veículo e Delivery Date) e da quantidade de pacotes
+distintos. Arquivos grandes são lidos em blocos e cada bloco é reduzido assim
+que é lido; o índice de pacotes distintos passa para o disco quando excede a
+sua parte do teto, de modo que o pico de memória fica abaixo do teto
+configurado independentemente do tamanho da entrada. Vários arquivos podem
+ser reduzidos em paralelo, um por processo.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+from env_config import get_env_config
+from cache_exportacoes import get_cache_exportacoes
+from esquemas import ESQUEMA_EXPEDICAO, LINHAS_AMOSTRA_MEMORIA, memoria_df, estimar_memoria_sem_projecao
+from ingestao import (ArquivoCarregado, carregar_expedicao, ler_csv_em_blocos, mensagem_erro_leitura,
+                      validar_df_expedicao, verificar_cancelamento, get_arquivos_validados)
+from progresso import ProcessamentoCancelado
+
+# Fração do teto de memória destinada ao bloco em leitura; o restante cobre a
+# tipagem do bloco e os fatos por rota já acumulados
+FRACAO_BLOCO = 0.25
+
+# Fração do teto para o índice de pares (rota, pacote) em memória; acima dela
+# o índice é gravado no disco, particionado pelo hash do par. A consolidação
+# dos pendentes usa algumas cópias temporárias do índice
+FRACAO_PARES = 0.1
+
+# Fração do teto para a primeira ocorrência de cada rota, que não vai para o disco
+FRACAO_ROTAS = 0.4
+
+# Partições do índice em disco por nível (4 bits do hash); partições maiores
+# que a fração do teto são divididas de novo pelos 4 bits seguintes
+PARTICOES_PARES = 16
+BITS_PARTICAO = 4
+NIVEIS_PARTICAO = 64 // BITS_PARTICAO
+
+# Cada par ocupa dois uint64: hash do par e hash da rota
+BYTES_POR_PAR = 16
+
+# Proporção aproximada entre a memória ocupada por um CSV lido como texto e o
+# seu tamanho em disco
+FATOR_EXPANSAO_CSV = 4
+
+LINHAS_MINIMAS_BLOCO = 10000
+
+COLUNA_PACOTES = 'Pacotes Expedição'
+
+
+def _hash(df):
+    """Hash 64 bits por linha, estável entre blocos e arquivos"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _pertence(valores, ordenados):
+    """Máscara dos valores presentes no array ordenado (busca binária)"""
+    posicoes = np.searchsorted(ordenados, valores)
+    presentes = posicoes < len(ordenados)
+    presentes[presentes] = ordenados[posicoes[presentes]] == valores[presentes]
+    return presentes
+
+
+def _inserir(ordenados, novos):
+    """Insere valores ordenados e ausentes no array ordenado, mantendo a ordem"""
+    return np.insert(ordenados, np.searchsorted(ordenados, novos), novos)
+
+
+def _gravar_particoes(diretorio, pares, rotas, nivel):
+    """Acrescenta os pares ao arquivo da partição de cada um (BITS_PARTICAO bits do hash no nível)"""
+    deslocamento = np.uint64(64 - BITS_PARTICAO * (nivel + 1))
+    chaves = (pares >> deslocamento) & np.uint64(PARTICOES_PARES - 1)
+    ordem = np.argsort(chaves, kind='stable')
+    limites = np.cumsum(np.bincount(chaves.astype(np.intp), minlength=PARTICOES_PARES))
+    registros = np.column_stack((pares[ordem], rotas[ordem]))
+    inicio = 0
+    for particao, fim in enumerate(limites):
+        if fim > inicio:
+            with open(_arquivo_particao(diretorio, particao), 'ab') as f:
+                registros[inicio:fim].tofile(f)
+        inicio = fim
+
+
+def _arquivo_particao(diretorio, particao):
+    return os.path.join(diretorio, f'particao_{particao:02}.bin')
+
+
+class LimiteMemoriaExcedido(MemoryError):
+    """Os fatos por rota não cabem no teto de memória (LIMITE_MEMORIA_MB)"""
+
+
+class ReducaoExpedicao:
+    """
+    Acumula os fatos por Task ID de um ou mais arquivos de expedição
+
+    A primeira ocorrência de cada rota é mantida na ordem de leitura (arquivos
+    e blocos). Os pacotes distintos são contados pelo hash de 64 bits de cada
+    par (rota, pacote), guardado uma única vez junto com o hash da rota, o que
+    também permite combinar reduções feitas em paralelo. Dois pares diferentes
+    só seriam contados como um em uma colisão do hash (probabilidade da ordem
+    de n²/2⁶⁵ para n pares).
+
+    Os pares novos de cada bloco ficam pendentes e são incorporados ao índice
+    ordenado de uma só vez (ordenação) quando somam tanto quanto o índice, de
+    modo que cada par é copiado um número logarítmico de vezes.
+
+    O teto de memória limita o bloco em leitura (FRACAO_BLOCO), o índice de
+    pares em memória (FRACAO_PARES) e as primeiras ocorrências (FRACAO_ROTAS).
+    Quando o índice passa da sua fração, ele é gravado em um diretório
+    temporário, particionado pelo hash do par; os pares seguintes vão para as
+    partições sem deduplicação, e no resultado cada partição é deduplicada e
+    contada separadamente (as grandes demais são particionadas de novo). Se as
+    primeiras ocorrências passarem da sua fração, LimiteMemoriaExcedido é
+    lançada.
+    """
+
+    def __init__(self, limite_mb=None):
+        """
+        Args:
+            limite_mb: teto de memória para a leitura; padrão LIMITE_MEMORIA_MB do .env
+        """
+        if limite_mb is None:
+            limite_mb = get_env_config().get_int('LIMITE_MEMORIA_MB', 1024)
+        self.limite_bytes = limite_mb * 1024 * 1024
+        self.linhas = 0
+
+        self._primeiras = []
+        self._memoria_primeiras = 0
+        self._rotas_conhecidas = np.empty(0, dtype=np.uint64)
+        self._pares_conhecidos = np.empty(0, dtype=np.uint64)
+        self._rotas_dos_pares = np.empty(0, dtype=np.uint64)
+        self._pares_pendentes = []  # (pares, rotas) de cada bloco, ainda fora do índice
+        self._tamanho_pendentes = 0
+        self._diretorio = None  # partições do índice de pares em disco
+        self._finalizador = None
+
+    def __getstate__(self):
+        # O diretório em disco passa a pertencer à cópia (redução feita em outro processo)
+        estado = self.__dict__.copy()
+        if self._finalizador is not None:
+            self._finalizador.detach()
+        estado['_finalizador'] = None
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        if self._diretorio is not None:
+            self._finalizador = weakref.finalize(self, shutil.rmtree, self._diretorio, True)
+
+    def descartar(self):
+        """Apaga as partições do índice em disco"""
+        if self._finalizador is not None:
+            self._finalizador()
+
+    # ===== Acúmulo =====
+
+    def adicionar(self, df, esquema=None):
+        """
+        Reduz um bloco (ou um arquivo inteiro) aos fatos por rota
+
+        Args:
+            df: linhas do assignment
+            esquema: se informado, os tipos do esquema são aplicados apenas às
+                linhas mantidas (o bloco foi lido como texto)
+        """
+        if df.empty:
+            return
+        self.linhas += len(df)
+        rotas = _hash(df['Task ID'])
+
+        # Apenas rotas ainda não vistas em blocos anteriores
+        novas = ~_pertence(rotas, self._rotas_conhecidas)
+        if novas.any():
+            primeiras = df[novas].drop_duplicates(subset=['Task ID'])
+            if esquema is not None:
+                primeiras = esquema.aplicar_tipos(primeiras.copy())
+            self._guardar_primeiras(primeiras)
+            self._rotas_conhecidas = _inserir(self._rotas_conhecidas, np.unique(rotas[novas]))
+
+        # Pares (rota, pacote) ainda não vistos somam na contagem da rota
+        pares, posicoes = np.unique(_hash(df[['Task ID', 'SPX tracking num']]), return_index=True)
+        novos = ~_pertence(pares, self._pares_conhecidos)
+        self._incluir_pares(pares[novos], rotas[posicoes[novos]])
+        self._verificar_limite()
+
+    def _guardar_primeiras(self, primeiras):
+        self._primeiras.append(primeiras)
+        self._memoria_primeiras += memoria_df(primeiras)
+
+    def _incluir_pares(self, pares, rotas):
+        """Guarda pares (rota, pacote) ainda fora do índice, com a rota de cada um"""
+        if len(pares) == 0:
+            return
+        self._pares_pendentes.append((pares, rotas))
+        self._tamanho_pendentes += len(pares)
+        if self._diretorio is not None:
+            if self._tamanho_pendentes * BYTES_POR_PAR > self.limite_bytes * FRACAO_PARES:
+                self._despejar_pares()
+        elif self._tamanho_pendentes >= len(self._pares_conhecidos):
+            self._consolidar_pares()
+            if len(self._pares_conhecidos) * BYTES_POR_PAR > self.limite_bytes * FRACAO_PARES:
+                self._despejar_pares()
+
+    def _consolidar_pares(self):
+        """Incorpora os pares pendentes ao índice ordenado, descartando repetidos"""
+        if not self._pares_pendentes:
+            return
+        pares = np.concatenate([self._pares_conhecidos] + [p for p, _ in self._pares_pendentes])
+        rotas = np.concatenate([self._rotas_dos_pares] + [r for _, r in self._pares_pendentes])
+        self._pares_pendentes = []
+        self._tamanho_pendentes = 0
+        # O hash do par inclui a rota: pares iguais têm sempre a mesma rota
+        self._pares_conhecidos, posicoes = np.unique(pares, return_index=True)
+        self._rotas_dos_pares = rotas[posicoes]
+
+    def _despejar_pares(self):
+        """Grava o índice de pares e os pendentes nas partições em disco, liberando a memória"""
+        if self._diretorio is None:
+            self._diretorio = tempfile.mkdtemp(prefix='reducao_expedicao_')
+            self._finalizador = weakref.finalize(self, shutil.rmtree, self._diretorio, True)
+        # Pares repetidos entre os pendentes são descartados antes da gravação
+        self._consolidar_pares()
+        if len(self._pares_conhecidos):
+            _gravar_particoes(self._diretorio, self._pares_conhecidos, self._rotas_dos_pares, 0)
+        self._pares_conhecidos = np.empty(0, dtype=np.uint64)
+        self._rotas_dos_pares = np.empty(0, dtype=np.uint64)
+
+    def _verificar_limite(self):
+        """Lança LimiteMemoriaExcedido se as primeiras ocorrências não cabem na sua fração do teto"""
+        memoria = self._memoria_primeiras + self._rotas_conhecidas.nbytes
+        if memoria > self.limite_bytes * FRACAO_ROTAS:
+            raise LimiteMemoriaExcedido(
+                f"Os dados de {len(self._rotas_conhecidas)} rotas ocupam {memoria / 1024 ** 2:.0f} MB, acima de "
+                f"{FRACAO_ROTAS:.0%} do teto de {self.limite_bytes / 1024 ** 2:.0f} MB (LIMITE_MEMORIA_MB); "
+                f"aumente o teto no .env"
+            )
+
+    def combinar(self, outra):
+        """
+        Acrescenta os fatos de outra redução, como se os arquivos dela tivessem
+        sido lidos depois dos já adicionados a esta
+        """
+        self.linhas += outra.linhas
+
+        novas_rotas = []
+        for primeiras in outra._primeiras:
+            rotas = _hash(primeiras['Task ID'])
+            novas = ~_pertence(rotas, self._rotas_conhecidas)
+            if novas.any():
+                self._guardar_primeiras(primeiras[novas])
+                novas_rotas.append(rotas[novas])
+        if novas_rotas:
+            self._rotas_conhecidas = _inserir(self._rotas_conhecidas, np.unique(np.concatenate(novas_rotas)))
+
+        if outra._diretorio is not None:
+            # Partições em disco: as da outra redução são acrescentadas às desta
+            outra._despejar_pares()
+            if self._diretorio is None:
+                self._despejar_pares()
+            for particao in range(PARTICOES_PARES):
+                origem = _arquivo_particao(outra._diretorio, particao)
+                if os.path.exists(origem):
+                    with open(origem, 'rb') as entrada, \
+                            open(_arquivo_particao(self._diretorio, particao), 'ab') as saida:
+                        shutil.copyfileobj(entrada, saida)
+            outra.descartar()
+        else:
+            outra._consolidar_pares()
+            novos = ~_pertence(outra._pares_conhecidos, self._pares_conhecidos)
+            self._incluir_pares(outra._pares_conhecidos[novos], outra._rotas_dos_pares[novos])
+        self._verificar_limite()
+
+    def memoria(self):
+        """Memória ocupada pelos fatos acumulados (incluindo os pares pendentes), em bytes"""
+        return (
+            self._memoria_primeiras +
+            self._rotas_conhecidas.nbytes +
+            self._pares_conhecidos.nbytes +
+            self._rotas_dos_pares.nbytes +
+            sum(pares.nbytes + rotas.nbytes for pares, rotas in self._pares_pendentes)
+        )
+
+    # ===== Leitura de arquivos =====
+
+    def linhas_por_bloco(self, arquivo):
+        """Tamanho do bloco de leitura que mantém o bloco dentro da sua fração do teto"""
+        blocos = ler_csv_em_blocos(arquivo, ESQUEMA_EXPEDICAO, LINHAS_AMOSTRA_MEMORIA)
+        try:
+            amostra = next(blocos, None)
+        finally:
+            blocos.close()
+        if amostra is None or amostra.empty:
+            return LINHAS_MINIMAS_BLOCO
+        bytes_por_linha = memoria_df(amostra) / len(amostra)
+        return max(LINHAS_MINIMAS_BLOCO, int(self.limite_bytes * FRACAO_BLOCO / bytes_por_linha))
+
+    def adicionar_arquivo(self, arquivo, cancelado=None):
+        """
+        Lê, valida e reduz um arquivo de expedição
+
+        Arquivos que cabem folgadamente no teto de memória passam pela ingestão
+        normal (incluindo o cache de exportações); os demais são lidos em blocos.
+        Se cancelado (Event) for sinalizado, a leitura para no bloco seguinte
+        com ProcessamentoCancelado.
+
+        Returns:
+            ArquivoCarregado com o resultado da validação; o DataFrame não é
+            mantido, apenas os fatos por rota acumulados nesta redução
+        """
+        try:
+            tamanho = os.path.getsize(arquivo)
+        except OSError as e:
+            return ArquivoCarregado(arquivo, mensagem=mensagem_erro_leitura(e))
+
+        if tamanho * FATOR_EXPANSAO_CSV <= self.limite_bytes * FRACAO_BLOCO:
+            expedicao = carregar_expedicao(arquivo, cancelado)
+            if expedicao.valido:
+                self.adicionar(expedicao.df)
+            expedicao.liberar_df()
+            return expedicao
+
+        return self._adicionar_em_blocos(arquivo, cancelado)
+
+    def _adicionar_em_blocos(self, arquivo, cancelado=None):
+        inicio = time.perf_counter()
+        linhas_antes = self.linhas
+        try:
+            for i, bloco in enumerate(ler_csv_em_blocos(arquivo, ESQUEMA_EXPEDICAO, self.linhas_por_bloco(arquivo))):
+                verificar_cancelamento(cancelado)
+                if i == 0:
+                    valido, mensagem = validar_df_expedicao(bloco)
+                    if not valido:
+                        return ArquivoCarregado(arquivo, mensagem=mensagem)
+                self.adicionar(bloco, ESQUEMA_EXPEDICAO)
+        except ProcessamentoCancelado:
+            raise
+        except Exception as e:
+            return ArquivoCarregado(arquivo, mensagem=mensagem_erro_leitura(e))
+
+        linhas = self.linhas - linhas_antes
+        if linhas == 0:
+            return ArquivoCarregado(arquivo, mensagem="O arquivo está vazio")
+
+        memoria = self.memoria()
+        try:
+            memoria_economizada = max(0, estimar_memoria_sem_projecao(arquivo, linhas) - memoria)
+        except Exception:
+            memoria_economizada = 0
+
+        return ArquivoCarregado(arquivo, tempo_leitura=time.perf_counter() - inicio, valido=True,
+                                mensagem="Arquivo válido", memoria=memoria,
+                                memoria_economizada=memoria_economizada, linhas=linhas, em_blocos=True)
+
+    # ===== Resultado =====
+
+    def resultado(self):
+        """
+        Fatos por rota de todos os arquivos adicionados
+
+        Returns:
+            DataFrame com uma linha por Task ID (primeira ocorrência) e a
+            coluna 'Pacotes Expedição' com a quantidade de pacotes distintos
+        """
+        if not self._primeiras:
+            return pd.DataFrame(columns=list(ESQUEMA_EXPEDICAO.tipos()) + [COLUNA_PACOTES])
+
+        if self._diretorio is None:
+            self._consolidar_pares()
+            rotas, pacotes = np.unique(self._rotas_dos_pares, return_counts=True)
+            pacotes_por_rota = pd.Series(pacotes, index=rotas)
+        else:
+            self._despejar_pares()
+            contagens = []
+            for particao in range(PARTICOES_PARES):
+                caminho = _arquivo_particao(self._diretorio, particao)
+                if os.path.exists(caminho):
+                    contagens.extend(self._contar_particao(caminho, 1))
+            # Cada par está em uma única partição: as contagens de cada rota se somam
+            pacotes_por_rota = pd.concat(contagens).groupby(level=0).sum()
+
+        primeiras = pd.concat(self._primeiras, ignore_index=True)
+        primeiras[COLUNA_PACOTES] = (
+            pacotes_por_rota.reindex(_hash(primeiras['Task ID'])).fillna(0).astype(int).to_numpy()
+        )
+        return primeiras
+
+    def _contar_particao(self, caminho, nivel):
+        """
+        Pacotes distintos por rota em uma partição do índice em disco
+
+        Partições maiores que a fração do teto para os pares são divididas
+        pelos bits seguintes do hash e contadas parte a parte.
+
+        Returns:
+            list de Series (contagem por hash da rota)
+        """
+        orcamento = self.limite_bytes * FRACAO_PARES
+        if os.path.getsize(caminho) > orcamento and nivel < NIVEIS_PARTICAO:
+            subdiretorio = caminho + '.partes'
+            os.makedirs(subdiretorio, exist_ok=True)
+            try:
+                registros_por_leitura = max(1, int(orcamento // BYTES_POR_PAR))
+                with open(caminho, 'rb') as f:
+                    while True:
+                        registros = np.fromfile(f, dtype=np.uint64, count=2 * registros_por_leitura).reshape(-1, 2)
+                        if len(registros) == 0:
+                            break
+                        _gravar_particoes(subdiretorio, registros[:, 0], registros[:, 1], nivel)
+                contagens = []
+                for particao in range(PARTICOES_PARES):
+                    parte = _arquivo_particao(subdiretorio, particao)
+                    if os.path.exists(parte):
+                        contagens.extend(self._contar_particao(parte, nivel + 1))
+                return contagens
+            finally:
+                shutil.rmtree(subdiretorio, ignore_errors=True)
+
+        registros = np.fromfile(caminho, dtype=np.uint64).reshape(-1, 2)
+        _, posicoes = np.unique(registros[:, 0], return_index=True)
+        rotas, pacotes = np.unique(registros[posicoes, 1], return_counts=True)
+        return [pd.Series(pacotes, index=rotas)]
+
+
+def _reduzir_arquivo(arquivo, limite_mb):
+    """Reduz um único arquivo; executado nos processos do pool de ingestão"""
+    cache = get_cache_exportacoes()
+    cache.reiniciar_contadores()
+    reducao = ReducaoExpedicao(limite_mb)
+    expedicao = reducao.adicionar_arquivo(arquivo)
+    return expedicao, reducao, (cache.acertos, cache.falhas, cache.removidos)
+
+
+def processos_ingestao(quantidade_arquivos):
+    """
+    Quantidade de processos usados na ingestão dos arquivos de expedição
+
+    PROCESSOS_INGESTAO no .env define o máximo (0 = número de núcleos). O
+    executável gerado pelo PyInstaller sempre processa em série.
+    """
+    if getattr(sys, 'frozen', False):
+        return 1
+    processos = get_env_config().get_int('PROCESSOS_INGESTAO', 0) or os.cpu_count() or 1
+    return max(1, min(processos, quantidade_arquivos))
+
+
+def validar_e_reduzir_expedicao(arquivo, limite_mb=None, cancelado=None):
+    """
+    Validação completa de um arquivo de expedição, guardando a redução
+
+    A redução do arquivo fica guardada (get_arquivos_validados) e é usada por
+    reduzir_expedicoes no lugar de uma nova leitura, enquanto o arquivo não mudar.
+    Se cancelado (Event) for sinalizado, para entre blocos com ProcessamentoCancelado.
+
+    Returns:
+        ArquivoCarregado com o resultado da validação
+    """
+    reducao = ReducaoExpedicao(limite_mb)
+    expedicao = reducao.adicionar_arquivo(arquivo, cancelado)
+    if expedicao.valido:
+        get_arquivos_validados().guardar('expedicao', arquivo, (expedicao, reducao))
+    return expedicao
+
+
+def _reduzir_em_paralelo(arquivos, processos, limite_mb, prontos):
+    cache = get_cache_exportacoes()
+    reducao = ReducaoExpedicao(limite_mb)
+    expedicoes = []
+    pendentes = [arquivo for arquivo in arquivos if arquivo not in prontos]
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        # map entrega os resultados na ordem dos arquivos
+        resultados = pool.map(_reduzir_arquivo, pendentes, [limite_mb] * len(pendentes))
+        for arquivo in arquivos:
+            if arquivo in prontos:
+                expedicao, parcial = prontos[arquivo]
+            else:
+                expedicao, parcial, contadores = next(resultados)
+                cache.somar_contadores(*contadores)
+            reducao.combinar(parcial)
+            expedicoes.append(expedicao)
+    return reducao, expedicoes
+
+
+def reduzir_expedicoes(arquivos, processos=None, limite_mb=None):
+    """
+    Lê, valida e reduz os arquivos de expedição, em paralelo quando possível
+
+    Cada processo reduz um arquivo aos fatos por rota e o processo principal
+    combina os resultados na ordem dos arquivos, de modo que o resultado é o
+    mesmo do processamento em série. O teto de memória é dividido entre os
+    processos. Arquivos já reduzidos pela validação completa
+    (validar_e_reduzir_expedicao) não são lidos de novo.
+
+    Args:
+        arquivos: caminhos dos CSVs de expedição
+        processos: quantidade de processos (padrão: processos_ingestao)
+        limite_mb: teto de memória total (padrão: LIMITE_MEMORIA_MB do .env)
+
+    Returns:
+        tuple: (ReducaoExpedicao combinada, lista de ArquivoCarregado na ordem dos arquivos)
+    """
+    validados = get_arquivos_validados()
+    prontos = {}
+    for arquivo in arquivos:
+        guardado = validados.retirar('expedicao', arquivo)
+        if guardado is not None:
+            prontos[arquivo] = guardado
+
+    if processos is None:
+        processos = processos_ingestao(len(arquivos) - len(prontos))
+    if limite_mb is None:
+        limite_mb = get_env_config().get_int('LIMITE_MEMORIA_MB', 1024)
+
+    if processos > 1:
+        try:
+            return _reduzir_em_paralelo(arquivos, processos, max(1, limite_mb // processos), prontos)
+        except (OSError, BrokenProcessPool) as e:
+            print(f"Aviso: ingestão paralela indisponível, processando em série: {str(e)}")
+
+    reducao = ReducaoExpedicao(limite_mb)
+    expedicoes = []
+    for arquivo in arquivos:
+        if arquivo in prontos:
+            expedicao, parcial = prontos[arquivo]
+            reducao.combinar(parcial)
+        else:
+            expedicao = reducao.adicionar_arquivo(arquivo)
+        expedicoes.append(expedicao)
+    return reducao, expedicoes
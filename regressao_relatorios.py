@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+Verificação de regressão do processamento de relatórios
+Processa as mesmas exportações sintéticas (mais de um arquivo de expedição)
+pelo caminho padrão de main e pelos caminhos alternativos (ingestão em série,
+ingestão paralela, leitura em blocos, cache de exportações), compara célula a
+célula todas as tabelas do relatório entre si e as planilhas do Excel com as
+geradas pela implementação de referência (a versão anterior às otimizações),
+gravadas na base. Os tempos das etapas e o pico de memória do caminho padrão
+são comparados com a base, dentro da tolerância. Termina com código 1 se
+qualquer verificação falhar, inclusive se a base não existir.
+
+A base só é gravada com --atualizar-base: as planilhas esperadas de cada
+tamanho são geradas uma vez pela revisão de referência (git archive) e
+mantidas nas atualizações seguintes, que só renovam tempos e memória.
+
+Uso:
+    python regressao_relatorios.py --atualizar-base
+    python regressao_relatorios.py
+    python regressao_relatorios.py --tamanhos 10000 100000 --tolerancia 0.3
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+from datetime import datetime
+
+BASE_PADRAO = 'regressao_base.json'
+VERSAO_BASE = 2
+
+# Implementação de referência das saídas esperadas: o primeiro commit do
+# repositório, anterior a todas as otimizações do processamento
+REVISAO_REFERENCIA = '8ad2cf83d07a31db582933745c5344dc2192a529'
+
+TAMANHOS_REGRESSAO = (10000, 100000)
+
+# Arquivos de expedição de cada conjunto sintético (mais de um, para que a
+# ingestão paralela e a combinação das reduções sejam exercitadas)
+ARQUIVOS_REGRESSAO = 2
+
+# Dia fixo da operação sintética, para que as saídas de referência não mudem com a data
+DATA_BASE_SINTETICA = '2025-01-15'
+
+# Caminhos de processamento comparados: nome -> variáveis de ambiente aplicadas.
+# O primeiro é o caminho padrão, referência para os demais e para os tempos.
+VARIANTES = {
+    'padrao': {},
+    'serie': {'PROCESSOS_INGESTAO': '1'},
+    'paralelo': {'PROCESSOS_INGESTAO': str(ARQUIVOS_REGRESSAO)},
+    'blocos': {'LIMITE_MEMORIA_MB': '4'},
+    'cache': {'CACHE_EXPORTACOES': 'true'},
+}
+
+# Variantes processadas duas vezes no mesmo processo (a segunda é a comparada)
+VARIANTES_AQUECIDAS = ('cache',)
+
+# Variantes que precisam ter usado mais de um processo na ingestão
+VARIANTES_PARALELAS = ('paralelo',)
+
+# Aviso impresso por reduzir_expedicoes quando o pool de processos falha
+AVISO_INGESTAO_EM_SERIE = 'ingestão paralela indisponível'
+
+# Diferenças de tempo abaixo deste valor não contam como regressão (ruído de medição)
+FOLGA_TEMPO_S = 0.1
+
+# Diferenças exibidas por tabela
+DIFERENCAS_EXIBIDAS = 10
+
+# Tabelas cuja ordem das linhas não é definida (rotas vêm de um set): comparadas
+# como conjunto de linhas, com a linha de total mantida no fim
+TABELAS_SEM_ORDEM = ('rotas_nao_conferidas', 'Rotas NS')
+
+# Excel gerado pelo main (mesmo nome na implementação de referência)
+ARQUIVO_XLSX = 'relatorio_expedicao.xlsx'
+
+
+def _celula(valor):
+    """Valor de uma célula em tipo nativo do Python (serializável em JSON)"""
+    if valor is None:
+        return None
+    if hasattr(valor, 'item'):
+        valor = valor.item()
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    if isinstance(valor, (str, int, float, bool)):
+        return valor
+    return str(valor)
+
+
+def tabelas_como_dict(relatorio):
+    """Tabelas do relatório como {nome: {'colunas': [...], 'linhas': [[...], ...]}}"""
+    resultado = {}
+    for nome, tabela in relatorio.tabelas().items():
+        linhas = [[_celula(valor) for valor in linha] for linha in zip(*tabela.valores)]
+        resultado[nome] = {'colunas': [str(coluna) for coluna in tabela.colunas], 'linhas': linhas}
+    return resultado
+
+
+def planilhas_como_dict(caminho):
+    """
+    Abas do Excel como {aba: {'titulo': ..., 'colunas': [...], 'linhas': [[...], ...]}}
+
+    Segue o layout das abas do relatório: título na primeira linha, cabeçalho
+    na terceira e dados a partir da quarta.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(caminho)
+    resultado = {}
+    for ws in wb.worksheets:
+        linhas = [[_celula(valor) for valor in linha] for linha in ws.iter_rows(values_only=True)]
+        resultado[ws.title] = {
+            'titulo': linhas[0][0] if linhas else None,
+            'colunas': [str(coluna) for coluna in linhas[2]] if len(linhas) > 2 else [],
+            'linhas': linhas[3:],
+        }
+    wb.close()
+    return resultado
+
+
+def _celulas_iguais(esperado, obtido):
+    if isinstance(esperado, float) or isinstance(obtido, float):
+        if esperado is None or obtido is None or isinstance(esperado, str) or isinstance(obtido, str):
+            return esperado == obtido
+        return math.isclose(esperado, obtido, rel_tol=1e-9, abs_tol=1e-9)
+    return esperado == obtido
+
+
+def _linhas_comparaveis(nome, linhas):
+    """Linhas na ordem usada na comparação (ordenadas nas tabelas sem ordem definida)"""
+    if nome not in TABELAS_SEM_ORDEM:
+        return linhas
+    return sorted(linhas[:-1], key=repr) + linhas[-1:]
+
+
+def comparar_tabelas(esperadas, obtidas):
+    """
+    Compara célula a célula as tabelas de dois relatórios
+
+    Nas tabelas de TABELAS_SEM_ORDEM os índices das diferenças se referem às
+    linhas já ordenadas.
+
+    Returns:
+        list: descrição de cada diferença encontrada (vazia se forem iguais)
+    """
+    diferencas = []
+    for nome in esperadas.keys() | obtidas.keys():
+        if nome not in obtidas or nome not in esperadas:
+            diferencas.append(f"{nome}: tabela {'ausente' if nome not in obtidas else 'inesperada'}")
+            continue
+        esperada, obtida = esperadas[nome], obtidas[nome]
+        if esperada.get('titulo') != obtida.get('titulo'):
+            diferencas.append(f"{nome}: título {esperada.get('titulo')!r} != {obtida.get('titulo')!r}")
+        if esperada['colunas'] != obtida['colunas']:
+            diferencas.append(f"{nome}: colunas {esperada['colunas']} != {obtida['colunas']}")
+            continue
+        if len(esperada['linhas']) != len(obtida['linhas']):
+            diferencas.append(f"{nome}: {len(esperada['linhas'])} linhas esperadas, {len(obtida['linhas'])} obtidas")
+        da_tabela = []
+        linhas = zip(_linhas_comparaveis(nome, esperada['linhas']), _linhas_comparaveis(nome, obtida['linhas']))
+        for i, (linha_esperada, linha_obtida) in enumerate(linhas):
+            for coluna, valor_esperado, valor_obtido in zip(esperada['colunas'], linha_esperada, linha_obtida):
+                if not _celulas_iguais(valor_esperado, valor_obtido):
+                    da_tabela.append(f"{nome}[{i}, {coluna!r}]: esperado {valor_esperado!r}, obtido {valor_obtido!r}")
+        if len(da_tabela) > DIFERENCAS_EXIBIDAS:
+            restantes = len(da_tabela) - DIFERENCAS_EXIBIDAS
+            da_tabela = da_tabela[:DIFERENCAS_EXIBIDAS] + [f"{nome}: mais {restantes} célula(s) diferente(s)"]
+        diferencas.extend(da_tabela)
+    return diferencas
+
+
+def comparar_desempenho(base, atual, tolerancia, tolerancia_memoria):
+    """
+    Compara os tempos das etapas e o pico de memória com a base
+
+    Returns:
+        list: descrição de cada regressão encontrada (vazia se dentro da tolerância)
+    """
+    regressoes = []
+    tempos_base = dict(base['etapas'])
+    tempos_base['total'] = base['tempo_total_s']
+    tempos_atuais = dict(atual['etapas'])
+    tempos_atuais['total'] = atual['tempo_total_s']
+    for etapa, tempo_base in tempos_base.items():
+        tempo = tempos_atuais.get(etapa)
+        if tempo is None:
+            continue
+        if tempo > tempo_base * (1 + tolerancia) and tempo - tempo_base > FOLGA_TEMPO_S:
+            regressoes.append(f"{etapa}: {tempo:.3f}s (base {tempo_base:.3f}s, +{tempo / tempo_base - 1:.0%})")
+
+    pico_base, pico = base.get('pico_memoria_mb'), atual.get('pico_memoria_mb')
+    if pico_base and pico and pico > pico_base * (1 + tolerancia_memoria):
+        regressoes.append(f"pico de memória: {pico:.0f} MB (base {pico_base:.0f} MB, +{pico / pico_base - 1:.0%})")
+    return regressoes
+
+
+def executar_variante(expedicoes, conferencia, saida, aquecer=False):
+    """
+    Processa as exportações pelo main e grava tabelas, tempos e pico de memória em JSON
+
+    Executada em um processo novo por variante (ver _executar_em_processo_novo),
+    para que as variáveis de ambiente e o pico de memória sejam só dela.
+    """
+    from analise_relatorios import main as processar_relatorio
+    from instrumentacao import RegistroExecucao
+    from reducao_expedicao import processos_ingestao
+
+    saida_relatorios = os.path.join(os.path.dirname(saida), 'relatorios')
+    os.makedirs(saida_relatorios, exist_ok=True)
+    if aquecer:
+        processar_relatorio(expedicoes, conferencia, saida_relatorios, '', 'TARDE')
+
+    registro = RegistroExecucao('TARDE', expedicoes + [conferencia])
+    relatorio = processar_relatorio(expedicoes, conferencia, saida_relatorios, '', 'TARDE', registro=registro)
+    xlsx = os.path.join(saida_relatorios, ARQUIVO_XLSX)
+    resultado = {
+        'situacao': registro.situacao,
+        'mensagem': registro.mensagem,
+        'tempo_total_s': registro.tempo_total,
+        'pico_memoria_mb': registro.pico_memoria,
+        'etapas': {medicao.nome: medicao.tempo for medicao in registro.etapas},
+        'processos_ingestao': processos_ingestao(len(expedicoes)),
+        'tabelas': tabelas_como_dict(relatorio) if relatorio is not None else None,
+        'planilhas': planilhas_como_dict(xlsx) if os.path.exists(xlsx) else None,
+    }
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False)
+
+
+def executar_referencia(codigo, expedicoes, conferencia, saida):
+    """
+    Processa as exportações pela implementação de referência e grava as planilhas em JSON
+
+    O código da referência (extraído em _executar_referencia) vem antes do
+    repositório no caminho de importação; o main dela só grava os arquivos.
+    """
+    sys.path.insert(0, codigo)
+    from analise_relatorios import main as processar_relatorio
+
+    saida_relatorios = os.path.join(os.path.dirname(saida), 'relatorios')
+    os.makedirs(saida_relatorios, exist_ok=True)
+    processar_relatorio(expedicoes, conferencia, saida_relatorios, '', 'TARDE')
+    xlsx = os.path.join(saida_relatorios, ARQUIVO_XLSX)
+    resultado = {
+        'situacao': 'sucesso' if os.path.exists(xlsx) else 'erro',
+        'mensagem': '' if os.path.exists(xlsx) else f'{ARQUIVO_XLSX} não gerado',
+        'planilhas': planilhas_como_dict(xlsx) if os.path.exists(xlsx) else None,
+    }
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False)
+
+
+def _executar_em_processo_novo(variante, expedicoes, conferencia, diretorio):
+    """Executa uma variante em um interpretador novo, no seu próprio diretório de trabalho"""
+    diretorio_variante = tempfile.mkdtemp(prefix=f'{variante}_', dir=diretorio)
+    saida = os.path.join(diretorio_variante, 'resultado.json')
+
+    # Sem .env nem configuração local: a variante usa só o ambiente definido aqui
+    ambiente = dict(os.environ, CACHE_EXPORTACOES='false')
+    ambiente.update(VARIANTES[variante])
+    ambiente['CACHE_EXPORTACOES_DIR'] = os.path.join(diretorio_variante, 'cache')
+    repositorio = os.path.dirname(os.path.abspath(__file__))
+    ambiente['PYTHONPATH'] = os.pathsep.join(filter(None, [repositorio, os.environ.get('PYTHONPATH')]))
+
+    comando = [sys.executable, os.path.abspath(__file__), '--executar-variante', saida, conferencia] + expedicoes
+    if variante in VARIANTES_AQUECIDAS:
+        comando.append('--aquecer')
+    processo = subprocess.run(comando, cwd=diretorio_variante, env=ambiente, capture_output=True, text=True)
+    if processo.returncode != 0 or not os.path.exists(saida):
+        erro = processo.stderr.strip().splitlines()
+        return {'situacao': 'erro', 'mensagem': erro[-1] if erro else 'sem saída', 'tabelas': None}
+    with open(saida, encoding='utf-8') as f:
+        resultado = json.load(f)
+    resultado['ingestao_em_serie'] = AVISO_INGESTAO_EM_SERIE in processo.stdout
+    return resultado
+
+
+def _executar_referencia(revisao, expedicoes, conferencia, diretorio):
+    """
+    Extrai a revisão de referência com git archive e a executa em um interpretador novo
+
+    Returns:
+        dict: situacao, mensagem e planilhas (None se a referência falhar)
+    """
+    diretorio_referencia = tempfile.mkdtemp(prefix='referencia_', dir=diretorio)
+    codigo = os.path.join(diretorio_referencia, 'codigo')
+    saida = os.path.join(diretorio_referencia, 'resultado.json')
+    repositorio = os.path.dirname(os.path.abspath(__file__))
+
+    arquivo = subprocess.run(['git', 'archive', revisao], cwd=repositorio, capture_output=True)
+    if arquivo.returncode != 0:
+        erro = arquivo.stderr.decode(errors='replace').strip().splitlines()
+        return {'situacao': 'erro', 'mensagem': erro[-1] if erro else 'git archive falhou', 'planilhas': None}
+    with tarfile.open(fileobj=io.BytesIO(arquivo.stdout)) as tar:
+        tar.extractall(codigo, filter='data')
+
+    ambiente = dict(os.environ, CACHE_EXPORTACOES='false')
+    comando = [sys.executable, os.path.abspath(__file__), '--executar-referencia', codigo, saida, conferencia]
+    processo = subprocess.run(comando + expedicoes, cwd=diretorio_referencia, env=ambiente,
+                              capture_output=True, text=True)
+    if processo.returncode != 0 or not os.path.exists(saida):
+        erro = processo.stderr.strip().splitlines()
+        return {'situacao': 'erro', 'mensagem': erro[-1] if erro else 'sem saída', 'planilhas': None}
+    with open(saida, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _base_compativel(base, revisao):
+    """True se a base foi gravada por esta versão, com a mesma referência e os mesmos dados sintéticos"""
+    return (base.get('versao') == VERSAO_BASE and base.get('referencia') == revisao
+            and base.get('arquivos_expedicao') == ARQUIVOS_REGRESSAO
+            and base.get('data_base') == DATA_BASE_SINTETICA)
+
+
+def _melhor_execucao(execucoes):
+    """
+    Combina repetições do mesmo caminho: tabelas da primeira, menor tempo de
+    cada etapa e menor pico de memória (o mínimo é a medida menos ruidosa)
+    """
+    melhor = dict(execucoes[0])
+    melhor['tempo_total_s'] = min(execucao['tempo_total_s'] for execucao in execucoes)
+    melhor['etapas'] = {etapa: min(execucao['etapas'].get(etapa, tempo) for execucao in execucoes)
+                        for etapa, tempo in execucoes[0]['etapas'].items()}
+    picos = [execucao['pico_memoria_mb'] for execucao in execucoes if execucao['pico_memoria_mb']]
+    melhor['pico_memoria_mb'] = min(picos) if picos else None
+    return melhor
+
+
+def verificar(tamanhos=TAMANHOS_REGRESSAO, caminho_base=BASE_PADRAO, tolerancia=0.25, tolerancia_memoria=0.1,
+              atualizar_base=False, repeticoes=3, revisao=REVISAO_REFERENCIA):
+    """
+    Executa a verificação completa
+
+    Args:
+        tamanhos: linhas de assignment de cada conjunto sintético
+        caminho_base: arquivo JSON com as saídas, tempos e memória de referência
+        tolerancia: aumento relativo de tempo aceito por etapa (0.25 = 25%)
+        tolerancia_memoria: aumento relativo aceito no pico de memória
+        atualizar_base: grava a base com os resultados atuais em vez de comparar
+            os tempos; as planilhas esperadas já gravadas são mantidas e as dos
+            tamanhos novos são geradas pela revisão de referência
+        repeticoes: execuções do caminho padrão (os tempos são os menores entre elas)
+        revisao: revisão git da implementação de referência
+
+    Returns:
+        bool: True se todas as verificações passaram
+    """
+    from dados_sinteticos import gerar_exportacoes
+
+    base = None
+    if os.path.exists(caminho_base):
+        with open(caminho_base, encoding='utf-8') as f:
+            base = json.load(f)
+        if not _base_compativel(base, revisao):
+            print(f"Base {caminho_base} incompatível (versão, referência ou dados sintéticos diferentes)")
+            base = None
+            if not atualizar_base:
+                print("Resultado: REPROVADO (grave a base com --atualizar-base)")
+                return False
+    elif not atualizar_base:
+        print(f"Base {caminho_base} não encontrada")
+        print("Resultado: REPROVADO (grave a base com --atualizar-base)")
+        return False
+
+    nova_base = {
+        'versao': VERSAO_BASE,
+        'referencia': revisao,
+        'arquivos_expedicao': ARQUIVOS_REGRESSAO,
+        'data_base': DATA_BASE_SINTETICA,
+        'data_hora': datetime.now().isoformat(timespec='seconds'),
+        'execucoes': dict((base or {}).get('execucoes', {})),
+    }
+    aprovado = True
+    for linhas in tamanhos:
+        print(f"Regressão - {linhas} linhas")
+        execucao_base = (base or {}).get('execucoes', {}).get(str(linhas))
+        if execucao_base is None and not atualizar_base:
+            print("  REPROVADO: sem referência na base para este tamanho (grave-a com --atualizar-base)")
+            aprovado = False
+            continue
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            expedicoes, conferencia = gerar_exportacoes(
+                os.path.join(diretorio, 'dados'), linhas, arquivos=ARQUIVOS_REGRESSAO, data_base=DATA_BASE_SINTETICA
+            )
+            if execucao_base is None:
+                referencia_legada = _executar_referencia(revisao, expedicoes, conferencia, diretorio)
+                planilhas_esperadas = referencia_legada['planilhas']
+                if planilhas_esperadas is None:
+                    print(f"  referência {revisao[:10]}: FALHOU ({referencia_legada['situacao']}: "
+                          f"{referencia_legada['mensagem']})")
+                    aprovado = False
+                    continue
+                print(f"  referência {revisao[:10]}: planilhas esperadas geradas")
+            else:
+                planilhas_esperadas = execucao_base['planilhas']
+            resultados = {variante: _executar_em_processo_novo(variante, expedicoes, conferencia, diretorio)
+                          for variante in VARIANTES}
+            repeticoes_padrao = [resultados['padrao']] + [
+                _executar_em_processo_novo('padrao', expedicoes, conferencia, diretorio)
+                for _ in range(repeticoes - 1)
+            ]
+        if all(execucao['tabelas'] is not None for execucao in repeticoes_padrao):
+            resultados['padrao'] = _melhor_execucao(repeticoes_padrao)
+        # As repetições também precisam produzir as mesmas tabelas (determinismo)
+        for i, execucao in enumerate(repeticoes_padrao[1:], start=2):
+            resultados[f'padrao ({i}ª execução)'] = execucao
+
+        referencia = resultados['padrao']
+        for variante, resultado in resultados.items():
+            if resultado['tabelas'] is None or resultado['planilhas'] is None:
+                print(f"  {variante}: FALHOU ({resultado['situacao']}: {resultado['mensagem']})")
+                aprovado = False
+                continue
+            if variante in VARIANTES_PARALELAS and (resultado['processos_ingestao'] < 2
+                                                    or resultado['ingestao_em_serie']):
+                print(f"  {variante}: FALHOU (ingestão não foi paralela)")
+                aprovado = False
+            diferencas = comparar_tabelas(planilhas_esperadas, resultado['planilhas'])
+            if variante != 'padrao' and referencia['tabelas'] is not None:
+                diferencas += comparar_tabelas(referencia['tabelas'], resultado['tabelas'])
+            print(f"  {variante}: {'saídas idênticas' if not diferencas else 'saídas DIFERENTES'} "
+                  f"(planilhas da referência{'' if variante == 'padrao' else ', tabelas do padrão'})")
+            for diferenca in diferencas:
+                print(f"    {diferenca}")
+            aprovado = aprovado and not diferencas
+
+        if referencia['tabelas'] is None:
+            continue
+        print(f"  padrao: {referencia['tempo_total_s']:.3f}s, pico de memória "
+              f"{referencia['pico_memoria_mb'] or 0:.0f} MB")
+        nova_base['execucoes'][str(linhas)] = {
+            'tempo_total_s': referencia['tempo_total_s'],
+            'pico_memoria_mb': referencia['pico_memoria_mb'],
+            'etapas': referencia['etapas'],
+            'planilhas': planilhas_esperadas,
+        }
+
+        if execucao_base is None or atualizar_base:
+            continue
+        regressoes = comparar_desempenho(execucao_base, referencia, tolerancia, tolerancia_memoria)
+        print(f"  desempenho: {'dentro da tolerância' if not regressoes else 'REGRESSÃO'}")
+        for regressao in regressoes:
+            print(f"    {regressao}")
+        aprovado = aprovado and not regressoes
+
+    if atualizar_base:
+        if aprovado:
+            with open(caminho_base, 'w', encoding='utf-8') as f:
+                json.dump(nova_base, f, ensure_ascii=False, indent=1)
+            print(f"Base gravada em {caminho_base}")
+        else:
+            print("Base não gravada: as saídas divergem da referência ou entre os caminhos")
+    print(f"Resultado: {'aprovado' if aprovado else 'REPROVADO'}")
+    return aprovado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Verificação de regressão do processamento de relatórios')
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=list(TAMANHOS_REGRESSAO),
+                        help='Linhas de assignment de cada conjunto sintético')
+    parser.add_argument('--base', default=BASE_PADRAO, help='Arquivo JSON da base de referência')
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help='Aumento relativo de tempo aceito por etapa (0.25 = 25%%)')
+    parser.add_argument('--tolerancia-memoria', type=float, default=0.1,
+                        help='Aumento relativo aceito no pico de memória')
+    parser.add_argument('--repeticoes', type=int, default=3,
+                        help='Execuções do caminho padrão; os tempos comparados são os menores')
+    parser.add_argument('--atualizar-base', action='store_true',
+                        help='Grava a base: tempos e memória atuais, planilhas esperadas da referência')
+    parser.add_argument('--referencia', default=REVISAO_REFERENCIA,
+                        help='Revisão git da implementação de referência (gera as planilhas esperadas)')
+    parser.add_argument('--executar-variante', nargs='+', metavar='ARQUIVO', help=argparse.SUPPRESS)
+    parser.add_argument('--executar-referencia', nargs='+', metavar='ARQUIVO', help=argparse.SUPPRESS)
+    parser.add_argument('--aquecer', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.executar_variante:
+        saida, conferencia, *expedicoes = args.executar_variante
+        executar_variante(expedicoes, conferencia, saida, args.aquecer)
+        sys.exit(0)
+    if args.executar_referencia:
+        codigo, saida, conferencia, *expedicoes = args.executar_referencia
+        executar_referencia(codigo, expedicoes, conferencia, saida)
+        sys.exit(0)
+
+    resultado = verificar(args.tamanhos, args.base, args.tolerancia, args.tolerancia_memoria, args.atualizar_base,
+                          max(1, args.repeticoes), args.referencia)
+    sys.exit(0 if resultado else 1)